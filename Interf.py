@@ -1,773 +1,51 @@
-import streamlit as st
-import google.generativeai as genai
 import io
-from docx import Document
+from pathlib import Path
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from analyzer import (
+    GEMINI_MODEL,
+    LLM_BACKEND,
+    LLM_CONFIGURED,
+    PROMPT_TOP_K,
+    analyze,
+    export_to_word,
+    get_admission_queue,
+    get_config_findings,
+    get_kpi_engine,
+    get_neighbour_config,
+    get_local_response,
+    get_model_router,
+    get_offtopic_gate,
+    get_response_cache,
+    get_semantic_cache,
+    get_singleflight,
+    get_tracer,
+    prune_prompt,
+    start_metrics_endpoint,
+    store_response,
+    stream_gemini_response,
+    validate_query,
+    warmup_llm,
+)
+from batch import iter_results, read_uploaded_events, run_batch, uploaded_checkpoint
+from log_ingest import analyzer_events, scan_log
+from rate_limit import INCIDENT, ROUTINE
+from resilience import AnalysisError
+from word_export import write_bulk_report
 
 # --- Config ---
 st.set_page_config(page_title="GSM-R Network Analyzer", layout="centered")
 
-# Load API key from st.secrets
-GEMINI_API_KEY = st.secrets.get("GEMINI_API_KEY", None)
-
-# --- Static Prompt ---
-BASE_PROMPT = """
-## 1. Définition du rôle
-Vous êtes un **expert hautement qualifié en réseau GSM-R** (Global System for Mobile Communications – Railway), 
-spécialisé dans les communications ferroviaires à grande vitesse.
-
-## 2. Règle principale
-- **Si** la question ou demande **n’est pas liée au GSM-R** ou **ne contient aucun élément technique** 
-du domaine GSM-R (ex. paramètres radio, handover, BSC, Cell ID, fréquence, puissance, etc.)  
-  ➜ Répondre **uniquement** :  
-  "Veuillez saisir les détails de la déconnexion."  
-  *(et rien d’autre)*
-
-## 3. Contexte technique
-- Ligne LGV TGV **Tanger ↔ Kénitra**, Maroc  
-- **33 sites** au total  
-- Chaque site possède **2 couches GSM-R** :  
-  - **Couche 2** : contrôlée par le **BSC de Rabat**  
-    - Utilisée par défaut dans le **sens M1** (Tanger → Kénitra)  
-  - **Couche 3** : contrôlée par le **BSC de Kénitra**  
-    - Utilisée par défaut dans le **sens M2** (Kénitra → Tanger)  
-    - Sert également de **couche de secours** pour le sens M1  
-- **Handover inter-couches** possible en cas de problème sur une couche pour assurer la continuité des communications
-
-
-
-## 4. Tableau des sites et Cell ID
-| **Site** | **Couche 2 (BSC Rabat)** | **Couche 3 (BSC Kénitra)** |
-|----------|--------------------------|----------------------------|
-| 1        | 201                      | 301                        |
-| 2        | 202                      | 302                        |
-| 3        | 203                      | 303                        |
-| 4        | 204                      | 304                        |
-| 5        | 205                      | 305                        |
-| 6        | 206                      | 306                        |
-| 7        | 207                      | 307                        |
-| 8        | 208                      | 308                        |
-| 9        | 209                      | 309                        |
-| 10       | 210                      | 310                        |
-| 11       | 211                      | 311                        |
-| 12       | 212                      | 312                        |
-| 13       | 213                      | 313                        |
-| 14       | 214                      | 314                        |
-| 15       | 215                      | 315                        |
-| 16       | 216                      | 316                        |
-| 17       | 217                      | 317                        |
-| 18       | 218                      | 318                        |
-| 19       | 219                      | 319                        |
-| 20       | 220                      | 320                        |
-| 21       | 221                      | 321                        |
-| 22       | 222                      | 322                        |
-| 23       | 223                      | 323                        |
-| 24       | 224                      | 324                        |
-| 25       | 225                      | 325                        |
-| 26       | 226                      | 326                        |
-| 27       | 227                      | 327                        |
-| 28       | 228                      | 328                        |
-| 29       | 229                      | 329                        |
-| 30       | 230                      | 330                        |
-| 31       | 231                      | 331                        |
-| 32       | 232                      | 332                        |
-| 33       | 233                      | 333                        |
-
-## 5. Objectif de la réponse
-- Fournir **les paramètres à modifier** pour corriger **un événement de déconnexion**.  
-- Si la **valeur actuelle** d’un paramètre à recommander n’est **pas fournie** :  
-  - Indiquer **uniquement** le **nom du paramètre** et une **justification technique détaillée** (1 phrase)  
-  - Demander la **valeur actuelle** avant de pouvoir donner une recommandation chiffrée
-
-
-## 6. Paramètres ajustables 
-1. IDTYPE - Index Type
-Parameter ID: IDTYPE
-Parameter Name: Index Type
-MML Commands: ADD G2GNCELL, MOD G2GNCELL, RMV G2GNCELL
-Meaning: Index type
-Value Type: Enumeration Type
-GUI Value Range: BYNAME(By name), BYID(By index), BYCGI(By CGI)
-Enumeration: BYNAME~0, BYID~1, BYCGI~2
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-2. SRC2GNCELLID - Source Cell Index
-Parameter ID: SRC2GNCELLID
-Parameter Name: Source Cell Index
-Meaning: A cell Index must be unique in one BSC. It is used to uniquely identify a cell
-Value Type: Interval Type
-GUI Value Range: 0~2047
-Actual Value Range: 0~2047
-Default Value: None
-Mandatory: YES
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-3. SRC2GNCELLNAME - Source Cell Name
-Parameter ID: SRC2GNCELLNAME
-Parameter Name: Source Cell Name
-Meaning: Name of a cell
-Value Type: String Type
-Actual Value Range: 1~64 characters
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-4. NBR2GNCELLID - Neighbor 2G Cell Index
-Parameter ID: NBR2GNCELLID
-Parameter Name: Neighbor 2G Cell Index
-Meaning: Uniform number of a cell index within a BSC, which uniquely identifies a cell
-Value Type: Interval Type
-GUI Value Range: 0~12287
-Actual Value Range: 0~12287
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-5. NBR2GNCELLNAME - Neighbor 2G Cell Name
-Parameter ID: NBR2GNCELLNAME
-Parameter Name: Neighbor 2G Cell Name
-Meaning: Name of a cell
-Value Type: String Type
-Actual Value Range: 1~64 characters
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-6. SRCMCC - Source Cell MCC
-Parameter ID: SRCMCC
-Parameter Name: Source Cell MCC
-Meaning: Mobile country code (MCC) of the source cell
-Value Type: String Type
-Actual Value Range: 1~3 characters
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-7. SRCMNC - Source Cell MNC
-Parameter ID: SRCMNC
-Parameter Name: Source Cell MNC
-Meaning: Mobile network code (MNC) of the source cell
-Value Type: String Type
-Actual Value Range: 1~3 characters
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-8. SRCLAC - Source Cell LAC
-Parameter ID: SRCLAC
-Parameter Name: Source Cell LAC
-Meaning: Local area code (LAC) of the source cell
-Value Type: Interval Type
-GUI Value Range: 1~65533, 65535
-Actual Value Range: 1~65533, 65535
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-9. SRCCI - Source Cell CI
-Parameter ID: SRCCI
-Parameter Name: Source Cell CI
-Meaning: Source cell ID
-Value Type: Interval Type
-GUI Value Range: 0~65535
-Actual Value Range: 0~65535
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-10. NBRMCC - Neighbour Cell MCC
-Parameter ID: NBRMCC
-Parameter Name: Neighbour Cell MCC
-Meaning: Mobile Country Code (MCC) of a neighboring cell
-Value Type: String Type
-Actual Value Range: 1~3 characters
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-11. NBRMNC - Neighbour Cell MNC
-Parameter ID: NBRMNC
-Parameter Name: Neighbour Cell MNC
-Meaning: Mobile Network Code (MNC) of a neighboring cell
-Value Type: String Type
-Actual Value Range: 1~3 characters
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-12. NBRLAC - Neighbour Cell LAC
-Parameter ID: NBRLAC
-Parameter Name: Neighbour Cell LAC
-Meaning: Local Area Code (LAC) of a neighboring cell
-Value Type: Interval Type
-GUI Value Range: 1~65533, 65535
-Actual Value Range: 1~65533, 65535
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-13. NBRCI - Neighbour Cell CI
-Parameter ID: NBRCI
-Parameter Name: Neighbour Cell CI
-Meaning: Cell ID of a neighboring cell
-Value Type: Interval Type
-GUI Value Range: 0~65535
-Actual Value Range: 0~65535
-Default Value: None
-Mandatory: YES
-Feature: Configuration Management (MRFD-210301)
-
-14. NCELLTYPE - Neighboring Cell Type
-Parameter ID: NCELLTYPE
-Parameter Name: Neighboring Cell Type
-Meaning: Indicates whether the neighboring cell is a handover neighboring cell, an IBCA neighboring cell, or both
-Value Type: Enumeration Type
-GUI Value Range: HANDOVERNCELL(Handover Neighboring Cell), IBCANCELL(IBCA Neighboring Cell), HANDOVERANDIBCANCELL(Handover and IBCA Neighboring Cell)
-Enumeration: HANDOVERNCELL~0, IBCANCELL~1, HANDOVERANDIBCANCELL~2
-Default Value: HANDOVERNCELL
-Recommended Value: HANDOVERNCELL
-Mandatory: NO
-Feature: IBCA (Interference Based Channel Allocation) (GBFD-117002)
-
-15. SRCHOCTRLSWITCH - Current HO CTRL Algorithm in Source Cell
-Parameter ID: SRCHOCTRLSWITCH
-Parameter Name: Current HO CTRL Algorithm in Source Cell
-Meaning: Whether the currently used handover algorithm in the source cell is HO Algorithm I or HO Algorithm II
-Value Type: Enumeration Type
-GUI Value Range: HOALGORITHM1(Handover algorithm I), HOALGORITHM2(Handover algorithm II)
-Enumeration: HOALGORITHM1~0, HOALGORITHM2~1
-Default Value: HOALGORITHM1
-Recommended Value: HOALGORITHM1
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-16. INTERCELLHYST - Inter-cell HO Hysteresis
-Parameter ID: INTERCELLHYST
-Parameter Name: Inter-cell HO Hysteresis
-Meaning: Hysteresis value during handovers between cells to suppress ping-pong handovers. Actual value = GUI value - 64
-Value Type: Interval Type
-GUI Value Range: 0~127
-Actual Value Range: -64~63
-Unit: dB
-Default Value: 68
-Recommended Value: 68 (densely populated urban areas), 72 (suburbs)
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501), Dynamic Power Sharing (GBFD-118106)
-
-17. MINOFFSET - Min Access Level Offset
-Parameter ID: MINOFFSET
-Parameter Name: Min Access Level Offset
-Meaning: Minimum receive level offset for handover back to neighboring cell
-Value Type: Interval Type
-GUI Value Range: 0~63
-Actual Value Range: 0~63
-Unit: dB
-Default Value: 0
-Recommended Value: 0
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-18. PBGTMARGIN - PBGT HO Threshold
-Parameter ID: PBGTMARGIN
-Parameter Name: PBGT HO Threshold
-Meaning: PBGT handovers allowed when downlink level difference is larger than this parameter. Actual value = GUI value - 64
-Value Type: Interval Type
-GUI Value Range: 0~127
-Actual Value Range: -64~63
-Unit: dB
-Default Value: 68
-Recommended Value: 68 (densely populated urban areas), 72 (suburbs)
-Mandatory: NO
-Feature: HUAWEI I Handover (GBFD-110601)
-
-19. BQMARGIN - BQ HO Margin
-Parameter ID: BQMARGIN
-Parameter Name: BQ HO Margin
-Meaning: Difference between downlink receive levels during bad quality handovers. Used to calculate bad quality handover hysteresis. Actual value = GUI value - 64
-Value Type: Interval Type
-GUI Value Range: 0~127
-Actual Value Range: -64~63
-Unit: dB
-Default Value: 69
-Recommended Value: 69
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501), Dynamic Power Sharing (GBFD-118106)
-
-20. ISCHAINNCELL - Chain Neighbor Cell
-Parameter ID: ISCHAINNCELL
-Parameter Name: Chain Neighbor Cell
-Meaning: Whether the cell is a chain neighboring cell for quick handover algorithm
-Value Type: Enumeration Type
-GUI Value Range: NO(No), YES(Yes)
-Enumeration: NO~0, YES~1
-Default Value: NO
-Recommended Value: NO
-Mandatory: NO
-Feature: Chain Cell Handover (GBFD-510103)
-
-21. INTELEVHOHYST - Adjacent Cell Inter-layer HO Hysteresis
-Parameter ID: INTELEVHOHYST
-Parameter Name: Adjacent Cell Inter-layer HO Hysteresis
-Meaning: Hysteresis value during handovers between cells on different layers to suppress inter-layer ping-pong handovers. Actual value = GUI value - 64
-Value Type: Interval Type
-GUI Value Range: 0~127
-Actual Value Range: -64~63
-Unit: dB
-Default Value: 67
-Recommended Value: 67
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-22. DRHOLEVRANGE - Directed Retry Handover Level Range
-Parameter ID: DRHOLEVRANGE
-Parameter Name: Directed Retry Handover Level Range
-Meaning: Difference between downlink receive levels during handovers due to directed retry
-Value Type: Interval Type
-GUI Value Range: 0~128
-Actual Value Range: 0~128
-Unit: dB
-Default Value: 72
-Recommended Value: 72
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-23. CHAINNCELLTYPE - Chain Neighbour Cell Type
-Parameter ID: CHAINNCELLTYPE
-Parameter Name: Chain Neighbour Cell Type
-Meaning: Geographical relationship between neighboring cell and serving cell
-Value Type: Enumeration Type
-GUI Value Range: QUICK_HO_NCELL_TYPE_A, QUICK_HO_NCELL_TYPE_B
-Enumeration: QUICK_HO_NCELL_TYPE_A~0, QUICK_HO_NCELL_TYPE_B~1
-Default Value: QUICK_HO_NCELL_TYPE_A
-Recommended Value: QUICK_HO_NCELL_TYPE_A
-Mandatory: NO
-Feature: Chain Cell Handover (GBFD-510103)
-
-24. EDGEADJSTATTIME - Edge HO AdjCell Watch Time
-Parameter ID: EDGEADJSTATTIME
-Parameter Name: Edge HO AdjCell Watch Time
-Meaning: Number N in P/N rule for edge handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 6
-Recommended Value: 6
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-25. EDGEADJLASTTIME - Edge HO AdjCell Valid Time
-Parameter ID: EDGEADJLASTTIME
-Parameter Name: Edge HO AdjCell Valid Time
-Meaning: Number P in P/N rule for edge handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 4
-Recommended Value: 4
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-26. LEVSTAT - Layer HO Watch Time
-Parameter ID: LEVSTAT
-Parameter Name: Layer HO Watch Time
-Meaning: N in P/N criteria for inter-layer handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 6
-Recommended Value: 6
-Mandatory: NO
-Feature: HUAWEI I Handover (GBFD-110601)
-
-27. LEVLAST - Layer HO Valid Time
-Parameter ID: LEVLAST
-Parameter Name: Layer HO Valid Time
-Meaning: P in P/N criteria for inter-layer handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 4
-Recommended Value: 4
-Mandatory: NO
-Feature: HUAWEI I Handover (GBFD-110601)
-
-28. PBGTSTAT - PBGT Watch Time
-Parameter ID: PBGTSTAT
-Parameter Name: PBGT Watch Time
-Meaning: N in P/N criteria for PBGT handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 6
-Recommended Value: 6
-Mandatory: NO
-Feature: HUAWEI I Handover (GBFD-110601)
-
-29. PBGTLAST - PBGT Valid Time
-Parameter ID: PBGTLAST
-Parameter Name: PBGT Valid Time
-Meaning: P in P/N criteria for PBGT handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 4
-Recommended Value: 4
-Mandatory: NO
-Feature: HUAWEI I Handover (GBFD-110601)
-
-30. BETTERCELLSTATTIME - Better Cell HO Watch Time
-Parameter ID: BETTERCELLSTATTIME
-Parameter Name: Better Cell HO Watch Time
-Meaning: N in P/N rule for better cell handover measurement period
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 6
-Recommended Value: 6
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-31. BETTERCELLLASTTIME - Better Cell HO Valid Time
-Parameter ID: BETTERCELLLASTTIME
-Parameter Name: Better Cell HO Valid Time
-Meaning: P in P/N rule for better cell handover conditions
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 4
-Recommended Value: 4
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-32. HOSTATICTIME - Quick Handover Static Time
-Parameter ID: HOSTATICTIME
-Parameter Name: Quick Handover Static Time
-Meaning: Number N in P/N rule for fast handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 4
-Recommended Value: 4
-Mandatory: NO
-Feature: Fast Move Handover (GBFD-510102)
-
-33. HOLASTTIME - Quick Handover Last Time
-Parameter ID: HOLASTTIME
-Parameter Name: Quick Handover Last Time
-Meaning: Number P in P/N rule for fast handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~32
-Actual Value Range: 0.5~16
-Unit: 0.5s
-Default Value: 3
-Recommended Value: 3
-Mandatory: NO
-Feature: Fast Move Handover (GBFD-510102)
-
-34. HCSSTATTIME - HCS HO Watch Time
-Parameter ID: HCSSTATTIME
-Parameter Name: HCS HO Watch Time
-Meaning: Number N in P/N rule for handover to different micro cell due to fast movement
-Value Type: Interval Type
-GUI Value Range: 1~16
-Actual Value Range: 0.5~8
-Unit: 0.5s
-Default Value: 3
-Recommended Value: 3
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-35. HCSLASTTIME - HCS HO Valid Time
-Parameter ID: HCSLASTTIME
-Parameter Name: HCS HO Valid Time
-Meaning: Number P in P/N rule for handover to different micro cell due to fast movement
-Value Type: Interval Type
-GUI Value Range: 1~16
-Actual Value Range: 0.5~8
-Unit: 0.5s
-Default Value: 2
-Recommended Value: 2
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-36. BQSTATTIME - BQ HO Watch Time
-Parameter ID: BQSTATTIME
-Parameter Name: BQ HO Watch Time
-Meaning: Number N in P/N rule for emergency BQ handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~16
-Actual Value Range: 0.5~8
-Unit: 0.5s
-Default Value: 1
-Recommended Value: 1
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-37. BQLASTTIME - BQ HO Valid Time
-Parameter ID: BQLASTTIME
-Parameter Name: BQ HO Valid Time
-Meaning: Number P in P/N rule for emergency BQ handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~16
-Actual Value Range: 0.5~8
-Unit: 0.5s
-Default Value: 1
-Recommended Value: 1
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-38. TASTATTIME - TA HO Watch Time
-Parameter ID: TASTATTIME
-Parameter Name: TA HO Watch Time
-Meaning: N in P/N criterion for TA handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~16
-Actual Value Range: 0.5~0.8
-Unit: 0.5s
-Default Value: 1
-Recommended Value: 1
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-39. TALASTTIME - TA HO Valid Time
-Parameter ID: TALASTTIME
-Parameter Name: TA HO Valid Time
-Meaning: P in P/N criterion for TA handover triggering
-Value Type: Interval Type
-GUI Value Range: 1~16
-Actual Value Range: 0.5~8
-Unit: 0.5s
-Default Value: 1
-Recommended Value: 1
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-40. ULBQSTATTIME - UL BQ HO Static Time
-Parameter ID: ULBQSTATTIME
-Parameter Name: UL BQ HO Static Time
-Meaning: N in P/N rule for handovers without downlink measurement report
-Value Type: Interval Type
-GUI Value Range: 1~8
-Actual Value Range: 0.5~4
-Unit: 0.5s
-Default Value: 1
-Recommended Value: 1
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-41. ULBQLASTTIME - UL BQ HO Last Time
-Parameter ID: ULBQLASTTIME
-Parameter Name: UL BQ HO Last Time
-Meaning: P in P/N rule for handovers without downlink measurement report
-Value Type: Interval Type
-GUI Value Range: 1~8
-Actual Value Range: 0.5~4
-Unit: 0.5s
-Default Value: 1
-Recommended Value: 1
-Mandatory: NO
-Feature: HUAWEI II Handover (GBFD-510501)
-
-42. IBCADYNCMEASURENCELLALLOWED - IBCA Dyn Measure Neighbour Cell Flag
-Parameter ID: IBCADYNCMEASURENCELLALLOWED
-Parameter Name: IBCA Dyn Measure Neighbour Cell Flag
-Meaning: Flag indicating whether an IBCA neighboring cell is to be measured dynamically
-Value Type: Enumeration Type
-GUI Value Range: NO(No), YES(Yes)
-Enumeration: NO~0, YES~1
-Default Value: NO
-Recommended Value: YES for co-channel interference cells, NO for others
-Mandatory: NO
-Feature: IBCA (Interference Based Channel Allocation) (GBFD-117002)
-
-43. IBCARXLEVOFFSET - IBCA RxLev Offset
-Parameter ID: IBCARXLEVOFFSET
-Parameter Name: IBCA RxLev Offset
-Meaning: Estimates receive level of unmeasured IBCA neighboring cells
-Value Type: Interval Type
-GUI Value Range: 0~63
-Actual Value Range: 0~63
-Unit: dB
-Default Value: 4
-Recommended Value: 4
-Mandatory: NO
-Feature: IBCA (Interference Based Channel Allocation) (GBFD-117002)
-
-44. LOADHOPBGTMARGIN - Load HO PBGT Threshold
-Parameter ID: LOADHOPBGTMARGIN
-Parameter Name: Load HO PBGT Threshold
-Meaning: Threshold for triggering load-based PBGT handovers
-Value Type: Interval Type
-GUI Value Range: 0~127
-Actual Value Range: -64~63
-Unit: dB
-Default Value: 0
-Recommended Value: 0
-Mandatory: NO
-Feature: HUAWEI I Handover (GBFD-110601)
-
-45. NCELLPRI - Neighboring Cell Priority
-Parameter ID: NCELLPRI
-Parameter Name: Neighboring Cell Priority
-Meaning: Priority of neighboring cell (0=lowest, 7=highest, 255=invalid)
-Value Type: Interval Type
-GUI Value Range: 0~7, 255
-Actual Value Range: 0~7, 255
-Default Value: 255
-Recommended Value: None
-Mandatory: NO
-Feature: Basic Cell Re-selection (GBFD-110402)
-
-46. EDOUTHOOFFSET - Enhanced Outgoing Cell Handover Offset
-Parameter ID: EDOUTHOOFFSET
-Parameter Name: Enhanced Outgoing Cell Handover Offset
-Meaning: Level offset for serving cell when handovers to edge of neighboring cell are triggered. Actual value = GUI value - 64
-Value Type: Interval Type
-GUI Value Range: 0~127
-Actual Value Range: -64~63
-Default Value: 64
-Recommended Value: 64
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-47. NCELLPUNEN - Neighboring Cell Penalty Switch
-Parameter ID: NCELLPUNEN
-Parameter Name: Neighboring Cell Penalty Switch
-Meaning: Whether to perform penalties in neighboring cell during handovers to prevent ping-pong handover
-Value Type: Enumeration Type
-GUI Value Range: NO(No), YES(Yes)
-Enumeration: NO~0, YES~1
-Default Value: NO
-Recommended Value: NO
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-48. NCELLPUNSTPTH - Penalty Stop Level Threshold
-Parameter ID: NCELLPUNSTPTH
-Parameter Name: Penalty Stop Level Threshold
-Meaning: Level threshold to stop penalty timer in neighboring cell
-Value Type: Interval Type
-GUI Value Range: 0~63
-Actual Value Range: 0~63
-Unit: dB
-Default Value: 20
-Recommended Value: 20
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-49. NCELLPUNTM - Penalty Timer Length
-Parameter ID: NCELLPUNTM
-Parameter Name: Penalty Timer Length
-Meaning: Length of timer for performing penalties in neighboring cell
-Value Type: Interval Type
-GUI Value Range: 0~255
-Actual Value Range: 0~255
-Unit: s
-Default Value: 10
-Recommended Value: 10
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-50. NCELLPUNLEV - Level Penalty Value on Neighboring Cell
-Parameter ID: NCELLPUNLEV
-Parameter Name: Level Penalty Value on Neighboring Cell
-Meaning: Level for penalties in neighboring cell during handovers
-Value Type: Interval Type
-GUI Value Range: 0~63
-Actual Value Range: 0~63
-Unit: dB
-Default Value: 10
-Recommended Value: 10
-Mandatory: NO
-Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
-
-
-
-
-
-
-## 7. Règles de réponse 
-- Donner des **recommandations courtes et claires**  
-- Utiliser **uniquement des puces** (•)  
-- Optimiser **1 à 2 paramètres maximum** à la fois  
-- **Si valeur actuelle connue** :  
-  1. **Nom du paramètre**  
-  2. **Valeur actuelle → valeur recommandée**  
-  3. **Justification technique** *(raison détaillée expliquant le contexte et les effets attendus)*  
-  4. **Impact attendu** *(1 phrase)*  
-- **Si valeur actuelle inconnue** :  
-  1. **Nom du paramètre**  
-  2. **Justification technique** *(1 phrase)*  
-  3. **Action requise** : “Veuillez fournir la valeur actuelle pour recommander un ajustement.”  
-- **Pas** de paragraphes, pas d’introduction ni conclusion
-
-
-Format de réponse :
-• Valeur connue :
-
-<Nom paramètre> (Cell ID X → Neighbor Cell ID Y) : <valeur actuelle> → <valeur recommandée>
-
-Justification : <raison technique détaillée expliquant pourquoi ce changement est recommandé, avec contexte et effets attendus>
-
-Impact attendu : <impact en 1 phrase>
-• Valeur inconnue :
-
-<Nom paramètre> (Cell ID X → Neighbor Cell ID Y)
-
-Justification : <raison technique en 1 phrase>
-
-Action requise : Veuillez fournir la valeur actuelle pour recommander un ajustement.
-
-
-
-
-## 9. Exemple de réponse
-**Valeur connue :**  
-• Penalty Stop Level Threshold (Cell ID 202 et Neighbor 2G Cell ID 201) : 20 -> 25  
-  - Justification : Augmente la robustesse du handover en cas de perte rapide de signal, réduisant les risques de coupure sur les zones à forte vitesse.  
-  - Impact attendu : Moins de coupures et meilleure continuité des communications sur le trajet Tanger → Kénitra.  
-
-**Valeur inconnue :**  
-• PBGT HO Threshold (Source Cell ID 202 -> Neighbor 2G Cell ID 201)  
-  - Justification : Améliore la précision du déclenchement du handover pour éviter les échecs de connexion.  
-  - Action requise : Veuillez fournir la valeur actuelle pour recommander un ajustement.  
-
-"""
-
-# --- Utils ---
-def get_gemini_response(user_prompt):
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        full_prompt = f"{BASE_PROMPT}\n\nUser Query: {user_prompt}"
-        response = model.generate_content(full_prompt)
-        return response.text
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-def export_to_word(text):
-    doc = Document()
-    doc.add_heading('GSM-R Network Analysis & Recommendations', 0)
-    doc.add_paragraph(text)
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
 # --- Main ---
 def main():
     if 'result_text' not in st.session_state:
         st.session_state.result_text = ""
+    if 'result_error' not in st.session_state:
+        st.session_state.result_error = None
+
+    model_ready = warmup_llm() if LLM_CONFIGURED else False
+    start_metrics_endpoint()
 
     st.title("GSM-R Network Disconnection Analysis")
 
@@ -777,26 +55,191 @@ def main():
         st.write("**Couche 2 (M1 : Tanger → Kénitra)**\n- BSC : Kénitra\n- Cellules : 201 à 233")
         st.write("**Couche 3 (M2 : Kénitra → Tanger)**\n- BSC : Rabat\n- Cellules : 301 à 333")
         st.write("**Status**")
-        st.write("✅ API Configured" if GEMINI_API_KEY else "❌ API Missing")
+        st.write("✅ API Configured" if LLM_CONFIGURED else "❌ API Missing")
+        if LLM_BACKEND != "gemini":
+            st.write(f"🧪 Backend : {LLM_BACKEND}")
+        if LLM_CONFIGURED:
+            st.write(f"✅ {GEMINI_MODEL} ready" if model_ready else f"⚠️ {GEMINI_MODEL} unreachable")
+        stats = get_response_cache().summary()
+        st.write(f"**Cache** : {stats['disk_entries']} réponses, hit rate {stats['hit_rate']:.0%}")
+        st.write(f"**Cache sémantique** : {get_semantic_cache().stats['hits']} hits")
+        gate_log = get_offtopic_gate().decisions
+        st.write(f"**Filtre hors-sujet** : {sum(d.off_topic for _, _, d, _ in gate_log)} / {len(gate_log)} requêtes")
+        queue = get_admission_queue()
+        st.write(f"**File d'attente Gemini** : {len(queue)} en attente, {queue.stats['throttled']} refus 429")
+        st.write(f"**Requêtes mutualisées** : {get_singleflight().stats['shared']}")
+        kpis = get_kpi_engine()
+        if kpis is not None and kpis.origin is not None:
+            report = kpis.report()
+            st.write(f"**KPI handover** : {len(kpis)} périodes du {report.start:%d/%m} au {report.end:%d/%m}")
+        config = get_neighbour_config()
+        if config is not None:
+            st.write(f"**Config MML** : {len(config)} relations G2GNCELL, {len(get_config_findings())} hors règles")
+        local = get_tracer().counters().get("cache_lookups_total", {}).get((("result", "rules"),), 0)
+        st.write(f"**Règles locales** : {local:.0f} réponses sans appel au modèle")
+        for tier, health in get_model_router().summary().items():
+            latency = f"p95 {health['p95']:.1f}s" if health["p95"] is not None else "p95 -"
+            quality = f"qualité {health['quality']:.0%}" if health["quality"] is not None else "qualité -"
+            state = "" if health["available"] else " (en pause)"
+            st.write(f"**Modèle {tier}** ({health['model']}){state} : {health['calls']} appels, {latency}, {quality}")
+        with st.expander("Admin : latences"):
+            tracer = get_tracer()
+            latencies = tracer.percentiles()
+            if latencies:
+                st.table([
+                    {"span": span, "n": v["count"], **{q: f"{v[q] * 1000:.0f} ms" for q in ("p50", "p95", "p99")}}
+                    for span, v in sorted(latencies.items())
+                ])
+            counters = tracer.counters()
+            for (labels, value) in sorted(counters.get("cache_lookups_total", {}).items()):
+                st.write(f"Cache {dict(labels)['result']} : {value:.0f}")
+            for (labels, value) in sorted(counters.get("tokens_total", {}).items()):
+                labels = dict(labels)
+                st.write(f"Tokens {labels['kind']} ({labels['model']}) : {value:.0f}")
 
     # Input
     user_input = st.text_area("Describe the disconnection event:", height=200)
+    stream_mode = st.toggle("Stream response", value=True)
+    priority = INCIDENT if st.toggle("Incident en cours (prioritaire)") else ROUTINE
+    queue_status = st.empty()
+    script_ctx = get_script_run_ctx()
+
+    def on_queue(position):
+        # Hedged attempts wait for quota on worker threads
+        add_script_run_ctx(ctx=script_ctx)
+        queue_status.info(f"Quota Gemini atteint : en file d'attente, position {position}")
 
     if st.button("Generate"):
-        if not GEMINI_API_KEY:
-            st.error("Please configure your API key in `.streamlit/secrets.toml`.")
-        elif not user_input.strip():
-            st.warning("Please enter details.")
-        else:
-            st.session_state.result_text = get_gemini_response(user_input)
+        with get_tracer().trace("ui", stream=stream_mode, priority=priority):
+            st.session_state.result_query = user_input
+            st.session_state.result_error = None
+            if not LLM_CONFIGURED:
+                st.error("Please configure your API key in `.streamlit/secrets.toml`.")
+            elif not user_input.strip():
+                st.warning("Please enter details.")
+            elif invalid := validate_query(user_input):
+                st.error("Requête invalide : " + " ; ".join(invalid))
+            elif stream_mode:
+                cached = get_local_response(user_input)
+                if cached is not None:
+                    st.session_state.result_text = cached
+                else:
+                    st.session_state.result_text = ""
+                    st.subheader("Analysis & Recommendations")
+                    # Any click reruns the script, which stops the stream mid-flight
+                    st.button("Cancel")
+                    try:
+                        st.session_state.result_text = st.write_stream(
+                            stream_gemini_response(user_input, priority, on_queue)
+                        )
+                        store_response(user_input, st.session_state.result_text)
+                    except AnalysisError as e:
+                        st.session_state.result_text = ""
+                        st.session_state.result_error = e
+                    st.rerun()
+            else:
+                try:
+                    st.session_state.result_text = analyze(user_input, priority, on_queue)
+                except AnalysisError as e:
+                    st.session_state.result_text = ""
+                    st.session_state.result_error = e
+                queue_status.empty()
+
+    if error := st.session_state.result_error:
+        st.error(
+            f"Analyse impossible ({error.code}, {error.attempts} tentative(s)) : {error.message}"
+            + (" - réessayez dans un instant." if error.retryable else "")
+        )
 
     # Show result & export only if there is generated text
     if st.session_state.result_text:
         st.subheader("Analysis & Recommendations")
-        st.markdown(st.session_state.result_text)
-
-        buffer = export_to_word(st.session_state.result_text)
-        st.download_button("Export to Word", buffer, file_name="GSMR_Report.docx")
+        with get_tracer().span("render"):
+            st.markdown(st.session_state.result_text)
+        pruned = prune_prompt(st.session_state.get("result_query", ""))
+        if pruned is not None:
+            st.caption(
+                f"Prompt : {len(pruned.parameter_ids)} paramètres"
+                + (f" ({', '.join(pruned.parameter_ids)})" if len(pruned.parameter_ids) <= PROMPT_TOP_K else "")
+                + (f", sites {', '.join(map(str, pruned.sites))}" if pruned.sites else "")
+                + f", ~{pruned.tokens_saved} tokens économisés sur {pruned.full_tokens}"
+            )
+
+        st.download_button(
+            "Export to Word",
+            export_to_word(st.session_state.result_text),
+            file_name="GSMR_Report.docx",
+            on_click="ignore",
+        )
+
+    # Batch
+    with st.expander("Batch analysis"):
+        upload = st.file_uploader("Events file (CSV or JSONL with a query/description column)", type=["csv", "jsonl"])
+        if upload is not None and st.button("Run batch"):
+            if not LLM_CONFIGURED:
+                st.error("Please configure your API key in `.streamlit/secrets.toml`.")
+            else:
+                data = upload.getvalue()
+                checkpoint = uploaded_checkpoint(data)
+                count = sum(1 for _ in read_uploaded_events(data, upload.name))
+                progress = st.progress(0.0, text=f"0 / {count}")
+
+                def on_batch(report, stats):
+                    seen = report.total + report.skipped
+                    progress.progress(
+                        min(seen / count, 1.0),
+                        text=f"{seen} / {count} - {stats['throughput']:.2f} évén./s, {stats['error_rate']:.0%} erreurs",
+                    )
+
+                report = run_batch(read_uploaded_events(data, upload.name), checkpoint, on_batch=on_batch)
+                st.write(
+                    f"{report.ok} analysés, {report.failed} en échec, {report.skipped} repris du point de contrôle "
+                    f"({report.throughput:.2f} évén./s)"
+                )
+                st.download_button(
+                    "Download results (JSONL)",
+                    checkpoint.read_bytes(),
+                    file_name=f"{Path(upload.name).stem}_results.jsonl",
+                    on_click="ignore",
+                )
+                report_docx = io.BytesIO()
+                write_bulk_report(iter_results(checkpoint), report_docx)
+                st.download_button(
+                    "Download report (Word)",
+                    report_docx.getvalue(),
+                    file_name=f"{Path(upload.name).stem}_report.docx",
+                    on_click="ignore",
+                )
+
+    # Log ingestion
+    with st.expander("Log ingestion"):
+        log = st.file_uploader("BSC handover / drive-test log (CSV or Parquet)", type=["csv", "parquet"])
+        min_count = st.number_input("Occurrences minimum par relation", min_value=1, value=3)
+        if log is not None and st.button("Detect and analyze"):
+            if not LLM_CONFIGURED:
+                st.error("Please configure your API key in `.streamlit/secrets.toml`.")
+            else:
+                try:
+                    scanner = scan_log(log, name=log.name)
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
+                events = analyzer_events(scanner.events(min_count))
+                st.write(f"{scanner.rows} enregistrements lus, {len(events)} événements détectés")
+                st.dataframe(events, hide_index=True)
+                if events:
+                    checkpoint = uploaded_checkpoint(log.getvalue())
+                    with st.spinner("Analyse des événements..."):
+                        report = run_batch(events, checkpoint)
+                    st.write(f"{report.ok} analysés, {report.failed} en échec, {report.skipped} repris du point de contrôle")
+                    report_docx = io.BytesIO()
+                    write_bulk_report(iter_results(checkpoint), report_docx)
+                    st.download_button(
+                        "Download report (Word)",
+                        report_docx.getvalue(),
+                        file_name=f"{Path(log.name).stem}_report.docx",
+                        on_click="ignore",
+                    )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,1311 @@
+import asyncio
+import datetime
+import functools
+import hashlib
+import os
+import threading
+import time
+import tomllib
+from pathlib import Path
+
+from google.api_core.exceptions import TooManyRequests
+
+from response_cache import ResponseCache, make_cache_key
+from semantic_cache import SemanticCache
+from prompt_retrieval import ParameterIndex, PrunedPrompt, estimate_tokens
+from param_catalog import ParameterCatalog
+from offtopic_gate import OffTopicGate
+from topology import LineTopology
+from rate_limit import ROUTINE, AdmissionQueue
+from singleflight import AsyncSingleFlight, SingleFlight
+from resilience import ResilientCaller
+from model_router import FAST, STRONG, ModelRouter, answer_quality, classify_complexity
+from tracing import Tracer, start_metrics_server
+from llm_backends import GeminiBackend, HTTPBackend
+from stub_backend import StubBackend
+from word_export import WordExporter
+from kpi import HandoverKpis
+from mml_config import NeighbourConfig
+from rules import RuleEngine
+
+# --- Config ---
+# The same secrets.toml files Streamlit reads, so the app and the headless
+# API share one configuration; environment variables take precedence
+SECRETS_PATHS = (Path.home() / ".streamlit" / "secrets.toml", Path.cwd() / ".streamlit" / "secrets.toml")
+
+def load_secrets():
+    secrets = {}
+    for path in SECRETS_PATHS:
+        if path.is_file():
+            with open(path, "rb") as f:
+                secrets.update(tomllib.load(f))
+    return secrets
+
+SECRETS = load_secrets()
+
+def setting(name, default=None, cast=str):
+    value = os.environ.get(name, SECRETS.get(name, default))
+    if value is None:
+        return None
+    if cast is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
+
+# "gemini", "stub" (in-process, offline) or "http" (a stub_backend.py server)
+LLM_BACKEND = setting("LLM_BACKEND", "gemini")
+LLM_BACKEND_URL = setting("LLM_BACKEND_URL", "http://127.0.0.1:8765")
+STUB_LATENCY = setting("STUB_LATENCY", "lognormal:0.8,0.35")
+STUB_ERROR_RATE = setting("STUB_ERROR_RATE", 0.0, float)
+STUB_ERRORS = setting("STUB_ERRORS", "unavailable")
+STUB_SEED = setting("STUB_SEED", 0, int)
+GEMINI_API_KEY = setting("GEMINI_API_KEY")
+LLM_CONFIGURED = LLM_BACKEND != "gemini" or bool(GEMINI_API_KEY)
+GEMINI_MODEL = setting("GEMINI_MODEL", "gemini-2.0-flash")
+# Lighter tier for pointed single-parameter questions; GEMINI_MODEL is the strong tier
+GEMINI_FAST_MODEL = setting("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite")
+MODEL_ROUTING = setting("MODEL_ROUTING", True, bool)
+ROUTER_SLOW_AFTER = setting("ROUTER_SLOW_AFTER", 20, float)
+GEMINI_TIMEOUT = setting("GEMINI_TIMEOUT", 60, float)
+# Whole call, retries included; GEMINI_TIMEOUT bounds each attempt
+GEMINI_DEADLINE = setting("GEMINI_DEADLINE", 90, float)
+GEMINI_RETRIES = setting("GEMINI_RETRIES", 2, int)
+# Duplicate a call still running after the observed p95 latency
+GEMINI_HEDGE = setting("GEMINI_HEDGE", False, bool)
+GEMINI_HEDGE_DELAY = setting("GEMINI_HEDGE_DELAY", 10, float)
+CONTEXT_CACHE_TTL = datetime.timedelta(minutes=setting("GEMINI_CONTEXT_CACHE_MINUTES", 60, int))
+RESPONSE_CACHE_PATH = setting("RESPONSE_CACHE_PATH", "gsmr_responses.sqlite3")
+RESPONSE_CACHE_MAX_ROWS = setting("RESPONSE_CACHE_MAX_ROWS", 5000, int)
+SEMANTIC_CACHE_THRESHOLD = setting("SEMANTIC_CACHE_THRESHOLD", 0.82, float)
+PROMPT_PRUNING = setting("PROMPT_PRUNING", True, bool)
+PROMPT_TOP_K = setting("PROMPT_TOP_K", 5, int)
+OFFTOPIC_THRESHOLD = setting("OFFTOPIC_THRESHOLD", 0.75, float)
+GEMINI_RPM = setting("GEMINI_RPM", 60, int)
+GEMINI_TPM = setting("GEMINI_TPM", 1_000_000, int)
+GEMINI_QUEUE_MAX_WAIT = setting("GEMINI_QUEUE_MAX_WAIT", 120, float)
+EXPECTED_OUTPUT_TOKENS = setting("EXPECTED_OUTPUT_TOKENS", 600, int)
+TRACE_LOG_PATH = setting("TRACE_LOG_PATH", "gsmr_traces.jsonl")
+TRACE_LOG_MAX_BYTES = setting("TRACE_LOG_MAX_BYTES", 10_000_000, int)
+TRACE_LOG_BACKUPS = setting("TRACE_LOG_BACKUPS", 5, int)
+# Prometheus endpoint of the Streamlit process; 0 disables it
+METRICS_PORT = setting("METRICS_PORT", 9464, int)
+# Distinct reports whose .docx bytes are kept in memory
+EXPORT_CACHE_SIZE = setting("EXPORT_CACHE_SIZE", 32, int)
+# CSV/Parquet export of BSC handover counters; their KPIs go into the prompt
+KPI_COUNTERS_PATH = setting("KPI_COUNTERS_PATH", "")
+KPI_BUCKET = setting("KPI_BUCKET", "15min")
+KPI_MIN_ATTEMPTS = setting("KPI_MIN_ATTEMPTS", 20, int)
+KPI_CONTEXT_RELATIONS = setting("KPI_CONTEXT_RELATIONS", 6, int)
+# LST/ADD G2GNCELL dump, or a directory of them; current values go into the prompt
+MML_DUMP_PATH = setting("MML_DUMP_PATH", "")
+# Answer clear-cut range / recommended value / P/N findings locally, without a model call
+LOCAL_RULES = setting("LOCAL_RULES", True, bool)
+# Distance to the nearest recommended value tolerated, as a share of the GUI range
+RULES_TOLERANCE = setting("RULES_TOLERANCE", 0.05, float)
+
+# --- Static Prompt ---
+BASE_PROMPT = """
+## 1. Définition du rôle
+Vous êtes un **expert hautement qualifié en réseau GSM-R** (Global System for Mobile Communications – Railway), 
+spécialisé dans les communications ferroviaires à grande vitesse.
+
+## 2. Règle principale
+- **Si** la question ou demande **n’est pas liée au GSM-R** ou **ne contient aucun élément technique** 
+du domaine GSM-R (ex. paramètres radio, handover, BSC, Cell ID, fréquence, puissance, etc.)  
+  ➜ Répondre **uniquement** :  
+  "Veuillez saisir les détails de la déconnexion."  
+  *(et rien d’autre)*
+
+## 3. Contexte technique
+- Ligne LGV TGV **Tanger ↔ Kénitra**, Maroc  
+- **33 sites** au total  
+- Chaque site possède **2 couches GSM-R** :  
+  - **Couche 2** : contrôlée par le **BSC de Rabat**  
+    - Utilisée par défaut dans le **sens M1** (Tanger → Kénitra)  
+  - **Couche 3** : contrôlée par le **BSC de Kénitra**  
+    - Utilisée par défaut dans le **sens M2** (Kénitra → Tanger)  
+    - Sert également de **couche de secours** pour le sens M1  
+- **Handover inter-couches** possible en cas de problème sur une couche pour assurer la continuité des communications
+
+
+
+## 4. Tableau des sites et Cell ID
+| **Site** | **Couche 2 (BSC Rabat)** | **Couche 3 (BSC Kénitra)** |
+|----------|--------------------------|----------------------------|
+| 1        | 201                      | 301                        |
+| 2        | 202                      | 302                        |
+| 3        | 203                      | 303                        |
+| 4        | 204                      | 304                        |
+| 5        | 205                      | 305                        |
+| 6        | 206                      | 306                        |
+| 7        | 207                      | 307                        |
+| 8        | 208                      | 308                        |
+| 9        | 209                      | 309                        |
+| 10       | 210                      | 310                        |
+| 11       | 211                      | 311                        |
+| 12       | 212                      | 312                        |
+| 13       | 213                      | 313                        |
+| 14       | 214                      | 314                        |
+| 15       | 215                      | 315                        |
+| 16       | 216                      | 316                        |
+| 17       | 217                      | 317                        |
+| 18       | 218                      | 318                        |
+| 19       | 219                      | 319                        |
+| 20       | 220                      | 320                        |
+| 21       | 221                      | 321                        |
+| 22       | 222                      | 322                        |
+| 23       | 223                      | 323                        |
+| 24       | 224                      | 324                        |
+| 25       | 225                      | 325                        |
+| 26       | 226                      | 326                        |
+| 27       | 227                      | 327                        |
+| 28       | 228                      | 328                        |
+| 29       | 229                      | 329                        |
+| 30       | 230                      | 330                        |
+| 31       | 231                      | 331                        |
+| 32       | 232                      | 332                        |
+| 33       | 233                      | 333                        |
+
+## 5. Objectif de la réponse
+- Fournir **les paramètres à modifier** pour corriger **un événement de déconnexion**.  
+- Si la **valeur actuelle** d’un paramètre à recommander n’est **pas fournie** :  
+  - Indiquer **uniquement** le **nom du paramètre** et une **justification technique détaillée** (1 phrase)  
+  - Demander la **valeur actuelle** avant de pouvoir donner une recommandation chiffrée
+
+
+## 6. Paramètres ajustables 
+1. IDTYPE - Index Type
+Parameter ID: IDTYPE
+Parameter Name: Index Type
+MML Commands: ADD G2GNCELL, MOD G2GNCELL, RMV G2GNCELL
+Meaning: Index type
+Value Type: Enumeration Type
+GUI Value Range: BYNAME(By name), BYID(By index), BYCGI(By CGI)
+Enumeration: BYNAME~0, BYID~1, BYCGI~2
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+2. SRC2GNCELLID - Source Cell Index
+Parameter ID: SRC2GNCELLID
+Parameter Name: Source Cell Index
+Meaning: A cell Index must be unique in one BSC. It is used to uniquely identify a cell
+Value Type: Interval Type
+GUI Value Range: 0~2047
+Actual Value Range: 0~2047
+Default Value: None
+Mandatory: YES
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+3. SRC2GNCELLNAME - Source Cell Name
+Parameter ID: SRC2GNCELLNAME
+Parameter Name: Source Cell Name
+Meaning: Name of a cell
+Value Type: String Type
+Actual Value Range: 1~64 characters
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+4. NBR2GNCELLID - Neighbor 2G Cell Index
+Parameter ID: NBR2GNCELLID
+Parameter Name: Neighbor 2G Cell Index
+Meaning: Uniform number of a cell index within a BSC, which uniquely identifies a cell
+Value Type: Interval Type
+GUI Value Range: 0~12287
+Actual Value Range: 0~12287
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+5. NBR2GNCELLNAME - Neighbor 2G Cell Name
+Parameter ID: NBR2GNCELLNAME
+Parameter Name: Neighbor 2G Cell Name
+Meaning: Name of a cell
+Value Type: String Type
+Actual Value Range: 1~64 characters
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+6. SRCMCC - Source Cell MCC
+Parameter ID: SRCMCC
+Parameter Name: Source Cell MCC
+Meaning: Mobile country code (MCC) of the source cell
+Value Type: String Type
+Actual Value Range: 1~3 characters
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+7. SRCMNC - Source Cell MNC
+Parameter ID: SRCMNC
+Parameter Name: Source Cell MNC
+Meaning: Mobile network code (MNC) of the source cell
+Value Type: String Type
+Actual Value Range: 1~3 characters
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+8. SRCLAC - Source Cell LAC
+Parameter ID: SRCLAC
+Parameter Name: Source Cell LAC
+Meaning: Local area code (LAC) of the source cell
+Value Type: Interval Type
+GUI Value Range: 1~65533, 65535
+Actual Value Range: 1~65533, 65535
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+9. SRCCI - Source Cell CI
+Parameter ID: SRCCI
+Parameter Name: Source Cell CI
+Meaning: Source cell ID
+Value Type: Interval Type
+GUI Value Range: 0~65535
+Actual Value Range: 0~65535
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+10. NBRMCC - Neighbour Cell MCC
+Parameter ID: NBRMCC
+Parameter Name: Neighbour Cell MCC
+Meaning: Mobile Country Code (MCC) of a neighboring cell
+Value Type: String Type
+Actual Value Range: 1~3 characters
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+11. NBRMNC - Neighbour Cell MNC
+Parameter ID: NBRMNC
+Parameter Name: Neighbour Cell MNC
+Meaning: Mobile Network Code (MNC) of a neighboring cell
+Value Type: String Type
+Actual Value Range: 1~3 characters
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+12. NBRLAC - Neighbour Cell LAC
+Parameter ID: NBRLAC
+Parameter Name: Neighbour Cell LAC
+Meaning: Local Area Code (LAC) of a neighboring cell
+Value Type: Interval Type
+GUI Value Range: 1~65533, 65535
+Actual Value Range: 1~65533, 65535
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+13. NBRCI - Neighbour Cell CI
+Parameter ID: NBRCI
+Parameter Name: Neighbour Cell CI
+Meaning: Cell ID of a neighboring cell
+Value Type: Interval Type
+GUI Value Range: 0~65535
+Actual Value Range: 0~65535
+Default Value: None
+Mandatory: YES
+Feature: Configuration Management (MRFD-210301)
+
+14. NCELLTYPE - Neighboring Cell Type
+Parameter ID: NCELLTYPE
+Parameter Name: Neighboring Cell Type
+Meaning: Indicates whether the neighboring cell is a handover neighboring cell, an IBCA neighboring cell, or both
+Value Type: Enumeration Type
+GUI Value Range: HANDOVERNCELL(Handover Neighboring Cell), IBCANCELL(IBCA Neighboring Cell), HANDOVERANDIBCANCELL(Handover and IBCA Neighboring Cell)
+Enumeration: HANDOVERNCELL~0, IBCANCELL~1, HANDOVERANDIBCANCELL~2
+Default Value: HANDOVERNCELL
+Recommended Value: HANDOVERNCELL
+Mandatory: NO
+Feature: IBCA (Interference Based Channel Allocation) (GBFD-117002)
+
+15. SRCHOCTRLSWITCH - Current HO CTRL Algorithm in Source Cell
+Parameter ID: SRCHOCTRLSWITCH
+Parameter Name: Current HO CTRL Algorithm in Source Cell
+Meaning: Whether the currently used handover algorithm in the source cell is HO Algorithm I or HO Algorithm II
+Value Type: Enumeration Type
+GUI Value Range: HOALGORITHM1(Handover algorithm I), HOALGORITHM2(Handover algorithm II)
+Enumeration: HOALGORITHM1~0, HOALGORITHM2~1
+Default Value: HOALGORITHM1
+Recommended Value: HOALGORITHM1
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+16. INTERCELLHYST - Inter-cell HO Hysteresis
+Parameter ID: INTERCELLHYST
+Parameter Name: Inter-cell HO Hysteresis
+Meaning: Hysteresis value during handovers between cells to suppress ping-pong handovers. Actual value = GUI value - 64
+Value Type: Interval Type
+GUI Value Range: 0~127
+Actual Value Range: -64~63
+Unit: dB
+Default Value: 68
+Recommended Value: 68 (densely populated urban areas), 72 (suburbs)
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501), Dynamic Power Sharing (GBFD-118106)
+
+17. MINOFFSET - Min Access Level Offset
+Parameter ID: MINOFFSET
+Parameter Name: Min Access Level Offset
+Meaning: Minimum receive level offset for handover back to neighboring cell
+Value Type: Interval Type
+GUI Value Range: 0~63
+Actual Value Range: 0~63
+Unit: dB
+Default Value: 0
+Recommended Value: 0
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+18. PBGTMARGIN - PBGT HO Threshold
+Parameter ID: PBGTMARGIN
+Parameter Name: PBGT HO Threshold
+Meaning: PBGT handovers allowed when downlink level difference is larger than this parameter. Actual value = GUI value - 64
+Value Type: Interval Type
+GUI Value Range: 0~127
+Actual Value Range: -64~63
+Unit: dB
+Default Value: 68
+Recommended Value: 68 (densely populated urban areas), 72 (suburbs)
+Mandatory: NO
+Feature: HUAWEI I Handover (GBFD-110601)
+
+19. BQMARGIN - BQ HO Margin
+Parameter ID: BQMARGIN
+Parameter Name: BQ HO Margin
+Meaning: Difference between downlink receive levels during bad quality handovers. Used to calculate bad quality handover hysteresis. Actual value = GUI value - 64
+Value Type: Interval Type
+GUI Value Range: 0~127
+Actual Value Range: -64~63
+Unit: dB
+Default Value: 69
+Recommended Value: 69
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501), Dynamic Power Sharing (GBFD-118106)
+
+20. ISCHAINNCELL - Chain Neighbor Cell
+Parameter ID: ISCHAINNCELL
+Parameter Name: Chain Neighbor Cell
+Meaning: Whether the cell is a chain neighboring cell for quick handover algorithm
+Value Type: Enumeration Type
+GUI Value Range: NO(No), YES(Yes)
+Enumeration: NO~0, YES~1
+Default Value: NO
+Recommended Value: NO
+Mandatory: NO
+Feature: Chain Cell Handover (GBFD-510103)
+
+21. INTELEVHOHYST - Adjacent Cell Inter-layer HO Hysteresis
+Parameter ID: INTELEVHOHYST
+Parameter Name: Adjacent Cell Inter-layer HO Hysteresis
+Meaning: Hysteresis value during handovers between cells on different layers to suppress inter-layer ping-pong handovers. Actual value = GUI value - 64
+Value Type: Interval Type
+GUI Value Range: 0~127
+Actual Value Range: -64~63
+Unit: dB
+Default Value: 67
+Recommended Value: 67
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+22. DRHOLEVRANGE - Directed Retry Handover Level Range
+Parameter ID: DRHOLEVRANGE
+Parameter Name: Directed Retry Handover Level Range
+Meaning: Difference between downlink receive levels during handovers due to directed retry
+Value Type: Interval Type
+GUI Value Range: 0~128
+Actual Value Range: 0~128
+Unit: dB
+Default Value: 72
+Recommended Value: 72
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+23. CHAINNCELLTYPE - Chain Neighbour Cell Type
+Parameter ID: CHAINNCELLTYPE
+Parameter Name: Chain Neighbour Cell Type
+Meaning: Geographical relationship between neighboring cell and serving cell
+Value Type: Enumeration Type
+GUI Value Range: QUICK_HO_NCELL_TYPE_A, QUICK_HO_NCELL_TYPE_B
+Enumeration: QUICK_HO_NCELL_TYPE_A~0, QUICK_HO_NCELL_TYPE_B~1
+Default Value: QUICK_HO_NCELL_TYPE_A
+Recommended Value: QUICK_HO_NCELL_TYPE_A
+Mandatory: NO
+Feature: Chain Cell Handover (GBFD-510103)
+
+24. EDGEADJSTATTIME - Edge HO AdjCell Watch Time
+Parameter ID: EDGEADJSTATTIME
+Parameter Name: Edge HO AdjCell Watch Time
+Meaning: Number N in P/N rule for edge handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 6
+Recommended Value: 6
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+25. EDGEADJLASTTIME - Edge HO AdjCell Valid Time
+Parameter ID: EDGEADJLASTTIME
+Parameter Name: Edge HO AdjCell Valid Time
+Meaning: Number P in P/N rule for edge handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 4
+Recommended Value: 4
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+26. LEVSTAT - Layer HO Watch Time
+Parameter ID: LEVSTAT
+Parameter Name: Layer HO Watch Time
+Meaning: N in P/N criteria for inter-layer handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 6
+Recommended Value: 6
+Mandatory: NO
+Feature: HUAWEI I Handover (GBFD-110601)
+
+27. LEVLAST - Layer HO Valid Time
+Parameter ID: LEVLAST
+Parameter Name: Layer HO Valid Time
+Meaning: P in P/N criteria for inter-layer handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 4
+Recommended Value: 4
+Mandatory: NO
+Feature: HUAWEI I Handover (GBFD-110601)
+
+28. PBGTSTAT - PBGT Watch Time
+Parameter ID: PBGTSTAT
+Parameter Name: PBGT Watch Time
+Meaning: N in P/N criteria for PBGT handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 6
+Recommended Value: 6
+Mandatory: NO
+Feature: HUAWEI I Handover (GBFD-110601)
+
+29. PBGTLAST - PBGT Valid Time
+Parameter ID: PBGTLAST
+Parameter Name: PBGT Valid Time
+Meaning: P in P/N criteria for PBGT handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 4
+Recommended Value: 4
+Mandatory: NO
+Feature: HUAWEI I Handover (GBFD-110601)
+
+30. BETTERCELLSTATTIME - Better Cell HO Watch Time
+Parameter ID: BETTERCELLSTATTIME
+Parameter Name: Better Cell HO Watch Time
+Meaning: N in P/N rule for better cell handover measurement period
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 6
+Recommended Value: 6
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+31. BETTERCELLLASTTIME - Better Cell HO Valid Time
+Parameter ID: BETTERCELLLASTTIME
+Parameter Name: Better Cell HO Valid Time
+Meaning: P in P/N rule for better cell handover conditions
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 4
+Recommended Value: 4
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+32. HOSTATICTIME - Quick Handover Static Time
+Parameter ID: HOSTATICTIME
+Parameter Name: Quick Handover Static Time
+Meaning: Number N in P/N rule for fast handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 4
+Recommended Value: 4
+Mandatory: NO
+Feature: Fast Move Handover (GBFD-510102)
+
+33. HOLASTTIME - Quick Handover Last Time
+Parameter ID: HOLASTTIME
+Parameter Name: Quick Handover Last Time
+Meaning: Number P in P/N rule for fast handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~32
+Actual Value Range: 0.5~16
+Unit: 0.5s
+Default Value: 3
+Recommended Value: 3
+Mandatory: NO
+Feature: Fast Move Handover (GBFD-510102)
+
+34. HCSSTATTIME - HCS HO Watch Time
+Parameter ID: HCSSTATTIME
+Parameter Name: HCS HO Watch Time
+Meaning: Number N in P/N rule for handover to different micro cell due to fast movement
+Value Type: Interval Type
+GUI Value Range: 1~16
+Actual Value Range: 0.5~8
+Unit: 0.5s
+Default Value: 3
+Recommended Value: 3
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+35. HCSLASTTIME - HCS HO Valid Time
+Parameter ID: HCSLASTTIME
+Parameter Name: HCS HO Valid Time
+Meaning: Number P in P/N rule for handover to different micro cell due to fast movement
+Value Type: Interval Type
+GUI Value Range: 1~16
+Actual Value Range: 0.5~8
+Unit: 0.5s
+Default Value: 2
+Recommended Value: 2
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+36. BQSTATTIME - BQ HO Watch Time
+Parameter ID: BQSTATTIME
+Parameter Name: BQ HO Watch Time
+Meaning: Number N in P/N rule for emergency BQ handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~16
+Actual Value Range: 0.5~8
+Unit: 0.5s
+Default Value: 1
+Recommended Value: 1
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+37. BQLASTTIME - BQ HO Valid Time
+Parameter ID: BQLASTTIME
+Parameter Name: BQ HO Valid Time
+Meaning: Number P in P/N rule for emergency BQ handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~16
+Actual Value Range: 0.5~8
+Unit: 0.5s
+Default Value: 1
+Recommended Value: 1
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+38. TASTATTIME - TA HO Watch Time
+Parameter ID: TASTATTIME
+Parameter Name: TA HO Watch Time
+Meaning: N in P/N criterion for TA handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~16
+Actual Value Range: 0.5~0.8
+Unit: 0.5s
+Default Value: 1
+Recommended Value: 1
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+39. TALASTTIME - TA HO Valid Time
+Parameter ID: TALASTTIME
+Parameter Name: TA HO Valid Time
+Meaning: P in P/N criterion for TA handover triggering
+Value Type: Interval Type
+GUI Value Range: 1~16
+Actual Value Range: 0.5~8
+Unit: 0.5s
+Default Value: 1
+Recommended Value: 1
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+40. ULBQSTATTIME - UL BQ HO Static Time
+Parameter ID: ULBQSTATTIME
+Parameter Name: UL BQ HO Static Time
+Meaning: N in P/N rule for handovers without downlink measurement report
+Value Type: Interval Type
+GUI Value Range: 1~8
+Actual Value Range: 0.5~4
+Unit: 0.5s
+Default Value: 1
+Recommended Value: 1
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+41. ULBQLASTTIME - UL BQ HO Last Time
+Parameter ID: ULBQLASTTIME
+Parameter Name: UL BQ HO Last Time
+Meaning: P in P/N rule for handovers without downlink measurement report
+Value Type: Interval Type
+GUI Value Range: 1~8
+Actual Value Range: 0.5~4
+Unit: 0.5s
+Default Value: 1
+Recommended Value: 1
+Mandatory: NO
+Feature: HUAWEI II Handover (GBFD-510501)
+
+42. IBCADYNCMEASURENCELLALLOWED - IBCA Dyn Measure Neighbour Cell Flag
+Parameter ID: IBCADYNCMEASURENCELLALLOWED
+Parameter Name: IBCA Dyn Measure Neighbour Cell Flag
+Meaning: Flag indicating whether an IBCA neighboring cell is to be measured dynamically
+Value Type: Enumeration Type
+GUI Value Range: NO(No), YES(Yes)
+Enumeration: NO~0, YES~1
+Default Value: NO
+Recommended Value: YES for co-channel interference cells, NO for others
+Mandatory: NO
+Feature: IBCA (Interference Based Channel Allocation) (GBFD-117002)
+
+43. IBCARXLEVOFFSET - IBCA RxLev Offset
+Parameter ID: IBCARXLEVOFFSET
+Parameter Name: IBCA RxLev Offset
+Meaning: Estimates receive level of unmeasured IBCA neighboring cells
+Value Type: Interval Type
+GUI Value Range: 0~63
+Actual Value Range: 0~63
+Unit: dB
+Default Value: 4
+Recommended Value: 4
+Mandatory: NO
+Feature: IBCA (Interference Based Channel Allocation) (GBFD-117002)
+
+44. LOADHOPBGTMARGIN - Load HO PBGT Threshold
+Parameter ID: LOADHOPBGTMARGIN
+Parameter Name: Load HO PBGT Threshold
+Meaning: Threshold for triggering load-based PBGT handovers
+Value Type: Interval Type
+GUI Value Range: 0~127
+Actual Value Range: -64~63
+Unit: dB
+Default Value: 0
+Recommended Value: 0
+Mandatory: NO
+Feature: HUAWEI I Handover (GBFD-110601)
+
+45. NCELLPRI - Neighboring Cell Priority
+Parameter ID: NCELLPRI
+Parameter Name: Neighboring Cell Priority
+Meaning: Priority of neighboring cell (0=lowest, 7=highest, 255=invalid)
+Value Type: Interval Type
+GUI Value Range: 0~7, 255
+Actual Value Range: 0~7, 255
+Default Value: 255
+Recommended Value: None
+Mandatory: NO
+Feature: Basic Cell Re-selection (GBFD-110402)
+
+46. EDOUTHOOFFSET - Enhanced Outgoing Cell Handover Offset
+Parameter ID: EDOUTHOOFFSET
+Parameter Name: Enhanced Outgoing Cell Handover Offset
+Meaning: Level offset for serving cell when handovers to edge of neighboring cell are triggered. Actual value = GUI value - 64
+Value Type: Interval Type
+GUI Value Range: 0~127
+Actual Value Range: -64~63
+Default Value: 64
+Recommended Value: 64
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+47. NCELLPUNEN - Neighboring Cell Penalty Switch
+Parameter ID: NCELLPUNEN
+Parameter Name: Neighboring Cell Penalty Switch
+Meaning: Whether to perform penalties in neighboring cell during handovers to prevent ping-pong handover
+Value Type: Enumeration Type
+GUI Value Range: NO(No), YES(Yes)
+Enumeration: NO~0, YES~1
+Default Value: NO
+Recommended Value: NO
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+48. NCELLPUNSTPTH - Penalty Stop Level Threshold
+Parameter ID: NCELLPUNSTPTH
+Parameter Name: Penalty Stop Level Threshold
+Meaning: Level threshold to stop penalty timer in neighboring cell
+Value Type: Interval Type
+GUI Value Range: 0~63
+Actual Value Range: 0~63
+Unit: dB
+Default Value: 20
+Recommended Value: 20
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+49. NCELLPUNTM - Penalty Timer Length
+Parameter ID: NCELLPUNTM
+Parameter Name: Penalty Timer Length
+Meaning: Length of timer for performing penalties in neighboring cell
+Value Type: Interval Type
+GUI Value Range: 0~255
+Actual Value Range: 0~255
+Unit: s
+Default Value: 10
+Recommended Value: 10
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+50. NCELLPUNLEV - Level Penalty Value on Neighboring Cell
+Parameter ID: NCELLPUNLEV
+Parameter Name: Level Penalty Value on Neighboring Cell
+Meaning: Level for penalties in neighboring cell during handovers
+Value Type: Interval Type
+GUI Value Range: 0~63
+Actual Value Range: 0~63
+Unit: dB
+Default Value: 10
+Recommended Value: 10
+Mandatory: NO
+Features: HUAWEI I Handover (GBFD-110601), HUAWEI II Handover (GBFD-510501)
+
+
+
+
+
+
+## 7. Règles de réponse 
+- Donner des **recommandations courtes et claires**  
+- Utiliser **uniquement des puces** (•)  
+- Optimiser **1 à 2 paramètres maximum** à la fois  
+- **Si valeur actuelle connue** :  
+  1. **Nom du paramètre**  
+  2. **Valeur actuelle → valeur recommandée**  
+  3. **Justification technique** *(raison détaillée expliquant le contexte et les effets attendus)*  
+  4. **Impact attendu** *(1 phrase)*  
+- **Si valeur actuelle inconnue** :  
+  1. **Nom du paramètre**  
+  2. **Justification technique** *(1 phrase)*  
+  3. **Action requise** : “Veuillez fournir la valeur actuelle pour recommander un ajustement.”  
+- **Pas** de paragraphes, pas d’introduction ni conclusion
+
+
+Format de réponse :
+• Valeur connue :
+
+<Nom paramètre> (Cell ID X → Neighbor Cell ID Y) : <valeur actuelle> → <valeur recommandée>
+
+Justification : <raison technique détaillée expliquant pourquoi ce changement est recommandé, avec contexte et effets attendus>
+
+Impact attendu : <impact en 1 phrase>
+• Valeur inconnue :
+
+<Nom paramètre> (Cell ID X → Neighbor Cell ID Y)
+
+Justification : <raison technique en 1 phrase>
+
+Action requise : Veuillez fournir la valeur actuelle pour recommander un ajustement.
+
+
+
+
+## 9. Exemple de réponse
+**Valeur connue :**  
+• Penalty Stop Level Threshold (Cell ID 202 et Neighbor 2G Cell ID 201) : 20 -> 25  
+  - Justification : Augmente la robustesse du handover en cas de perte rapide de signal, réduisant les risques de coupure sur les zones à forte vitesse.  
+  - Impact attendu : Moins de coupures et meilleure continuité des communications sur le trajet Tanger → Kénitra.  
+
+**Valeur inconnue :**  
+• PBGT HO Threshold (Source Cell ID 202 -> Neighbor 2G Cell ID 201)  
+  - Justification : Améliore la précision du déclenchement du handover pour éviter les échecs de connexion.  
+  - Action requise : Veuillez fournir la valeur actuelle pour recommander un ajustement.  
+
+"""
+
+BASE_PROMPT_HASH = hashlib.sha256(BASE_PROMPT.encode("utf-8")).hexdigest()
+
+# --- Shared resources ---
+def resource(func):
+    # Built once per process under a lock and shared by every Streamlit
+    # session, API request and batch worker
+    lock = threading.Lock()
+    cached = functools.cache(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return cached(*args, **kwargs)
+    wrapper.cache_clear = cached.cache_clear
+    return wrapper
+
+# --- LLM backend ---
+@resource
+def get_backend():
+    if LLM_BACKEND == "stub":
+        return StubBackend(
+            latency=STUB_LATENCY, error_rate=STUB_ERROR_RATE, errors=STUB_ERRORS.split(","), seed=STUB_SEED,
+        )
+    if LLM_BACKEND == "http":
+        return HTTPBackend(LLM_BACKEND_URL)
+    return GeminiBackend(GEMINI_API_KEY, BASE_PROMPT, CONTEXT_CACHE_TTL, warmup_timeout=GEMINI_TIMEOUT)
+
+@resource
+def warmup_llm(model_name=GEMINI_MODEL):
+    return get_backend().warmup(model_name)
+
+@resource
+def get_parameter_catalog(prompt_hash=BASE_PROMPT_HASH):
+    return ParameterCatalog.from_prompt(BASE_PROMPT)
+
+@resource
+def get_topology(prompt_hash=BASE_PROMPT_HASH):
+    return LineTopology.from_prompt(BASE_PROMPT)
+
+@resource
+def get_offtopic_gate(prompt_hash=BASE_PROMPT_HASH):
+    return OffTopicGate(get_parameter_catalog().ids, threshold=OFFTOPIC_THRESHOLD)
+
+@resource
+def get_parameter_index(prompt_hash=BASE_PROMPT_HASH):
+    return ParameterIndex(BASE_PROMPT, get_parameter_catalog(), top_k=PROMPT_TOP_K)
+
+@functools.lru_cache(maxsize=256)
+def prune_prompt(user_prompt):
+    # Only the relevant parameter blocks and the affected sites with their
+    # neighbours, or None to use the full cached prompt
+    if not PROMPT_PRUNING:
+        return None
+    pruned = get_parameter_index().prune(user_prompt)
+    sites = get_topology().extract(user_prompt).sites
+    if not sites:
+        return pruned
+    prompt = get_topology().inject(pruned.prompt if pruned else BASE_PROMPT, sites)
+    parameter_ids = pruned.parameter_ids if pruned else list(get_parameter_catalog().ids)
+    return PrunedPrompt(prompt, parameter_ids, estimate_tokens(BASE_PROMPT), estimate_tokens(prompt), sites)
+
+def system_prompt_for_query(user_prompt):
+    # Slim system instruction with only the relevant parameter blocks when
+    # retrieval is confident, otherwise the full (context-cached) prompt
+    pruned = prune_prompt(user_prompt)
+    return BASE_PROMPT if pruned is None else pruned.prompt
+
+@resource
+def get_kpi_engine():
+    if not KPI_COUNTERS_PATH or not Path(KPI_COUNTERS_PATH).is_file():
+        return None
+    return HandoverKpis.from_file(KPI_COUNTERS_PATH, get_topology(), bucket=KPI_BUCKET, min_attempts=KPI_MIN_ATTEMPTS)
+
+@resource
+def get_neighbour_config():
+    if not MML_DUMP_PATH or not Path(MML_DUMP_PATH).exists():
+        return None
+    return NeighbourConfig.from_path(MML_DUMP_PATH, get_parameter_catalog())
+
+@resource
+def get_rule_engine():
+    return RuleEngine(get_parameter_catalog(), tolerance=RULES_TOLERANCE)
+
+@resource
+def get_config_findings():
+    # {(source, neighbour): findings} of the whole MML dump, swept once per process
+    config = get_neighbour_config()
+    return get_rule_engine().sweep(config.frame) if config is not None else {}
+
+QUERY_RULES = ("recommended", "pn")
+
+def rule_answer(user_prompt):
+    """Section 7 answer from the rule engine when the parameters the query names break a rule, else None.
+
+    Values are those of the relation the query writes ("205 -> 206") in
+    the MML dump, overridden by the values the query states itself
+    ("PBGTMARGIN = 80"). Out-of-range values never get here: validate_query
+    rejects them first, so the range rule is left to the dump sweep.
+    """
+    if not LOCAL_RULES:
+        return None
+    parameter_ids = get_parameter_catalog().mentioned(user_prompt)
+    if not parameter_ids:
+        return None
+    relation = get_topology().relation(user_prompt)
+    config = get_neighbour_config()
+    values = dict(config.values(*relation)) if relation and config is not None else {}
+    values.update(query_entities(user_prompt).parameters)
+    if not values:
+        return None
+    engine = get_rule_engine()
+    findings = engine.check(values, *(relation or (None, None)), parameter_ids=parameter_ids, rules=QUERY_RULES)
+    return engine.answer(findings) if findings else None
+
+def query_cells(user_prompt):
+    # Cells named in the query, and the cells of the sites it names
+    entities = query_entities(user_prompt)
+    return sorted(set(entities.cells) | {c for site in entities.sites for c in get_topology().sites[site]})
+
+@functools.lru_cache(maxsize=256)
+def kpi_context(user_prompt):
+    engine = get_kpi_engine()
+    if engine is None:
+        return ""
+    return engine.context(query_cells(user_prompt), limit=KPI_CONTEXT_RELATIONS)
+
+@functools.lru_cache(maxsize=256)
+def config_context(user_prompt):
+    # Current values of the parameters the query names, else of those retrieval kept
+    config = get_neighbour_config()
+    if config is None:
+        return ""
+    catalog = get_parameter_catalog()
+    pruned = prune_prompt(user_prompt)
+    parameter_ids = catalog.mentioned(user_prompt) or (pruned.parameter_ids if pruned else [])
+    return config.context(query_cells(user_prompt), parameter_ids, catalog, limit=KPI_CONTEXT_RELATIONS)
+
+def model_prompt(user_prompt):
+    # The query, then what is configured and measured on the cells it names
+    contexts = [c for c in (config_context(user_prompt), kpi_context(user_prompt)) if c]
+    return "\n\n".join([f"User Query: {user_prompt}", *contexts])
+
+def answers_hash(prompt_hash=BASE_PROMPT_HASH):
+    # Answers depend on the prompt and on the counters and configuration they were given
+    versions = [source.version for source in (get_kpi_engine(), get_neighbour_config()) if source is not None]
+    if not versions:
+        return prompt_hash
+    return hashlib.sha256(":".join([prompt_hash, *versions]).encode("utf-8")).hexdigest()
+
+@resource
+def get_model_router():
+    tiers = {STRONG: GEMINI_MODEL}
+    if MODEL_ROUTING and GEMINI_FAST_MODEL and GEMINI_FAST_MODEL != GEMINI_MODEL:
+        tiers[FAST] = GEMINI_FAST_MODEL
+    return ModelRouter(tiers, slow_after=ROUTER_SLOW_AFTER)
+
+@functools.lru_cache(maxsize=256)
+def query_entities(user_prompt):
+    return get_topology().extract(user_prompt, get_parameter_catalog())
+
+def route_query(user_prompt):
+    return classify_complexity(
+        user_prompt, query_entities(user_prompt), get_parameter_catalog().mentioned(user_prompt)
+    )
+
+@resource
+def get_response_cache():
+    return ResponseCache(RESPONSE_CACHE_PATH, max_rows=RESPONSE_CACHE_MAX_ROWS)
+
+@resource
+def get_semantic_cache(model_name=GEMINI_MODEL, prompt_hash=BASE_PROMPT_HASH):
+    # Seeded from the persistent history so paraphrase hits survive restarts
+    cache = SemanticCache(
+        threshold=SEMANTIC_CACHE_THRESHOLD, topology=get_topology(), catalog=get_parameter_catalog(),
+        max_size=RESPONSE_CACHE_MAX_ROWS,
+    )
+    cache.add_many(get_response_cache().history(model_name, answers_hash(prompt_hash)))
+    return cache
+
+@resource
+def get_admission_queue():
+    return AdmissionQueue(GEMINI_RPM, GEMINI_TPM, max_wait=GEMINI_QUEUE_MAX_WAIT)
+
+@resource
+def get_resilient_caller():
+    return ResilientCaller(
+        deadline=GEMINI_DEADLINE, retries=GEMINI_RETRIES, hedge=GEMINI_HEDGE, hedge_delay=GEMINI_HEDGE_DELAY
+    )
+
+@resource
+def get_singleflight():
+    # Identical queries in flight at the same time share one upstream call
+    return SingleFlight()
+
+@resource
+def get_async_singleflight():
+    return AsyncSingleFlight()
+
+@resource
+def get_tracer():
+    tracer = Tracer(TRACE_LOG_PATH or None, max_bytes=TRACE_LOG_MAX_BYTES, backups=TRACE_LOG_BACKUPS)
+    tracer.gauge("queue_waiting", lambda: len(get_admission_queue()))
+    tracer.gauge("response_cache_hit_ratio", lambda: get_response_cache().summary()["hit_rate"])
+    return tracer
+
+@resource
+def get_word_exporter():
+    return WordExporter(cache_size=EXPORT_CACHE_SIZE)
+
+@resource
+def start_metrics_endpoint():
+    return start_metrics_server(get_tracer(), port=METRICS_PORT) if METRICS_PORT else None
+
+def estimate_request_tokens(user_prompt):
+    # What the call will draw from the tokens-per-minute budget, settled later
+    pruned = prune_prompt(user_prompt)
+    system_tokens = pruned.pruned_tokens if pruned else estimate_tokens(BASE_PROMPT)
+    return system_tokens + estimate_tokens(model_prompt(user_prompt)) + EXPECTED_OUTPUT_TOKENS
+
+def attempt_timeout(ticket, timeout):
+    return max(1.0, min(GEMINI_TIMEOUT, timeout - ticket.waited))
+
+def usage_attrs(completion, model_name):
+    # Token counts of a completion for its span, also added to the token counters
+    if completion is None:
+        return {}
+    attrs = {
+        "input_tokens": completion.input_tokens,
+        "output_tokens": completion.output_tokens,
+        "cached_tokens": completion.cached_tokens,
+    }
+    for kind, count in attrs.items():
+        get_tracer().count("tokens_total", count, kind=kind.removesuffix("_tokens"), model=model_name)
+    return attrs
+
+def used_tokens(completion, ticket):
+    return completion.total_tokens if completion and completion.total_tokens else ticket.tokens
+
+# --- Utils ---
+def response_key(user_prompt):
+    return make_cache_key(user_prompt, answers_hash(), GEMINI_MODEL)
+
+def get_local_response(user_prompt):
+    # Answers that need no API call: off-topic input, rule findings, exact and semantic cache hits
+    decision = get_offtopic_gate().check(user_prompt)
+    if decision.off_topic:
+        return cache_result("offtopic", decision.answer)
+    with get_tracer().span("rules"):
+        local = rule_answer(user_prompt)
+    if local is not None:
+        return cache_result("rules", local)
+    cached = get_response_cache().get(response_key(user_prompt))
+    if cached is not None:
+        return cache_result("exact", cached)
+    match = get_semantic_cache().lookup(user_prompt)
+    return cache_result("semantic", match[0]) if match else cache_result("miss", None)
+
+def cache_result(result, text):
+    get_tracer().count("cache_lookups_total", result=result)
+    get_tracer().annotate(cache=result)
+    return text
+
+def store_response(user_prompt, text):
+    get_response_cache().put(
+        response_key(user_prompt), text,
+        query=user_prompt, model_name=GEMINI_MODEL, prompt_hash=answers_hash(),
+    )
+    get_semantic_cache().add(user_prompt, text)
+
+def call_model(user_prompt, priority=ROUTINE, on_queue=None, timeout=GEMINI_TIMEOUT, model_name=GEMINI_MODEL):
+    # One call to one model; the time spent queued for quota counts against its timeout
+    tracer = get_tracer()
+    with tracer.span("prompt"):
+        system_prompt = system_prompt_for_query(user_prompt)
+        tokens = estimate_request_tokens(user_prompt)
+    queue = get_admission_queue()
+    ticket = queue.acquire(tokens, priority, on_queue, timeout)
+    tracer.record("queue_wait", ticket.waited)
+    try:
+        with tracer.span("upstream", model=model_name) as span:
+            completion = get_backend().generate(
+                model_name, system_prompt, model_prompt(user_prompt), attempt_timeout(ticket, timeout)
+            )
+            span.update(usage_attrs(completion, model_name))
+    except TooManyRequests:
+        queue.throttled()
+        raise
+    queue.settle(ticket, used_tokens(completion, ticket))
+    return completion.text
+
+def routing_plan(user_prompt, timeout):
+    # (tier, model name, seconds left) for each tier worth trying, best first
+    router = get_model_router()
+    end = time.monotonic() + timeout
+    for tier in router.plan(route_query(user_prompt).tier):
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return
+        yield tier, router.model_name(tier), remaining
+
+def keep_best(best, tier, text, started, user_prompt):
+    # Records a tier's answer; a poor one lets the next tier try
+    router = get_model_router()
+    quality = answer_quality(text, query_entities(user_prompt))
+    router.record(tier, time.monotonic() - started, quality=quality)
+    if best is None or quality > best[0]:
+        best = (quality, text)
+    return best, quality >= router.min_quality
+
+def settle_routed(user_prompt, best, error, timeout):
+    if best is None:
+        raise error or TimeoutError(f"Pas de réponse en {timeout:.0f}s")
+    store_response(user_prompt, best[1])
+    return best[1]
+
+def call_routed(user_prompt, priority=ROUTINE, on_queue=None, timeout=GEMINI_TIMEOUT):
+    # One attempt: the tier the query needs, then the others if it fails or answers poorly
+    best, error = None, None
+    for tier, model_name, remaining in routing_plan(user_prompt, timeout):
+        started = time.monotonic()
+        try:
+            text = call_model(user_prompt, priority, on_queue, remaining, model_name)
+        except Exception as e:
+            get_model_router().record(tier, error=e)
+            error = e
+            continue
+        best, good = keep_best(best, tier, text, started, user_prompt)
+        if good:
+            break
+    return settle_routed(user_prompt, best, error, timeout)
+
+def analyze(user_prompt, priority=ROUTINE, on_queue=None, deadline=None, retries=None):
+    # Raises AnalysisError on upstream failures; callers decide how to report them.
+    # on_queue(position) is called while the request waits for quota.
+    cached = get_local_response(user_prompt)
+    if cached is not None:
+        return cached
+    caller = get_resilient_caller()
+    return get_singleflight().do(
+        response_key(user_prompt),
+        lambda: caller.call(lambda timeout: call_routed(user_prompt, priority, on_queue, timeout), deadline, retries),
+    )
+
+async def call_model_async(user_prompt, priority=ROUTINE, timeout=GEMINI_TIMEOUT, model_name=GEMINI_MODEL):
+    tracer = get_tracer()
+    with tracer.span("prompt"):
+        system_prompt = system_prompt_for_query(user_prompt)
+        tokens = estimate_request_tokens(user_prompt)
+    queue = get_admission_queue()
+    ticket = await queue.acquire_async(tokens, priority, timeout=timeout)
+    tracer.record("queue_wait", ticket.waited)
+    try:
+        with tracer.span("upstream", model=model_name) as span:
+            completion = await get_backend().generate_async(
+                model_name, system_prompt, model_prompt(user_prompt), attempt_timeout(ticket, timeout)
+            )
+            span.update(usage_attrs(completion, model_name))
+    except TooManyRequests:
+        queue.throttled()
+        raise
+    queue.settle(ticket, used_tokens(completion, ticket))
+    return completion.text
+
+async def call_routed_async(user_prompt, priority=ROUTINE, timeout=GEMINI_TIMEOUT):
+    best, error = None, None
+    for tier, model_name, remaining in routing_plan(user_prompt, timeout):
+        started = time.monotonic()
+        try:
+            text = await call_model_async(user_prompt, priority, remaining, model_name)
+        except Exception as e:
+            get_model_router().record(tier, error=e)
+            error = e
+            continue
+        best, good = keep_best(best, tier, text, started, user_prompt)
+        if good:
+            break
+    # Storing writes to SQLite; keep it off the event loop
+    return await asyncio.to_thread(settle_routed, user_prompt, best, error, timeout)
+
+async def analyze_async(user_prompt, priority=ROUTINE, deadline=None):
+    # Same path as analyze() on the SDK's asyncio client; AnalysisError
+    # propagates so the API can map it to an HTTP status
+    cached = await asyncio.to_thread(get_local_response, user_prompt)
+    if cached is not None:
+        return cached
+    caller = get_resilient_caller()
+    return await get_async_singleflight().do(
+        response_key(user_prompt),
+        lambda: caller.call_async(lambda timeout: call_routed_async(user_prompt, priority, timeout), deadline),
+    )
+
+def validate_query(user_prompt):
+    # Out-of-range parameter values and Cell IDs that do not exist on the line
+    with get_tracer().span("validation") as span:
+        catalog = get_parameter_catalog()
+        entities = query_entities(user_prompt)
+        errors = [catalog.validate(pid, value) for pid, value in entities.parameters]
+        errors += [f"Cell ID inconnu : {cell_id}" for cell_id in entities.unknown_cells]
+        span["invalid"] = sum(1 for error in errors if error)
+    return [error for error in errors if error]
+
+def stream_model(user_prompt, priority=ROUTINE, on_queue=None, timeout=GEMINI_TIMEOUT, model_name=GEMINI_MODEL):
+    tracer = get_tracer()
+    with tracer.span("prompt"):
+        system_prompt = system_prompt_for_query(user_prompt)
+        tokens = estimate_request_tokens(user_prompt)
+    queue = get_admission_queue()
+    ticket = queue.acquire(tokens, priority, on_queue, timeout)
+    tracer.record("queue_wait", ticket.waited)
+    started, first = time.perf_counter(), True
+    try:
+        chunks = get_backend().stream(
+            model_name, system_prompt, model_prompt(user_prompt), attempt_timeout(ticket, timeout)
+        )
+        chunk = None
+        for chunk in chunks:
+            if chunk.text:
+                if first:
+                    tracer.record("ttft", time.perf_counter() - started, model=model_name)
+                    first = False
+                yield chunk.text
+    except TooManyRequests:
+        queue.throttled()
+        raise
+    # The last chunk carries the usage of the whole answer
+    tracer.record("upstream", time.perf_counter() - started, model=model_name, **usage_attrs(chunk, model_name))
+    queue.settle(ticket, used_tokens(chunk, ticket))
+
+def stream_routed(user_prompt, priority=ROUTINE, on_queue=None, timeout=GEMINI_TIMEOUT):
+    # call_routed() for streams: a tier failing before its first chunk lets the
+    # next one try. Once chunks are shown the answer is kept whatever its quality.
+    router = get_model_router()
+    error = None
+    for tier, model_name, remaining in routing_plan(user_prompt, timeout):
+        started = time.monotonic()
+        chunks = stream_model(user_prompt, priority, on_queue, remaining, model_name)
+        try:
+            first = next(chunks, None)
+        except Exception as e:
+            router.record(tier, error=e)
+            error = e
+            continue
+        parts = [] if first is None else [first]
+        try:
+            yield from parts
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            router.record(tier, error=e)
+            raise
+        text = "".join(parts)
+        router.record(tier, time.monotonic() - started, quality=answer_quality(text, query_entities(user_prompt)))
+        return
+    raise error or TimeoutError(f"Pas de réponse en {timeout:.0f}s")
+
+def stream_gemini_response(user_prompt, priority=ROUTINE, on_queue=None):
+    # Yields the answer chunk by chunk as Gemini produces it. A query already
+    # in flight elsewhere is not sent twice: its full answer arrives in one chunk.
+    # Failures before the first chunk fall back to the next tier, then are
+    # retried; all surface as AnalysisError.
+    caller = get_resilient_caller()
+    return get_singleflight().do_stream(
+        response_key(user_prompt),
+        lambda: caller.stream(lambda timeout: stream_routed(user_prompt, priority, on_queue, timeout)),
+    )
+
+def export_to_word(text):
+    # .docx bytes, built once per distinct text; reruns get the cached copy
+    exporter = get_word_exporter()
+    with get_tracer().span("export", cached=text in exporter):
+        return exporter.export(text)
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+import analyzer
+from resilience import classify
+from tracing import PROMETHEUS_CONTENT_TYPE
+
+API_MAX_CONCURRENCY = analyzer.setting("API_MAX_CONCURRENCY", 64, int)
+# AnalysisError codes; anything else is a 502
+ERROR_STATUS = {"timeout": 504, "rate_limited": 429, "queue_timeout": 429, "unavailable": 503}
+DOCX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# --- Handlers ---
+async def read_json(request):
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "invalid JSON body"}), content_type="application/json")
+    if not isinstance(payload, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "expected a JSON object"}), content_type="application/json")
+    return payload
+
+def text_field(payload, name):
+    value = payload.get(name, "")
+    if not isinstance(value, str):
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"{name} must be a string"}), content_type="application/json")
+    return value
+
+async def analyze(request):
+    payload = await read_json(request)
+    query = text_field(payload, "query")
+    if not query.strip():
+        return web.json_response({"error": "query is empty"}, status=400)
+    with analyzer.get_tracer().trace("api"):
+        return await analyze_query(request, query)
+
+async def analyze_query(request, query):
+    errors = analyzer.validate_query(query)
+    if errors:
+        return web.json_response({"error": "invalid query", "details": errors}, status=422)
+    # Bounds concurrent upstream calls; waiting requests queue here
+    async with request.app["semaphore"]:
+        try:
+            result = await analyzer.analyze_async(query)
+        except Exception as e:
+            error = classify(e)
+            return web.json_response(
+                {"error": error.message, **error.to_dict()}, status=ERROR_STATUS.get(error.code, 502)
+            )
+    return web.json_response({"query": query, "result": result})
+
+async def export_docx(request):
+    payload = await read_json(request)
+    text = text_field(payload, "text")
+    if not text.strip():
+        return web.json_response({"error": "text is empty"}, status=400)
+    # python-docx is CPU-bound; keep it off the event loop
+    data = await asyncio.to_thread(analyzer.export_to_word, text)
+    return web.Response(
+        body=data,
+        content_type=DOCX_CONTENT_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="GSMR_Report.docx"'},
+    )
+
+async def metrics(request):
+    return web.Response(text=analyzer.get_tracer().prometheus(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+async def health(request):
+    return web.json_response({
+        "status": "ok",
+        "backend": analyzer.LLM_BACKEND,
+        "model": analyzer.GEMINI_MODEL,
+        "tiers": analyzer.get_model_router().summary(),
+    })
+
+async def warmup(app):
+    if analyzer.LLM_CONFIGURED:
+        await asyncio.to_thread(analyzer.warmup_llm)
+
+# --- App ---
+def create_app(max_concurrency=API_MAX_CONCURRENCY):
+    app = web.Application()
+    app["semaphore"] = asyncio.Semaphore(max_concurrency)
+    app.router.add_post("/analyze", analyze)
+    app.router.add_post("/export/docx", export_docx)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    app.on_startup.append(warmup)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless GSM-R disconnection analysis API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=API_MAX_CONCURRENCY)
+    args = parser.parse_args()
+    web.run_app(create_app(args.max_concurrency), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
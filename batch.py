@@ -0,0 +1,214 @@
+import argparse
+import csv
+import hashlib
+import io
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import analyzer
+from rate_limit import BATCH
+from resilience import classify
+from word_export import write_bulk_report
+
+QUERY_COLUMNS = ("query", "description", "event", "text", "message")
+ID_COLUMNS = ("id", "event_id")
+BATCH_DIR = analyzer.setting("BATCH_DIR", "batch_runs")
+BATCH_DEADLINE = analyzer.setting("BATCH_DEADLINE", 300, float)
+RESULT_SCHEMA = pa.schema([(name, pa.string()) for name in ("id", "query", "status", "result", "error")])
+
+# --- Input ---
+def _pick(row, columns):
+    for column in columns:
+        if row.get(column) not in (None, ""):
+            return row[column]
+    return None
+
+def read_events(source, name=None):
+    """Yield {"id", "query"} dicts from a CSV or JSONL path or text stream, one at a time."""
+    name = str(name or source)
+    stream = open(source, encoding="utf-8", newline="") if isinstance(source, (str, Path)) else source
+    try:
+        if name.endswith(".csv"):
+            rows = csv.DictReader(stream)
+        else:
+            rows = (json.loads(line) for line in stream if line.strip())
+        for number, row in enumerate(rows, 1):
+            row = {str(k).lower(): v for k, v in row.items()}
+            yield {"id": str(_pick(row, ID_COLUMNS) or number), "query": str(_pick(row, QUERY_COLUMNS) or "")}
+    finally:
+        if stream is not source:
+            stream.close()
+
+def read_results(output_path):
+    # Latest record per event id; resumed runs append retries after failures
+    path = Path(output_path)
+    if not path.exists():
+        return {}
+    records = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # half-written line of a crashed run
+            records[record["id"]] = record
+    return records
+
+def iter_results(output_path):
+    # Same records as read_results, streamed: only the line number of the
+    # latest record per id is held, not the answers themselves
+    path = Path(output_path)
+    if not path.exists():
+        return
+    latest = {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            try:
+                latest[json.loads(line)["id"]] = number
+            except json.JSONDecodeError:
+                continue
+    keep = set(latest.values())
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            if number in keep:
+                yield json.loads(line)
+
+def completed_ids(output_path):
+    # Checkpoint: events settled in a previous run. An invalid query fails the
+    # same way every time; only upstream errors are worth retrying.
+    return {id_ for id_, record in read_results(output_path).items() if record.get("status") in ("ok", "invalid")}
+
+# --- Run ---
+@dataclass
+class BatchReport:
+    total: int = 0
+    ok: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    batches: list = field(default_factory=list)
+
+    @property
+    def throughput(self):
+        return self.total / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        return self.failed / self.total if self.total else 0.0
+
+def analyze_event(event, retries):
+    with analyzer.get_tracer().trace("batch", event_id=event["id"]):
+        return analyze_traced_event(event, retries)
+
+def analyze_traced_event(event, retries):
+    errors = analyzer.validate_query(event["query"])
+    if errors:
+        return {**event, "status": "invalid", "error": " ; ".join(errors)}
+    try:
+        # No operator is waiting: allow retries until the slower batch deadline
+        result = analyzer.analyze(event["query"], priority=BATCH, deadline=BATCH_DEADLINE, retries=retries)
+        return {**event, "status": "ok", "result": result}
+    except Exception as e:
+        error = classify(e)
+        return {**event, "status": "error", "error": f"{error.code}: {error.message}"}
+
+def run_batch(events, output_path, workers=8, retries=3, batch_size=50, on_batch=None):
+    """Analyze events on a bounded thread pool, appending each result to a JSONL checkpoint.
+
+    Events already marked "ok" in output_path are skipped, so rerunning the
+    same command resumes a crashed run. Only batch_size events are in flight
+    or buffered at any time.
+    """
+    done = completed_ids(output_path)
+    path = Path(output_path)
+    if path.exists() and path.stat().st_size and not path.read_bytes().endswith(b"\n"):
+        with open(path, "a", encoding="utf-8") as out:
+            out.write("\n")  # terminate the half-written line of a crashed run
+    report = BatchReport()
+    start = time.perf_counter()
+    events = iter(events)
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(output_path, "a", encoding="utf-8") as out:
+        while chunk := list(itertools.islice(events, batch_size)):
+            pending = [e for e in chunk if e["id"] not in done]
+            report.skipped += len(chunk) - len(pending)
+            batch_start = time.perf_counter()
+            failed = 0
+            futures = [pool.submit(analyze_event, event, retries) for event in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                failed += record["status"] != "ok"
+            elapsed = time.perf_counter() - batch_start
+            stats = {
+                "events": len(pending),
+                "failed": failed,
+                "seconds": elapsed,
+                "throughput": len(pending) / elapsed if elapsed else 0.0,
+                "error_rate": failed / len(pending) if pending else 0.0,
+            }
+            report.batches.append(stats)
+            report.total += len(pending)
+            report.failed += failed
+            report.ok += len(pending) - failed
+            if on_batch is not None:
+                on_batch(report, stats)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+def write_parquet(jsonl_path, parquet_path):
+    records = list(read_results(jsonl_path).values())
+    pq.write_table(pa.Table.from_pylist(records, schema=RESULT_SCHEMA), parquet_path)
+
+def write_docx(jsonl_path, docx_path):
+    return write_bulk_report(iter_results(jsonl_path), docx_path)
+
+def uploaded_checkpoint(data, directory=BATCH_DIR):
+    # Re-uploading the same file resumes its previous run
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    return Path(directory) / f"batch_{hashlib.sha1(data).hexdigest()[:12]}.jsonl"
+
+def read_uploaded_events(data, name):
+    return read_events(io.StringIO(data.decode("utf-8-sig")), name=name)
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a CSV/JSONL file of disconnection events")
+    parser.add_argument("events", help="CSV or JSONL file with a query/description column")
+    parser.add_argument("--output", required=True, help="JSONL results file, also the resume checkpoint")
+    parser.add_argument("--parquet", help="also write the results to this Parquet file at the end")
+    parser.add_argument("--docx", help="also write a consolidated Word report to this file at the end")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    def progress(report, stats):
+        print(
+            f"batch {len(report.batches)}: {stats['events']} events in {stats['seconds']:.1f}s "
+            f"({stats['throughput']:.2f}/s, {stats['error_rate']:.0%} errors) - "
+            f"total {report.ok} ok, {report.failed} failed, {report.skipped} resumed"
+        )
+
+    report = run_batch(
+        read_events(args.events), args.output,
+        workers=args.workers, retries=args.retries, batch_size=args.batch_size, on_batch=progress,
+    )
+    print(
+        f"done: {report.total} analyzed in {report.elapsed:.1f}s ({report.throughput:.2f}/s), "
+        f"{report.failed} failed ({report.error_rate:.0%}), {report.skipped} skipped from checkpoint"
+    )
+    if args.parquet:
+        write_parquet(args.output, args.parquet)
+    if args.docx:
+        write_docx(args.output, args.docx)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+BASELINE_PATH = ROOT / "benchmark_baseline.json"
+# Below this difference a slower timing is noise, not a regression
+NOISE_FLOOR = {"s": 0.002, "tokens": 0, "req/s": 0.0}
+
+SAMPLE_QUERIES = {
+    "single_parameter": "PBGTMARGIN 68 entre la cellule 205 -> 206, coupure d'appel",
+    "inter_layer": "Coupure lors du handover inter-couches entre 212 et 312 sens M1, puis retour sur la couche 2",
+    "site_range": "Ping-pong répété sur les sites 10 à 14, HOSTATICTIME et PBGTMARGIN à vérifier",
+    "free_text": "Le train perd la communication GSM-R peu après Kénitra, sans message d'erreur",
+}
+
+def bench_env(stub_latency, cache_dir):
+    # Offline, isolated settings; read by analyzer at import time
+    return {
+        **os.environ,
+        "LLM_BACKEND": "stub",
+        "STUB_LATENCY": stub_latency,
+        "STUB_ERROR_RATE": "0",
+        "RESPONSE_CACHE_PATH": str(Path(cache_dir) / "bench_responses.sqlite3"),
+        "TRACE_LOG_PATH": "",
+        "METRICS_PORT": "0",
+        "KPI_COUNTERS_PATH": "",
+        "MML_DUMP_PATH": "",
+        # Queries carrying off-recommendation values would be answered without the model
+        "LOCAL_RULES": "0",
+        # Measure the pipeline, not the Gemini quota
+        "GEMINI_RPM": "1000000",
+        "GEMINI_TPM": "1000000000",
+    }
+
+def metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0.0
+
+# --- Benchmarks ---
+def bench_import(env, repeat):
+    """Cold import of Interf.py (and with it analyzer) in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import Interf; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return {"import.interf": metric(statistics.median(samples), "s")}
+
+def bench_prompt(analyzer, repeat):
+    """Prompt assembly cost (pruning, topology injection) and its size per query variant."""
+    results = {}
+    full_tokens = analyzer.estimate_tokens(analyzer.BASE_PROMPT)
+    results["tokens.full_prompt"] = metric(full_tokens, "tokens")
+    for name, query in SAMPLE_QUERIES.items():
+        def build():
+            analyzer.prune_prompt.cache_clear()
+            analyzer.query_entities.cache_clear()
+            analyzer.system_prompt_for_query(query)
+            analyzer.estimate_request_tokens(query)
+        build()  # first call builds the shared catalog, index and topology
+        results[f"prompt.build.{name}"] = metric(timed(build, repeat), "s")
+        system_prompt = analyzer.system_prompt_for_query(query)
+        results[f"tokens.prompt.{name}"] = metric(analyzer.estimate_tokens(system_prompt), "tokens")
+    return results
+
+def bench_export(analyzer, repeat):
+    answer = analyzer.get_backend().answer(SAMPLE_QUERIES["single_parameter"])
+    reports = {"short": answer, "long": "\n\n".join([answer] * 200)}
+    # export_to_word is memoized by content: a new reference line per repeat keeps every export a build
+    runs = itertools.count()
+    return {
+        f"export.{name}": metric(
+            timed(lambda text=text: analyzer.export_to_word(f"{text}\n\nRéf. {next(runs)}"), repeat), "s"
+        )
+        for name, text in reports.items()
+    }
+
+def unique_query(number):
+    # Distinct numbers keep every request off the exact and semantic caches
+    cell = 201 + number % 32
+    return f"Événement {number} : coupure au handover de la cellule {cell} -> {cell + 1}, PBGTMARGIN {60 + number % 40}"
+
+def load_stats(name, latencies, errors, elapsed):
+    return {
+        f"{name}.p50": metric(percentile(latencies, 0.50), "s"),
+        f"{name}.p95": metric(percentile(latencies, 0.95), "s"),
+        f"{name}.p99": metric(percentile(latencies, 0.99), "s"),
+        f"{name}.throughput": metric(len(latencies) / elapsed if elapsed else 0.0, "req/s", "higher"),
+        f"{name}.errors": metric(errors, "count"),
+    }
+
+def bench_load_threads(analyzer, clients, requests, first):
+    """The Streamlit and batch path: analyze() from `clients` threads."""
+    def one(number):
+        start = time.perf_counter()
+        try:
+            analyzer.analyze(unique_query(number))
+            return time.perf_counter() - start, False
+        except Exception:
+            return time.perf_counter() - start, True
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(one, range(first, first + requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [seconds for seconds, failed in outcomes if not failed]
+    return load_stats(f"e2e.threads.c{clients}", latencies, sum(failed for _, failed in outcomes), elapsed)
+
+def bench_load_async(analyzer, clients, requests, first):
+    """The API path: analyze_async() with at most `clients` requests in flight."""
+    async def main():
+        semaphore = asyncio.Semaphore(clients)
+
+        async def one(number):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await analyzer.analyze_async(unique_query(number))
+                    return time.perf_counter() - start, False
+                except Exception:
+                    return time.perf_counter() - start, True
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(one(n) for n in range(first, first + requests)))
+        return outcomes, time.perf_counter() - start
+
+    outcomes, elapsed = asyncio.run(main())
+    latencies = [seconds for seconds, failed in outcomes if not failed]
+    return load_stats(f"e2e.async.c{clients}", latencies, sum(failed for _, failed in outcomes), elapsed)
+
+# --- Baseline ---
+def compare(results, baseline, threshold):
+    """Metrics worse than the baseline by more than `threshold` (relative) and the noise floor."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        old, new = previous["value"], current["value"]
+        worse = new - old if current["better"] == "lower" else old - new
+        if worse <= NOISE_FLOOR.get(current["unit"], 0):
+            continue
+        # A zero baseline (no errors) has no relative change: any increase past the noise floor counts
+        if not old:
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} {current['unit']}")
+        elif worse / old > threshold:
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} {current['unit']} ({worse / old:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis path against the offline stub backend")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="JSON baseline to compare with")
+    parser.add_argument("--output", help="also write this run's results to this JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown that fails the run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--clients", default="1,10,100", help="concurrency levels")
+    parser.add_argument("--requests-per-client", type=int, default=5)
+    parser.add_argument("--stub-latency", default="fixed:0.05")
+    parser.add_argument("--skip-import", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = bench_env(args.stub_latency, cache_dir)
+        results = {} if args.skip_import else bench_import(env, args.repeat)
+        os.environ.update(env)
+        sys.path.insert(0, str(ROOT))
+        import analyzer
+
+        results.update(bench_prompt(analyzer, args.repeat))
+        results.update(bench_export(analyzer, args.repeat))
+        first = 0
+        for clients in (int(c) for c in args.clients.split(",")):
+            requests = max(20, clients * args.requests_per_client)
+            results.update(bench_load_threads(analyzer, clients, requests, first))
+            results.update(bench_load_async(analyzer, clients, requests, first + requests))
+            first += 2 * requests
+
+    for name, result in results.items():
+        print(f"{name:40} {result['value']:>12.4f} {result['unit']}")
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "stub_latency": args.stub_latency,
+        "metrics": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline or not baseline_path.exists():
+        baseline_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"baseline written to {baseline_path}")
+        return
+    regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8"))["metrics"], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        print("\n".join(f"  {line}" for line in regressions))
+        sys.exit(1)
+    print(f"no regression over {args.threshold:.0%} against {baseline_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+import argparse
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+STEP = 0.5  # seconds between measurement reports; the unit of the P/N times
+RXLEV_FLOOR = -110  # dBm of RXLEV 0, for level thresholds given as GUI values
+NO_SIGNAL = -150.0  # level of cells too far from the train to be measured
+# Criteria in decreasing priority: (watch time N, valid time P)
+CRITERIA = (("EDGEADJSTATTIME", "EDGEADJLASTTIME"), ("LEVSTAT", "LEVLAST"), ("PBGTSTAT", "PBGTLAST"))
+LEVELS = ("PBGTMARGIN", "INTERCELLHYST", "INTELEVHOHYST")
+PENALTY = ("NCELLPUNEN", "NCELLPUNTM", "NCELLPUNLEV", "NCELLPUNSTPTH")
+PARAMETERS = (*LEVELS, *(p for pair in CRITERIA for p in pair), *PENALTY)
+PBGT, HYST, LAYER_HYST = range(3)
+
+@dataclass
+class RadioModel:
+    """Propagation and the thresholds section 6 does not give.
+
+    Log-distance path loss with a Hata-like slope, log-normal shadowing
+    correlated along the track (Gudmundson) and between the two co-sited
+    layers, and the residual Rayleigh fading of a 0.5 s measurement average.
+
+    Calibration: 33 sites over the 186 km of the line (5.8 km apart) and
+    55 dBm EIRP put the mean level mid-way between sites at about -83 dBm,
+    above the -90 dBm edge level, as a GSM-R coverage design would. With
+    the recommended section 6 values a 320 km/h run then makes about one
+    handover per site boundary, a couple of ping-pongs and no drop, so
+    changes of margins, hysteresis, P/N times and penalties show up
+    against a clean baseline.
+    """
+    site_spacing_km: float = 5.8
+    track_offset_km: float = 0.05
+    eirp: float = 55.0
+    pl_1km: float = 122.0
+    exponent: float = 3.5
+    shadowing_sigma: float = 6.0
+    decorrelation_m: float = 100.0
+    site_correlation: float = 0.7
+    fading_sigma: float = 3.0
+    # Measurement reports averaged by the BSC (exponential filter, in reports)
+    filter_length: float = 4.0
+    # Cells further than this are not measured
+    horizon_km: float = 15.0
+    # Serving level below which edge handovers are considered
+    edge_level: float = -90.0
+    # Minimum level of the preferred layer to hand back to it
+    layer_level: float = -85.0
+    # Radio link failure: serving level below drop_level for drop_time seconds
+    drop_level: float = -102.0
+    drop_time: float = 2.0
+    pingpong_window: float = 10.0
+
+@dataclass
+class RunStats:
+    """Per-run counts of one batch of simulated runs."""
+    direction: str
+    speed_kmh: float
+    handovers: np.ndarray
+    ping_pongs: np.ndarray
+    drops: np.ndarray
+    inter_layer: np.ndarray
+    overrides: dict = field(default_factory=dict)
+
+    @property
+    def runs(self):
+        return len(self.handovers)
+
+    def merge(self, other):
+        return RunStats(
+            self.direction, self.speed_kmh,
+            *(np.concatenate([getattr(self, k), getattr(other, k)]) for k in ("handovers", "ping_pongs", "drops", "inter_layer")),
+            self.overrides,
+        )
+
+    def summary(self):
+        return {
+            "direction": self.direction,
+            "speed_kmh": self.speed_kmh,
+            "runs": self.runs,
+            "handovers": float(self.handovers.mean()),
+            "ping_pongs": float(self.ping_pongs.mean()),
+            "drops": float(self.drops.mean()),
+            "inter_layer": float(self.inter_layer.mean()),
+            "drop_free": float((self.drops == 0).mean()),
+            "overrides": self.overrides,
+        }
+
+class HandoverSimulator:
+    """Trains running the line through the section 6 handover logic.
+
+    Each 0.5 s step measures the cells near the train and, for the
+    serving cell's neighbours (same layer site +/- 1, other layer site and
+    site +/- 1), checks the edge, layer and PBGT criteria against their
+    P/N watch and valid times, hysteresis and the penalty on the cell just
+    left. Parameters are per relation: catalog defaults, then the MML dump,
+    then line-wide overrides. All runs of a batch advance together as
+    arrays; only the time loop is Python.
+    """
+
+    def __init__(self, topology, catalog, config=None, model=None):
+        self.model = model or RadioModel()
+        self.cell_ids = np.array(sorted(topology.cells))
+        index = {c: i for i, c in enumerate(self.cell_ids)}
+        cells = [topology[c] for c in self.cell_ids]
+        self.sites = np.array([c.site for c in cells])
+        self.layers = np.array([c.layer for c in cells])
+        self.directions = np.array([c.direction for c in cells])
+        self.positions = (self.sites - self.sites.min()) * self.model.site_spacing_km
+        site_ids = sorted(topology.sites)
+        self.site_index = np.searchsorted(site_ids, self.sites)
+        slots = []
+        for cell in cells:
+            other = next(l for l in topology.layers if l != cell.layer)
+            wanted = [(cell.site - 1, cell.layer), (cell.site + 1, cell.layer), (cell.site, other), (cell.site - 1, other), (cell.site + 1, other)]
+            slots.append([
+                index[topology.sites[s][topology.layers.index(l)]] if s in topology.sites else -1 for s, l in wanted
+            ])
+        self.slots = np.array(slots)
+        self.intra = np.array([True, True, False, False, False])
+        self.catalog = {p: catalog[p] for p in PARAMETERS}
+        # (parameter, source, neighbour) GUI values
+        self.base = np.empty((len(PARAMETERS), len(cells), len(cells)), dtype=np.float32)
+        for i, parameter_id in enumerate(PARAMETERS):
+            self.base[i] = self._gui(parameter_id, self.catalog[parameter_id].default)
+        if config is not None:
+            for (source, neighbour), values in config.frame.to_dict("index").items():
+                if source in index and neighbour in index:
+                    for i, parameter_id in enumerate(PARAMETERS):
+                        if values.get(parameter_id) is not None:
+                            self.base[i, index[source], index[neighbour]] = self._gui(parameter_id, values[parameter_id])
+
+    def _gui(self, parameter_id, value):
+        # Enumerations (NCELLPUNEN) as their numeric code
+        enumeration = self.catalog[parameter_id].enumeration
+        return enumeration.get(value, value) if enumeration else value
+
+    def values(self, overrides=None):
+        # (parameter, source, neighbour) GUI values with line-wide overrides
+        values = self.base.copy()
+        for parameter_id, value in (overrides or {}).items():
+            values[PARAMETERS.index(parameter_id)] = self._gui(parameter_id, value)
+        return values
+
+    def tables(self, overrides=None):
+        """Per-cell slot tables for one parameter set, in the units the step loop uses."""
+        by_id = dict(zip(PARAMETERS, self.values(overrides)))
+        rows = np.arange(len(self.cell_ids))[:, None]
+        slots = np.where(self.slots >= 0, self.slots, 0)
+        levels = np.stack([self.catalog[p].to_actual(by_id[p])[rows, slots] for p in LEVELS], axis=-1)
+        watch = np.stack([by_id[n][rows, slots] for n, _ in CRITERIA], axis=-1).astype(np.uint64)
+        valid = np.stack([by_id[p][rows, slots] for _, p in CRITERIA], axis=-1).astype(np.int64)
+        # Penalties are read for the relation from the new serving cell back to the cell left
+        penalty = np.stack([
+            by_id["NCELLPUNEN"] > 0,
+            by_id["NCELLPUNTM"] * self.catalog["NCELLPUNTM"].step,
+            by_id["NCELLPUNLEV"],
+            RXLEV_FLOOR + by_id["NCELLPUNSTPTH"],
+        ]).astype(np.float32)
+        return levels.astype(np.float32), (np.uint64(1) << watch) - np.uint64(1), valid, penalty
+
+    def run(self, direction="M1", runs=100, overrides=None, speed_kmh=320.0, seed=None):
+        """RunStats of `runs` trains covering the whole line in direction M1 or M2."""
+        rng = np.random.default_rng(seed)
+        stats = self._simulate(self.tables(overrides), direction, runs, speed_kmh, rng)
+        return RunStats(direction, speed_kmh, *stats, dict(overrides or {}))
+
+    def _simulate(self, tables, direction, runs, speed_kmh, rng):
+        m = self.model
+        levels, masks, valid_counts, penalty = tables
+        ncells, nsites = len(self.cell_ids), self.site_index.max() + 1
+        advance = speed_kmh / 3600 * STEP
+        steps = int(self.positions.max() / advance) + 1
+        x = np.arange(steps) * advance
+        if direction == "M2":
+            x = self.positions.max() - x
+        distance = np.hypot(x[:, None] - self.positions[None, :], m.track_offset_km)
+        mean = (m.eirp - m.pl_1km - 10 * m.exponent * np.log10(distance)).astype(np.float32)
+        near = distance <= m.horizon_km
+
+        rho = np.float32(np.exp(-advance * 1000 / m.decorrelation_m))
+        innovation = np.float32(np.sqrt(1 - rho ** 2))
+        shared, own = np.float32(np.sqrt(m.site_correlation)), np.float32(np.sqrt(1 - m.site_correlation))
+        site_shadow = rng.standard_normal((runs, nsites), dtype=np.float32)
+        cell_shadow = rng.standard_normal((runs, ncells), dtype=np.float32)
+        drop_steps = max(1, round(m.drop_time / STEP))
+        decay = np.float32(1 - 1 / max(1, m.filter_length))
+
+        preferred = self.directions == direction
+        start = self.sites.min() if direction == "M1" else self.sites.max()
+        ar = np.arange(runs)
+        serving = np.full(runs, np.flatnonzero((self.sites == start) & preferred)[0])
+        history = np.zeros((len(CRITERIA), runs, len(self.intra)), dtype=np.uint64)
+        penalized = np.full(runs, -1)
+        penalty_until = np.zeros(runs)
+        penalty_level = np.zeros(runs, dtype=np.float32)
+        penalty_stop = np.zeros(runs, dtype=np.float32)
+        previous = np.full(runs, -1)
+        last_handover = np.full(runs, -np.inf)
+        below = np.zeros(runs, dtype=np.int64)
+        handovers, ping_pongs, drops, inter_layer = (np.zeros(runs, dtype=np.int64) for _ in range(4))
+        rx = np.full((runs, ncells), NO_SIGNAL, dtype=np.float32)
+        was_near = np.zeros(ncells, dtype=bool)
+
+        for t in range(steps):
+            now = t * STEP
+            # Shadowing is an AR(1) along the track; a cell coming into range starts from its stationary law
+            cols = np.flatnonzero(near[t])
+            entering = ~was_near[cols]
+            fresh = cols[entering]
+            was_near = near[t]
+            site_cols = np.unique(self.site_index[cols])
+            site_shadow[:, site_cols] = rho * site_shadow[:, site_cols] + innovation * rng.standard_normal((runs, len(site_cols)), dtype=np.float32)
+            cell_shadow[:, cols] = rho * cell_shadow[:, cols] + innovation * rng.standard_normal((runs, len(cols)), dtype=np.float32)
+            cell_shadow[:, fresh] = rng.standard_normal((runs, len(fresh)), dtype=np.float32)
+            sample = (
+                mean[t, cols]
+                + m.shadowing_sigma * (shared * site_shadow[:, self.site_index[cols]] + own * cell_shadow[:, cols])
+                + m.fading_sigma * rng.standard_normal((runs, len(cols)), dtype=np.float32)
+            )
+            # The BSC decides on filtered levels; a cell coming into range starts from its first sample
+            smoothed = decay * rx[:, cols] + (1 - decay) * sample
+            smoothed[:, entering] = sample[:, entering]
+            rx.fill(NO_SIGNAL)
+            rx[:, cols] = smoothed
+            level = rx[ar, serving]
+
+            # Radio link failure, then re-establishment on the strongest cell
+            below = np.where(level < m.drop_level, below + 1, 0)
+            lost = below >= drop_steps
+            if lost.any():
+                drops[lost] += 1
+                serving[lost] = rx[lost].argmax(axis=1)
+                history[:, lost] = 0
+                below[lost] = 0
+                penalized[lost] = previous[lost] = -1
+                level = rx[ar, serving]
+
+            candidates = self.slots[serving]
+            measured = candidates >= 0
+            neighbour = np.where(measured, rx[ar[:, None], np.where(measured, candidates, 0)], NO_SIGNAL)
+            # Penalty on the cell just left, until its timer ends or the serving level falls below the stop threshold
+            punishing = (penalty_until > now) & (level >= penalty_stop)
+            penalty_until[~punishing] = 0
+            neighbour -= np.where((candidates == penalized[:, None]) & punishing[:, None], penalty_level[:, None], 0)
+            margin = neighbour - level[:, None]
+            table = levels[serving]
+            hysteresis = np.where(self.intra, table[..., HYST], table[..., LAYER_HYST])
+            above = (margin > hysteresis) & measured
+            # The other layer is the backup: edge handovers go there only when no same-layer neighbour qualifies
+            conditions = (
+                (level < m.edge_level)[:, None] & above & (self.intra | ~(above & self.intra).any(axis=1)[:, None]),
+                ~self.intra & ~preferred[serving][:, None] & preferred[candidates]
+                & (margin > table[..., LAYER_HYST]) & (neighbour > m.layer_level),
+                # PBGT targets are ranked with the inter-cell hysteresis as well
+                self.intra & (margin > table[..., PBGT]) & (margin > hysteresis),
+            )
+            mask, needed = masks[serving], valid_counts[serving]
+            priority = np.zeros(margin.shape, dtype=np.int64)
+            for i, condition in enumerate(conditions):
+                # Last 64 measurements as bits: P/N is a popcount of the last N
+                history[i] = (history[i] << np.uint64(1)) | (condition & measured)
+                met = np.bitwise_count(history[i] & mask[..., i]) >= needed[..., i]
+                priority = np.maximum(priority, np.where(met, len(CRITERIA) - i, 0))
+            # Highest criterion first, then the same layer, then the strongest neighbour
+            score = np.where(priority > 0, priority * 1000 + self.intra * 100 + margin, -np.inf)
+            best = score.argmax(axis=1)
+            moving = np.flatnonzero(np.isfinite(score[ar, best]) & ~lost)
+            if not moving.size:
+                continue
+            old, new = serving[moving], candidates[moving, best[moving]]
+            handovers[moving] += 1
+            inter_layer[moving] += self.layers[old] != self.layers[new]
+            ping_pongs[moving] += (new == previous[moving]) & (now - last_handover[moving] <= m.pingpong_window)
+            enabled = penalty[0, new, old] > 0
+            penalized[moving] = np.where(enabled, old, -1)
+            penalty_until[moving] = np.where(enabled, now + penalty[1, new, old], 0)
+            penalty_level[moving] = penalty[2, new, old]
+            penalty_stop[moving] = penalty[3, new, old]
+            previous[moving] = old
+            last_handover[moving] = now
+            serving[moving] = new
+            history[:, moving] = 0
+        return handovers, ping_pongs, drops, inter_layer
+
+# --- Sweeps ---
+_simulator = None
+
+def _init_worker(simulator):
+    global _simulator
+    _simulator = simulator
+
+def _run_task(task):
+    overrides, direction, runs, speed_kmh, seed = task
+    return _simulator.run(direction, runs, overrides, speed_kmh, seed)
+
+def sweep(simulator, grid, directions=("M1", "M2"), runs=200, speed_kmh=320.0, workers=None, seed=0, batch=250):
+    """[RunStats] for every combination of grid ({parameter ID: [GUI values]}) and direction.
+
+    The current configuration comes first. Runs are split into batches over
+    a process pool; batch k of a direction gets the same seed for every
+    parameter set (common random numbers), so differences between sets are
+    not drowned in radio noise.
+    """
+    points = [{}] + [dict(zip(grid, values)) for values in itertools.product(*grid.values())] if grid else [{}]
+    tasks = []
+    for overrides, (d, direction) in itertools.product(points, enumerate(directions)):
+        for k, start in enumerate(range(0, runs, batch)):
+            tasks.append((overrides, direction, min(batch, runs - start), speed_kmh, (seed, d, k)))
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        _init_worker(simulator)
+        results = list(map(_run_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(simulator,)) as pool:
+            results = list(pool.map(_run_task, tasks))
+    merged = {}
+    for (overrides, direction, *_), stats in zip(tasks, results):
+        key = (json.dumps(overrides, sort_keys=True), direction)
+        merged[key] = merged[key].merge(stats) if key in merged else stats
+    return list(merged.values())
+
+# --- CLI ---
+def _assignment(text):
+    # "PBGTMARGIN=68,72" -> ("PBGTMARGIN", [68, 72]); enumeration names stay text
+    parameter_id, _, values = text.partition("=")
+    parsed = []
+    for value in values.split(","):
+        value = value.strip()
+        try:
+            number = float(value)
+        except ValueError:
+            parsed.append(value.upper())
+        else:
+            parsed.append(int(number) if number.is_integer() else number)
+    return parameter_id.strip().upper(), parsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate high-speed train runs to pre-validate G2GNCELL parameter changes")
+    parser.add_argument("--mml", help="MML dump or directory for the current values (default: MML_DUMP_PATH)")
+    parser.add_argument("--set", action="append", type=_assignment, default=[], metavar="PARAM=VALUE", help="line-wide value applied to every run")
+    parser.add_argument("--sweep", action="append", type=_assignment, default=[], metavar="PARAM=V1,V2", help="values to compare")
+    parser.add_argument("--direction", nargs="+", choices=("M1", "M2"), default=["M1", "M2"])
+    parser.add_argument("--runs", type=int, default=200, help="runs per parameter set and direction")
+    parser.add_argument("--speed", type=float, default=320.0, help="train speed in km/h")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write one JSON summary per parameter set and direction")
+    args = parser.parse_args()
+
+    # The analyzer reads its settings at import time
+    import analyzer
+    from mml_config import NeighbourConfig
+
+    catalog = analyzer.get_parameter_catalog()
+    for parameter_id, values in [*args.set, *args.sweep]:
+        if parameter_id not in PARAMETERS:
+            parser.error(f"{parameter_id} is not simulated; use one of {', '.join(PARAMETERS)}")
+        for value in values:
+            enumeration = catalog[parameter_id].enumeration
+            if not enumeration and not isinstance(value, int):
+                parser.error(f"{parameter_id} = {value} : valeur GUI entière attendue")
+            error = catalog.validate(parameter_id, value)
+            if error:
+                parser.error(error)
+    config = NeighbourConfig.from_path(args.mml, catalog) if args.mml else analyzer.get_neighbour_config()
+    simulator = HandoverSimulator(analyzer.get_topology(), catalog, config)
+    # Line-wide --set values become part of the baseline
+    simulator.base = simulator.values({parameter_id: values[0] for parameter_id, values in args.set})
+    results = sweep(simulator, dict(args.sweep), args.direction, args.runs, args.speed, args.workers, args.seed)
+    print(f"{'paramètres':<32} {'sens':<4} {'HO/run':>7} {'ping-pong':>9} {'coupures':>8} {'inter-couches':>13} {'sans coupure':>12}")
+    for stats in results:
+        s = stats.summary()
+        label = ", ".join(f"{k}={v}" for k, v in s["overrides"].items()) or "configuration actuelle"
+        print(
+            f"{label:<32} {s['direction']:<4} {s['handovers']:>7.1f} {s['ping_pongs']:>9.2f} {s['drops']:>8.3f} "
+            f"{s['inter_layer']:>13.2f} {s['drop_free']:>12.1%}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as out:
+            out.writelines(json.dumps(stats.summary(), ensure_ascii=False) + "\n" for stats in results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from table_reader import read_chunks
+
+# Canonical column -> accepted header names of a BSC handover counter export
+COUNTER_ALIASES = {
+    "time": ("time", "timestamp", "start_time", "period_start", "result_time", "datetime"),
+    "cell": ("cell", "cell_id", "source_cell", "src_cell", "src2gncellid", "srccellid"),
+    "target": ("target", "target_cell", "nbr_cell", "neighbor_cell", "neighbour_cell", "nbr2gncellid", "nbrcellid"),
+    "attempts": ("attempts", "ho_attempts", "ho_att", "hoatt", "requests"),
+    "successes": ("successes", "ho_successes", "ho_success", "ho_succ", "hosucc"),
+    "failures": ("failures", "ho_failures", "ho_fail", "hofail"),
+}
+ATTEMPTS, SUCCESSES, FAILURES = range(3)
+DIRECTIONS = {1: "M1", 2: "M2"}
+
+@dataclass
+class KpiReport:
+    """Per-relation KPIs over a time window, as (source, neighbour) matrices."""
+    start: pd.Timestamp
+    end: pd.Timestamp
+    attempts: np.ndarray
+    successes: np.ndarray
+    failures: np.ndarray
+    success_rate: np.ndarray
+    # Direction -> share of successful handovers going to the other layer, line-wide and per source cell
+    inter_layer: dict
+    inter_layer_by_cell: dict
+    # (source, neighbour) index pairs, worst first
+    worst: np.ndarray
+
+class HandoverKpis:
+    """Handover counters of the line as a dense (bucket, source, neighbour) cube.
+
+    Cells are the 66 of the topology, in Cell ID order; counters are summed
+    into fixed time buckets (15 minutes by default) whatever the granularity
+    of the export. Every KPI is a whole-array operation on the cube: weeks of
+    counters take a few array sums, not a loop over cells.
+    """
+
+    def __init__(self, topology, bucket="15min", min_attempts=20):
+        self.topology = topology
+        self.cell_ids = np.array(sorted(topology.cells))
+        self.bucket = pd.Timedelta(bucket)
+        self.min_attempts = min_attempts
+        self.origin = None
+        size = len(self.cell_ids)
+        self.counters = np.zeros((3, 0, size, size), dtype=np.int32)
+        self._lookup = np.full(self.cell_ids.max() + 1, -1)
+        self._lookup[self.cell_ids] = np.arange(size)
+        cells = [topology[c] for c in self.cell_ids]
+        layers = np.array([c.layer for c in cells])
+        sites = np.array([c.site for c in cells])
+        own = np.array([1 if c.direction == "M1" else 2 for c in cells])
+        self.inter_layer = layers[:, None] != layers[None, :]
+        # A train moving up the site numbers is going M1; same-site moves follow the source layer
+        delta = sites[None, :] - sites[:, None]
+        self.direction = np.where(delta > 0, 1, np.where(delta < 0, 2, own[:, None]))
+        self._report = None
+        self._version = None
+
+    def __len__(self):
+        return self.counters.shape[1]
+
+    def index(self, cell_id):
+        return int(self._lookup[cell_id]) if 0 <= cell_id < len(self._lookup) else -1
+
+    # --- Loading ---
+    def _grow(self, first, last):
+        # Extend the time axis so buckets first..last (relative to origin) exist
+        before = max(0, -first)
+        after = max(0, last + 1 - len(self))
+        if before or after:
+            self.counters = np.pad(self.counters, ((0, 0), (before, after), (0, 0), (0, 0)))
+            self.origin -= before * self.bucket
+        return before
+
+    def add(self, times, sources, targets, attempts, successes, failures):
+        """Add counter rows given as arrays; rows outside the 66 cells are ignored."""
+        sources = np.nan_to_num(np.asarray(sources, dtype=float), nan=-1).astype(np.int64)
+        targets = np.nan_to_num(np.asarray(targets, dtype=float), nan=-1).astype(np.int64)
+        valid = (sources >= 0) & (sources < len(self._lookup)) & (targets >= 0) & (targets < len(self._lookup))
+        times = pd.DatetimeIndex(times)
+        valid &= ~times.isna()
+        source = self._lookup[np.where(valid, sources, 0)]
+        target = self._lookup[np.where(valid, targets, 0)]
+        valid &= (source >= 0) & (target >= 0)
+        if not valid.any():
+            return
+        times = times[valid]
+        if self.origin is None:
+            self.origin = times.min().floor(self.bucket)
+        buckets = ((times - self.origin) // self.bucket).to_numpy()
+        buckets += self._grow(int(buckets.min()), int(buckets.max()))
+        where = (buckets, source[valid], target[valid])
+        for kind, values in ((ATTEMPTS, attempts), (SUCCESSES, successes), (FAILURES, failures)):
+            np.add.at(self.counters[kind], where, np.asarray(values)[valid].astype(np.int32))
+        self._report = self._version = None
+
+    def feed(self, chunk):
+        attempts = pd.to_numeric(chunk["attempts"], errors="coerce").fillna(0).to_numpy()
+        successes = pd.to_numeric(chunk["successes"], errors="coerce") if "successes" in chunk else None
+        failures = pd.to_numeric(chunk["failures"], errors="coerce") if "failures" in chunk else None
+        # Exports carry successes, failures or both; the missing one is the rest of the attempts
+        if successes is None:
+            successes = attempts - failures.fillna(0).to_numpy()
+        else:
+            successes = successes.fillna(0).to_numpy()
+        failures = attempts - successes if failures is None else failures.fillna(0).to_numpy()
+        self.add(
+            pd.to_datetime(chunk["time"], errors="coerce"),
+            pd.to_numeric(chunk["cell"], errors="coerce"),
+            pd.to_numeric(chunk["target"], errors="coerce"),
+            attempts, successes, failures,
+        )
+
+    @classmethod
+    def from_file(cls, path, topology, bucket="15min", min_attempts=20, chunk_rows=500_000):
+        kpis = cls(topology, bucket, min_attempts)
+        for chunk in read_chunks(path, COUNTER_ALIASES, ("time", "cell", "target", "attempts"), chunk_rows=chunk_rows):
+            if "successes" not in chunk and "failures" not in chunk:
+                raise ValueError("counter export needs a successes or a failures column")
+            kpis.feed(chunk)
+        return kpis
+
+    @property
+    def version(self):
+        # Identifies the counters an answer was given; part of the response cache key
+        if self._version is None:
+            self._version = hashlib.blake2b(self.counters.tobytes(), digest_size=16).hexdigest()
+        return self._version
+
+    # --- KPIs ---
+    def report(self, start=None, end=None):
+        """KPIs of the buckets between start and end (timestamps; None for the whole period)."""
+        whole = start is None and end is None
+        if whole and self._report is not None:
+            return self._report
+        first = 0 if start is None or self.origin is None else max(0, (pd.Timestamp(start) - self.origin) // self.bucket)
+        last = len(self) if end is None or self.origin is None else max(first, -(-(pd.Timestamp(end) - self.origin) // self.bucket))
+        attempts, successes, failures = self.counters[:, first:last].sum(axis=1, dtype=np.int64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            success_rate = np.where(attempts > 0, successes / attempts, np.nan)
+            # (direction, source, neighbour) masks; successes by direction, then the inter-layer share
+            by_direction = np.stack([self.direction == d for d in DIRECTIONS]) * successes
+            inter = (by_direction * self.inter_layer).sum(axis=2)
+            total = by_direction.sum(axis=2)
+            by_cell = np.where(total > 0, inter / total, np.nan)
+            line = inter.sum(axis=1) / total.sum(axis=1)
+        # Relations with enough attempts, lowest success rate first, then most failures
+        eligible = np.flatnonzero(attempts >= self.min_attempts)
+        order = np.lexsort((-failures.ravel()[eligible], success_rate.ravel()[eligible]))
+        worst = np.column_stack(np.unravel_index(eligible[order], attempts.shape))
+        start_time = self.origin + first * self.bucket if self.origin is not None else None
+        end_time = self.origin + last * self.bucket if self.origin is not None else None
+        report = KpiReport(
+            start_time, end_time, attempts, successes, failures, success_rate,
+            {name: line[i] for i, name in enumerate(DIRECTIONS.values())},
+            {name: by_cell[i] for i, name in enumerate(DIRECTIONS.values())},
+            worst,
+        )
+        if whole:
+            self._report = report
+        return report
+
+    def series(self, source, target):
+        """Attempts and success rate of one relation per bucket, as a DataFrame."""
+        s, t = self.index(source), self.index(target)
+        attempts, successes = self.counters[ATTEMPTS, :, s, t], self.counters[SUCCESSES, :, s, t]
+        index = pd.date_range(self.origin, periods=len(self), freq=self.bucket) if self.origin is not None else []
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(attempts > 0, successes / attempts, np.nan)
+        return pd.DataFrame({"attempts": attempts, "success_rate": rate}, index=index)
+
+    # --- Prompt ---
+    def context(self, cells, limit=6):
+        """Compact KPI lines for the relations and cells of a query, or "" without data for them."""
+        indices = [self.index(c) for c in cells if self.index(c) >= 0]
+        if not indices or self.origin is None:
+            return ""
+        report = self.report()
+        named = np.zeros(len(self.cell_ids), dtype=bool)
+        named[indices] = True
+        # Relations touching a named cell, worst success rate first
+        touched = np.flatnonzero((named[:, None] | named[None, :]).ravel() & (report.attempts.ravel() > 0))
+        touched = touched[np.lexsort((-report.failures.ravel()[touched], report.success_rate.ravel()[touched]))]
+        lines = [
+            f"## KPI handover mesurés (compteurs BSC du {report.start:%Y-%m-%d %H:%M} au {report.end:%Y-%m-%d %H:%M})"
+        ]
+        for flat in touched[:limit]:
+            s, t = np.unravel_index(flat, report.attempts.shape)
+            lines.append(
+                f"- {self.cell_ids[s]} -> {self.cell_ids[t]} : {report.attempts[s, t]} tentatives, "
+                f"succès {report.success_rate[s, t]:.1%}, {report.failures[s, t]} échecs"
+            )
+        ratios = [
+            f"{self.cell_ids[i]} {name} {report.inter_layer_by_cell[name][i]:.1%}"
+            for i in indices for name in DIRECTIONS.values()
+            if not np.isnan(report.inter_layer_by_cell[name][i])
+        ]
+        if ratios:
+            lines.append(f"- Ratio inter-couches (succès vers l'autre couche) : {', '.join(ratios)}")
+        line = ", ".join(f"{name} {ratio:.1%}" for name, ratio in report.inter_layer.items() if not np.isnan(ratio))
+        worst = ", ".join(
+            f"{self.cell_ids[s]} -> {self.cell_ids[t]} ({report.success_rate[s, t]:.1%})" for s, t in report.worst[:3]
+        )
+        if line or worst:
+            lines.append("- Ligne : " + "; ".join(part for part in (
+                f"ratio inter-couches {line}" if line else "", f"pires relations {worst}" if worst else ""
+            ) if part))
+        return "\n".join(lines) if len(lines) > 1 else ""
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import asdict, dataclass
+
+import aiohttp
+import google.generativeai as genai
+from google.api_core.exceptions import from_http_status
+from google.generativeai import caching
+
+@dataclass
+class Completion:
+    """Answer text, or one chunk of it, with the token usage reported so far."""
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def total_tokens(self):
+        return self.input_tokens + self.output_tokens
+
+    def to_dict(self):
+        return asdict(self)
+
+class LLMBackend:
+    """How the analyzer reaches a model.
+
+    system_prompt is the full BASE_PROMPT or a pruned copy of it, prompt the
+    user query. Failures are raised as google.api_core exceptions whatever
+    the backend, so retries and error codes work the same everywhere.
+    """
+
+    name = "base"
+
+    def generate(self, model_name, system_prompt, prompt, timeout):
+        raise NotImplementedError
+
+    async def generate_async(self, model_name, system_prompt, prompt, timeout):
+        return await asyncio.to_thread(self.generate, model_name, system_prompt, prompt, timeout)
+
+    def stream(self, model_name, system_prompt, prompt, timeout):
+        # Completion chunks; the last one carries the usage of the whole answer
+        yield self.generate(model_name, system_prompt, prompt, timeout)
+
+    def warmup(self, model_name):
+        return True
+
+# --- Gemini ---
+class GeminiBackend(LLMBackend):
+    """google-generativeai, with the full prompt held in a server-side context cache."""
+
+    name = "gemini"
+
+    def __init__(self, api_key, base_prompt, cache_ttl, warmup_timeout=60):
+        self.api_key = api_key
+        self.base_prompt = base_prompt
+        self.prompt_hash = hashlib.sha256(base_prompt.encode("utf-8")).hexdigest()
+        self.cache_ttl = cache_ttl
+        self.warmup_timeout = warmup_timeout
+        self._models = {}
+        self._lock = threading.Lock()
+        self._configured = False
+
+    def _configure(self):
+        if not self._configured:
+            genai.configure(api_key=self.api_key)
+            self._configured = True
+
+    def _base_prompt_cache(self, model_name):
+        # Server-side context cache holding the base prompt, found again by its hash
+        display_name = f"gsmr-base-{self.prompt_hash[:16]}"
+        for cache in caching.CachedContent.list():
+            if cache.display_name == display_name and cache.model.removeprefix("models/").startswith(model_name):
+                cache.update(ttl=self.cache_ttl)
+                return cache
+        return caching.CachedContent.create(
+            model=model_name,
+            display_name=display_name,
+            system_instruction=self.base_prompt,
+            ttl=self.cache_ttl,
+        )
+
+    def model(self, model_name, system_prompt):
+        # One model per name shares the SDK's gRPC channel; entries are rebuilt
+        # every half TTL, which renews the server-side cache before it expires
+        with self._lock:
+            self._configure()
+            if system_prompt != self.base_prompt:
+                return genai.GenerativeModel(model_name, system_instruction=system_prompt)
+            entry = self._models.get(model_name)
+            if entry is None or time.monotonic() - entry[1] > self.cache_ttl.total_seconds() / 2:
+                try:
+                    model = genai.GenerativeModel.from_cached_content(cached_content=self._base_prompt_cache(model_name))
+                except Exception:
+                    # Model or account not eligible for explicit caching
+                    model = genai.GenerativeModel(model_name, system_instruction=self.base_prompt)
+                entry = self._models[model_name] = (model, time.monotonic())
+            return entry[0]
+
+    @staticmethod
+    def _completion(response, text):
+        usage = response.usage_metadata
+        return Completion(
+            text,
+            usage.prompt_token_count or 0,
+            usage.candidates_token_count or 0,
+            usage.cached_content_token_count or 0,
+        )
+
+    def generate(self, model_name, system_prompt, prompt, timeout):
+        response = self.model(model_name, system_prompt).generate_content(
+            prompt, request_options={"timeout": timeout}
+        )
+        return self._completion(response, response.text)
+
+    async def generate_async(self, model_name, system_prompt, prompt, timeout):
+        # The first call per model builds it over the network
+        model = await asyncio.to_thread(self.model, model_name, system_prompt)
+        response = await model.generate_content_async(prompt, request_options={"timeout": timeout})
+        return self._completion(response, response.text)
+
+    def stream(self, model_name, system_prompt, prompt, timeout):
+        response = self.model(model_name, system_prompt).generate_content(
+            prompt, stream=True, request_options={"timeout": timeout}
+        )
+        for chunk in response:
+            yield self._completion(chunk, chunk.text if chunk.parts else "")
+
+    def warmup(self, model_name):
+        # A cheap count_tokens call opens the channel before the first real query
+        try:
+            self.model(model_name, self.base_prompt).count_tokens(
+                "GSM-R", request_options={"timeout": self.warmup_timeout}
+            )
+            return True
+        except Exception:
+            return False
+
+# --- HTTP ---
+class HTTPBackend(LLMBackend):
+    """Client for a server speaking the stub protocol (see stub_backend.py).
+
+    POST /v1/generate takes {model, system, prompt, timeout, stream} and
+    answers a Completion as JSON, or one Completion per line when streaming.
+    Errors come back as HTTP statuses and are raised as the matching
+    google.api_core exception.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url):
+        self.url = base_url.rstrip("/") + "/v1/generate"
+
+    def _request(self, model_name, system_prompt, prompt, timeout, stream):
+        body = {"model": model_name, "system": system_prompt, "prompt": prompt, "timeout": timeout, "stream": stream}
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            raise from_http_status(e.code, json.loads(e.read() or b"{}").get("error", e.reason)) from None
+        except urllib.error.URLError as e:
+            raise ConnectionError(f"{self.url}: {e.reason}") from None
+
+    @staticmethod
+    def _completion(data):
+        if "error" in data:
+            raise from_http_status(data.get("status", 500), data["error"])
+        return Completion(**data)
+
+    def generate(self, model_name, system_prompt, prompt, timeout):
+        with self._request(model_name, system_prompt, prompt, timeout, False) as response:
+            return self._completion(json.load(response))
+
+    def stream(self, model_name, system_prompt, prompt, timeout):
+        with self._request(model_name, system_prompt, prompt, timeout, True) as response:
+            for line in response:
+                if line.strip():
+                    yield self._completion(json.loads(line))
+
+    async def generate_async(self, model_name, system_prompt, prompt, timeout):
+        body = {"model": model_name, "system": system_prompt, "prompt": prompt, "timeout": timeout, "stream": False}
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+                async with session.post(self.url, json=body) as response:
+                    data = await response.json(content_type=None)
+                    if response.status >= 400:
+                        raise from_http_status(response.status, data.get("error", response.reason))
+                    return self._completion(data)
+        except aiohttp.ClientConnectionError as e:
+            raise ConnectionError(f"{self.url}: {e}") from None
+
+    def warmup(self, model_name):
+        try:
+            self.generate(model_name, "", "GSM-R", 5)
+            return True
+        except Exception:
+            return False
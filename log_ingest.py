@@ -0,0 +1,205 @@
+import argparse
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import analyzer
+from batch import run_batch
+from table_reader import read_chunks
+
+LOG_CHUNK_ROWS = analyzer.setting("LOG_CHUNK_ROWS", 500_000, int)
+# A handover back to the previous cell within this many seconds is a ping-pong
+PINGPONG_WINDOW = analyzer.setting("PINGPONG_WINDOW", 10, float)
+
+# Canonical column -> accepted header names (case-insensitive)
+COLUMN_ALIASES = {
+    "time": ("time", "timestamp", "datetime", "date_time", "start_time"),
+    "call": ("call", "call_id", "callid", "ms_id", "imsi", "msisdn", "train", "train_id"),
+    "cell": ("cell", "cell_id", "cellid", "source_cell", "src_cell", "srccellid", "serving_cell"),
+    "target": ("target", "target_cell", "dst_cell", "nbr_cell", "neighbor_cell", "neighbour_cell", "nbrcellid"),
+    "event": ("event", "event_type", "type", "record_type", "message"),
+    "result": ("result", "status", "cause", "outcome"),
+    "rxlev": ("rxlev", "rx_level", "level", "rxlev_dbm", "rsl"),
+}
+DROP_PATTERN = r"DROP|RLF|RADIO.?LINK|ABNORMAL|LOST"
+HANDOVER_PATTERN = r"\bHO\b|HO_|HANDOVER"
+FAILURE_PATTERN = r"FAIL|REJECT|TIMEOUT|ABORT|NOK"
+KINDS = ("drop", "ho_failure", "ping_pong")
+
+# --- Reading ---
+def read_log_chunks(source, name=None, chunk_rows=LOG_CHUNK_ROWS):
+    return read_chunks(source, COLUMN_ALIASES, ("cell", "event"), name, chunk_rows)
+
+# --- Detection ---
+def _matches(values, pattern):
+    # Event and result columns hold a handful of distinct codes: test each once
+    codes, uniques = pd.factorize(values)
+    hits = pd.Series(uniques.astype(str)).str.upper().str.contains(pattern).to_numpy(dtype=bool)
+    return np.append(hits, False)[codes]  # code -1 is a missing value
+
+@dataclass
+class DetectedEvent:
+    kind: str
+    cell: int
+    target: int
+    count: int
+    first: pd.Timestamp
+    last: pd.Timestamp
+    rxlev: float
+
+    @property
+    def event_id(self):
+        return f"{self.kind}-{self.cell}-{self.target or 'x'}"
+
+    def describe(self, topology):
+        """The event as a query in the operators' words, with the cells, sites and layer."""
+        source = topology[self.cell]
+        if self.target and self.target in topology:
+            target = topology[self.target]
+            if source.layer != target.layer:
+                layer = f"inter-couches {source.layer} -> {target.layer}"
+            else:
+                # Up the site numbers is M1, down is M2; same-site moves follow the layer's default
+                direction = "M1" if target.site > source.site else "M2" if target.site < source.site else source.direction
+                layer = f"couche {source.layer}" + (f", sens {direction}" if direction else "")
+            where = f"la relation {self.cell} -> {self.target} (site {source.site} -> {target.site}, {layer})"
+        else:
+            where = f"la cellule {self.cell} (site {source.site}, couche {source.layer})"
+        what = {
+            "drop": f"{self.count} coupures d'appel sur {where}",
+            "ho_failure": f"{self.count} échecs de handover sur {where}",
+            "ping_pong": f"{self.count} ping-pong de handover sur {where}",
+        }[self.kind]
+        text = f"Détecté dans les logs BSC : {what}"
+        if not pd.isna(self.first):
+            text += f", du {self.first:%Y-%m-%d %H:%M} au {self.last:%Y-%m-%d %H:%M}"
+        if not np.isnan(self.rxlev):
+            text += f", niveau moyen {self.rxlev:.0f} dBm"
+        return text + "."
+
+class LogScanner:
+    """Drops, failed handovers and ping-pongs found in handover / measurement logs.
+
+    Chunks are classified with vectorized string and shift operations, then
+    folded into per (kind, cell, target) totals, so the state is bounded by
+    the 66 cells of the line whatever the number of rows. Ping-pong needs
+    each call's records in time order; only the last successful handover of
+    each call still within PINGPONG_WINDOW is carried to the next chunk.
+    """
+
+    def __init__(self, cells, window=PINGPONG_WINDOW):
+        self.cells = np.array(sorted(cells))
+        self.window = pd.Timedelta(seconds=window)
+        self.rows = 0
+        self._totals = {}
+        self._carry = None
+
+    def feed(self, chunk):
+        self.rows += len(chunk)
+        frame = pd.DataFrame({
+            "cell": pd.to_numeric(chunk["cell"], errors="coerce"),
+            "target": pd.to_numeric(chunk["target"], errors="coerce") if "target" in chunk else np.nan,
+            "time": pd.to_datetime(chunk["time"], errors="coerce") if "time" in chunk else pd.NaT,
+            "call": chunk["call"].astype(str) if "call" in chunk else "",
+            "rxlev": pd.to_numeric(chunk["rxlev"], errors="coerce") if "rxlev" in chunk else np.nan,
+        })
+        frame = frame[np.isin(frame["cell"], self.cells)]
+        chunk = chunk.loc[frame.index]
+        handover = _matches(chunk["event"], HANDOVER_PATTERN)
+        failed = handover & _matches(chunk["event"], FAILURE_PATTERN)
+        if "result" in chunk:
+            failed |= handover & _matches(chunk["result"], FAILURE_PATTERN)
+        self._fold("drop", frame[_matches(chunk["event"], DROP_PATTERN) & ~handover])
+        self._fold("ho_failure", frame[failed])
+        moved = np.isin(frame["target"], self.cells) & frame["cell"].ne(frame["target"]).to_numpy()
+        self._fold("ping_pong", self._ping_pongs(frame[handover & ~failed & moved]))
+
+    def _ping_pongs(self, handovers):
+        # A -> B followed by B -> A for the same call within the window
+        if self._carry is not None:
+            handovers = pd.concat([self._carry.assign(carried=True), handovers.assign(carried=False)])
+        else:
+            handovers = handovers.assign(carried=False)
+        handovers = handovers.sort_values(["call", "time"], kind="stable")
+        previous = handovers.shift()
+        elapsed = handovers["time"] - previous["time"]
+        pong = (
+            handovers["call"].eq(previous["call"])
+            & handovers["cell"].eq(previous["target"])
+            & handovers["target"].eq(previous["cell"])
+            & ((elapsed <= self.window) | elapsed.isna())  # logs without timestamps: any return counts
+            & ~handovers["carried"].astype(bool)
+        )
+        last = handovers.drop_duplicates("call", keep="last")
+        if last["time"].notna().any():
+            last = last[last["time"] >= last["time"].max() - self.window]
+        self._carry = last.drop(columns="carried")
+        # A -> B -> A and B -> A -> B are the same unstable relation
+        pongs = handovers[pong]
+        return pongs.assign(cell=np.minimum(pongs["cell"], pongs["target"]), target=np.maximum(pongs["cell"], pongs["target"]))
+
+    def _fold(self, kind, frame):
+        if frame.empty:
+            return
+        grouped = frame.fillna({"target": 0}).groupby(["cell", "target"]).agg(
+            count=("cell", "size"), first=("time", "min"), last=("time", "max"),
+            rxlev_sum=("rxlev", "sum"), rxlev_n=("rxlev", "count"),
+        )
+        for (cell, target), row in grouped.iterrows():
+            key = (kind, int(cell), int(target))
+            total = self._totals.get(key)
+            if total is None:
+                self._totals[key] = [row["count"], row["first"], row["last"], row["rxlev_sum"], row["rxlev_n"]]
+                continue
+            total[0] += row["count"]
+            total[1] = min(total[1], row["first"]) if not pd.isna(total[1]) else row["first"]
+            total[2] = max(total[2], row["last"]) if not pd.isna(total[2]) else row["last"]
+            total[3] += row["rxlev_sum"]
+            total[4] += row["rxlev_n"]
+
+    def events(self, min_count=1):
+        """DetectedEvents with at least min_count occurrences, most frequent first."""
+        events = [
+            DetectedEvent(kind, cell, target, int(count), first, last, rxlev_sum / rxlev_n if rxlev_n else np.nan)
+            for (kind, cell, target), (count, first, last, rxlev_sum, rxlev_n) in self._totals.items()
+            if count >= min_count
+        ]
+        return sorted(events, key=lambda e: (-e.count, KINDS.index(e.kind), e.cell, e.target))
+
+def scan_log(source, name=None, chunk_rows=LOG_CHUNK_ROWS, window=PINGPONG_WINDOW):
+    scanner = LogScanner(analyzer.get_topology().cells, window=window)
+    for chunk in read_log_chunks(source, name, chunk_rows):
+        scanner.feed(chunk)
+    return scanner
+
+def analyzer_events(events):
+    # The {"id", "query"} records batch.run_batch takes
+    topology = analyzer.get_topology()
+    return [{"id": event.event_id, "query": event.describe(topology)} for event in events]
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Detect disconnection events in BSC handover / drive-test logs and analyze them")
+    parser.add_argument("log", help="CSV or Parquet export of handover and measurement-report records")
+    parser.add_argument("--output", help="JSONL results file (batch checkpoint); without it, only print the events")
+    parser.add_argument("--min-count", type=int, default=1, help="ignore relations with fewer occurrences")
+    parser.add_argument("--limit", type=int, help="analyze only the most frequent events")
+    parser.add_argument("--chunk-rows", type=int, default=LOG_CHUNK_ROWS)
+    parser.add_argument("--window", type=float, default=PINGPONG_WINDOW, help="ping-pong window in seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    scanner = scan_log(args.log, chunk_rows=args.chunk_rows, window=args.window)
+    events = analyzer_events(scanner.events(args.min_count)[:args.limit])
+    print(f"{scanner.rows} rows scanned, {len(events)} events detected")
+    if not args.output:
+        for event in events:
+            print(json.dumps(event, ensure_ascii=False))
+        return
+    report = run_batch(events, args.output, workers=args.workers)
+    print(f"{report.ok} analyzed, {report.failed} failed, {report.skipped} already in {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from param_catalog import parse_value
+
+KEY = ("SRC2GNCELLID", "NBR2GNCELLID")
+# Section 6 attributes that identify the relation rather than tune it
+IDENTITY = (
+    "IDTYPE", "SRC2GNCELLID", "SRC2GNCELLNAME", "NBR2GNCELLID", "NBR2GNCELLNAME", "SRCMCC", "SRCMNC",
+    "SRCLAC", "SRCCI", "NBRMCC", "NBRMNC", "NBRLAC", "NBRCI",
+)
+# Shown when the query names no parameter and retrieval kept the full prompt
+DEFAULT_CONTEXT_PARAMETERS = ("PBGTMARGIN", "INTERCELLHYST", "INTELEVHOHYST", "NCELLPUNEN", "NCELLPUNSTPTH")
+
+COMMAND_RE = re.compile(r"^\s*(ADD|MOD|RMV)\s+G2GNCELL\s*:(.*?);", re.IGNORECASE | re.MULTILINE | re.DOTALL)
+ARGUMENT_RE = re.compile(r"(\w+)\s*=\s*(\"[^\"]*\"|[^,;]*)")
+REPORT_RE = re.compile(r"^%%LST\s+G2GNCELL\b.*?%%$(.*?)(?=^%%|^---\s+END|\Z)", re.IGNORECASE | re.MULTILINE | re.DOTALL)
+UNDERLINE_RE = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+PAIR_RE = re.compile(r"^\s*(.+?)\s+=\s+(.*?)\s*$")
+COLUMN_RE = re.compile(r"\S+(?: \S+)*")
+
+# --- Parsing ---
+def _labels(catalog):
+    # LST reports name attributes by their display name, scripts by their ID
+    labels = {p.id.lower(): p.id for p in catalog}
+    labels.update({p.name.lower(): p.id for p in catalog})
+    return labels
+
+def _report_records(body, labels):
+    # One "Name  =  value" block per relation, or one aligned table for all of them
+    underline = UNDERLINE_RE.search(body)
+    lines = body[underline.end():].splitlines() if underline else body.splitlines()
+    lines = [line for line in lines if not line.strip().startswith("(Number of results")]
+    content = [line for line in lines if line.strip()]
+    if not content:
+        return
+    if PAIR_RE.match(content[0]):
+        record = {}
+        for line in lines:
+            match = PAIR_RE.match(line)
+            if match and match.group(1).lower() in labels:
+                record[labels[match.group(1).lower()]] = match.group(2)
+            elif not line.strip() and record:
+                yield record
+                record = {}
+        if record:
+            yield record
+        return
+    header, rows = content[0], content[1:]
+    columns = [(m.start(), labels.get(m.group().lower())) for m in COLUMN_RE.finditer(header)]
+    bounds = [start for start, _ in columns[1:]] + [None]
+    for row in rows:
+        yield {
+            parameter_id: row[start:end].strip()
+            for (start, parameter_id), end in zip(columns, bounds)
+            if parameter_id is not None and row[start:end].strip()
+        }
+
+def parse_mml(text, catalog):
+    """(action, {parameter ID: raw value}) for every G2GNCELL relation of an MML dump.
+
+    Reads both "ADD/MOD/RMV G2GNCELL: ...;" scripts and "LST G2GNCELL"
+    reports, vertical or tabular; actions are "ADD", "MOD" and "RMV".
+    """
+    labels = _labels(catalog)
+    for match in COMMAND_RE.finditer(text):
+        arguments = {
+            labels.get(name.lower(), name.upper()): value.strip().strip('"')
+            for name, value in ARGUMENT_RE.findall(match.group(2))
+        }
+        yield match.group(1).upper(), arguments
+    for match in REPORT_RE.finditer(text):
+        for record in _report_records(match.group(1), labels):
+            yield "ADD", record
+
+# --- Store ---
+class NeighbourConfig:
+    """Current G2GNCELL attributes, one row per (SRC2GNCELLID, NBR2GNCELLID).
+
+    A DataFrame with a parameter ID per column; values are GUI values as
+    in section 6 (numbers, or enumeration names), None where the dump did
+    not list the attribute.
+    """
+
+    def __init__(self, frame, sources=()):
+        self.frame = frame
+        self.sources = tuple(sources)
+        self._rows = None
+        self._version = None
+
+    @classmethod
+    def from_texts(cls, texts, catalog, sources=()):
+        relations = {}
+        for text in texts:
+            for action, arguments in parse_mml(text, catalog):
+                try:
+                    key = tuple(int(arguments[k]) for k in KEY)
+                except (KeyError, ValueError):
+                    continue
+                if action == "RMV":
+                    relations.pop(key, None)
+                    continue
+                values = relations.setdefault(key, {})
+                for parameter_id, raw in arguments.items():
+                    parameter = catalog.get(parameter_id)
+                    if parameter is None or parameter_id in KEY:
+                        continue
+                    # Names, MCC and MNC stay text; parse_value would keep only their digits
+                    numeric = parameter.enumeration or parameter.is_numeric
+                    values[parameter_id] = parse_value(raw, parameter.enumeration) if numeric else raw
+        columns = [p.id for p in catalog if p.id not in KEY]
+        # object dtype keeps GUI integers as integers next to missing values
+        frame = pd.DataFrame(
+            [{**dict(zip(KEY, key)), **values} for key, values in relations.items()],
+            columns=[*KEY, *columns], dtype=object,
+        )
+        frame = frame.astype({k: int for k in KEY}).set_index(list(KEY)).sort_index().dropna(axis=1, how="all")
+        return cls(frame.where(frame.notna(), None), sources)
+
+    @classmethod
+    def from_path(cls, path, catalog):
+        # A dump file, or a directory of them read in name order (later MODs win)
+        path = Path(path)
+        files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+        return cls.from_texts((f.read_text(encoding="utf-8", errors="replace") for f in files), catalog, files)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, relation):
+        return relation in self.frame.index
+
+    def get(self, source, neighbour, parameter_id):
+        if (source, neighbour) not in self.frame.index or parameter_id not in self.frame.columns:
+            return None
+        return self.frame.at[(source, neighbour), parameter_id]
+
+    def values(self, source, neighbour):
+        """{parameter ID: GUI value} of one relation, without the attributes the dump did not list."""
+        if self._rows is None:
+            # Plain dicts: a lookup per query instead of a DataFrame row selection
+            self._rows = {
+                key: {p: v for p, v in row.items() if v is not None}
+                for key, row in self.frame.to_dict("index").items()
+            }
+        return self._rows.get((source, neighbour), {})
+
+    @property
+    def version(self):
+        # Identifies the configuration an answer was given; part of the response cache key
+        if self._version is None:
+            self._version = str(pd.util.hash_pandas_object(self.frame.astype(str), index=True).sum())
+        return self._version
+
+    def relations(self, cells):
+        """Rows whose source or neighbour is one of cells; pairs of named cells first."""
+        sources = self.frame.index.get_level_values(0).isin(cells)
+        neighbours = self.frame.index.get_level_values(1).isin(cells)
+        rows = self.frame[sources | neighbours]
+        both = (sources & neighbours)[sources | neighbours]
+        return pd.concat([rows[both], rows[~both]])
+
+    def context(self, cells, parameter_ids, catalog, limit=6):
+        """Prompt lines with the current values of the relations of cells, or "" when none is known."""
+        parameter_ids = [p for p in parameter_ids if p in self.frame.columns and p not in IDENTITY]
+        parameter_ids = parameter_ids or [p for p in DEFAULT_CONTEXT_PARAMETERS if p in self.frame.columns]
+        if not parameter_ids or not len(self):
+            return ""
+        rows = self.relations(list(cells))[parameter_ids].head(limit)
+        lines = []
+        for (source, neighbour), values in rows.iterrows():
+            known = [
+                f"{pid} {value}" + (f" (défaut {catalog[pid].default})" if value != catalog[pid].default else "")
+                for pid, value in values.items() if value is not None
+            ]
+            if known:
+                lines.append(f"- {source} -> {neighbour} : " + ", ".join(known))
+        if not lines:
+            return ""
+        return "## Valeurs actuelles (export MML G2GNCELL, valeurs GUI)\n" + "\n".join(lines)
@@ -0,0 +1,126 @@
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from prompt_retrieval import estimate_tokens
+from resilience import LatencyTracker
+
+FAST = "fast"
+STRONG = "strong"
+
+# Wording of failures that need multi-cell or inter-layer reasoning
+COMPLEX_RE = re.compile(
+    r"inter[- ]?couches?|inter[- ]?layer|ping[- ]?pong|secours|backup|plusieurs|répét|recurr|récurr"
+    r"|\bM1\b.*\bM2\b|\bM2\b.*\bM1\b",
+    re.IGNORECASE | re.DOTALL,
+)
+LONG_QUERY_TOKENS = 120
+
+@dataclass
+class Complexity:
+    tier: str
+    reasons: tuple
+
+def classify_complexity(text, entities, parameter_ids):
+    """Fast tier for a pointed question about one parameter on one relation, strong otherwise."""
+    reasons = []
+    if not entities.cells and not parameter_ids:
+        reasons.append("aucune cellule ni paramètre cité")
+    if len(entities.cells) > 2:
+        reasons.append(f"{len(entities.cells)} cellules")
+    if len({cell // 100 for cell in entities.cells}) > 1:
+        reasons.append("inter-couches")
+    if len(entities.sites) > 2:
+        reasons.append(f"{len(entities.sites)} sites")
+    if len(set(parameter_ids) | {pid for pid, _ in entities.parameters}) > 1:
+        reasons.append("plusieurs paramètres")
+    if COMPLEX_RE.search(text):
+        reasons.append("scénario complexe")
+    if estimate_tokens(text) > LONG_QUERY_TOKENS:
+        reasons.append("description longue")
+    return Complexity(STRONG if reasons else FAST, tuple(reasons))
+
+def answer_quality(text, entities):
+    """Share of the section 7 format checks an answer passes, from 0 to 1."""
+    checks = [
+        "•" in text or re.search(r"^\s*[-*] ", text, re.MULTILINE) is not None,
+        "justification" in text.lower(),
+        all(str(cell) in text for cell in entities.cells),
+        all(pid in text.upper() for pid, _ in entities.parameters),
+    ]
+    return sum(checks) / len(checks)
+
+class TierHealth:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.latency = LatencyTracker()
+        self.quality = deque(maxlen=200)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+
+    def summary(self):
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "p50": self.latency.percentile(50),
+            "p95": self.latency.percentile(95),
+            "quality": sum(self.quality) / len(self.quality) if self.quality else None,
+            "available": time.monotonic() >= self.unavailable_until,
+        }
+
+class ModelRouter:
+    """Dispatches queries to a fast or a strong model tier.
+
+    Every tier tracks its own latency, failures and answer quality. A tier
+    failing max_failures times in a row is skipped for cooldown seconds, and
+    one whose p95 latency exceeds slow_after is tried after the other tier.
+    Without a distinct fast model everything goes to the strong tier.
+    """
+
+    def __init__(self, tiers, slow_after=20.0, max_failures=3, cooldown=60.0, min_quality=0.5):
+        self.tiers = {name: TierHealth(model_name) for name, model_name in tiers.items()}
+        self.slow_after = slow_after
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.min_quality = min_quality
+        self._lock = threading.Lock()
+
+    def model_name(self, tier):
+        return self.tiers[tier].model_name
+
+    def _slow(self, tier):
+        p95 = self.tiers[tier].latency.percentile(95)
+        return p95 is not None and p95 > self.slow_after
+
+    def plan(self, tier):
+        """Tiers to try in order: the requested one first unless it is slow or cooling down."""
+        order = [tier] + [name for name in (STRONG, FAST) if name != tier]
+        order = [name for name in order if name in self.tiers]
+        now = time.monotonic()
+        available = [name for name in order if now >= self.tiers[name].unavailable_until]
+        # Every tier down: try them all anyway rather than fail without a call
+        order = available or order
+        return sorted(order, key=self._slow)
+
+    def record(self, tier, seconds=None, error=None, quality=None):
+        with self._lock:
+            health = self.tiers[tier]
+            health.calls += 1
+            if error is not None:
+                health.failures += 1
+                health.consecutive_failures += 1
+                if health.consecutive_failures >= self.max_failures:
+                    health.unavailable_until = time.monotonic() + self.cooldown
+                return
+            health.consecutive_failures = 0
+            health.latency.record(seconds)
+            if quality is not None:
+                health.quality.append(quality)
+
+    def summary(self):
+        return {name: health.summary() for name, health in self.tiers.items()}
@@ -0,0 +1,100 @@
+import collections
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+# Rule 2 of BASE_PROMPT
+OFFTOPIC_REPLY = "Veuillez saisir les détails de la déconnexion."
+
+logger = logging.getLogger(__name__)
+
+CELL_ID_RE = re.compile(r"\b[23](?:0[1-9]|[12]\d|3[0-3])\b")
+KEYWORD_RE = re.compile(
+    r"gsm|handover|\bho\b|\bbsc\b|\bbts\b|cell|cellule|couche|layer|site|déconnexion|deconnexion|"
+    r"coupure|perte|drop|appel|signal|rxlev|rxqual|niveau|qualit|fréquence|frequence|puissance|"
+    r"interférence|interference|voisin|neighbo|hystér|hyster|pbgt|pénalit|penalt|ping|tgv|train|"
+    r"\bm1\b|\bm2\b|rabat|kénitra|kenitra|tanger|radio|mml|g2gncell|timer|seuil|threshold|"
+    r"réseau|reseau|liaison|couverture|communication|brouillage|interruption",
+    re.IGNORECASE,
+)
+
+# Tiny seed corpus; the keyword and entity rules carry most of the decisions
+ON_TOPIC = [
+    "échec de handover entre la cellule 205 et 206",
+    "coupure de communication sur le TGV au site 12 sens M1",
+    "ping-pong entre couche 2 et couche 3",
+    "perte de signal après le tunnel, appel coupé",
+    "déconnexion fréquente pendant le trajet Kénitra Tanger",
+    "le train perd la liaison radio entre deux sites",
+    "HO failure between source and neighbour cell",
+    "call drop on high speed train after handover",
+    "mauvaise qualité de réception avant la coupure",
+    "niveau de réception trop faible sur la voie",
+    "quel seuil modifier pour éviter les coupures",
+    "le mobile reste accroché à l'ancienne cellule",
+]
+OFF_TOPIC = [
+    "bonjour", "salut ça va", "test", "hello world", "asdf qwerty", "merci",
+    "quelle est la météo demain", "écris-moi un poème", "raconte une blague",
+    "qui a gagné le match hier", "recette du couscous", "traduis ce texte en anglais",
+    "what is the capital of france", "write a python script", "how are you",
+    "donne moi un résumé du film",
+]
+
+@dataclass(frozen=True)
+class GateDecision:
+    off_topic: bool
+    confidence: float
+    reason: str
+
+    @property
+    def answer(self):
+        return OFFTOPIC_REPLY if self.off_topic else None
+
+class OffTopicGate:
+    """Answers clearly off-topic input locally and lets everything else through."""
+
+    def __init__(self, parameter_ids=(), threshold=0.75, log_size=500):
+        self.threshold = threshold
+        self._parameter_re = re.compile(r"\b(?:" + "|".join(parameter_ids) + r")\b", re.IGNORECASE) if parameter_ids else None
+        self._model = make_pipeline(
+            TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), strip_accents="unicode"),
+            LogisticRegression(C=20.0),
+        )
+        self._model.fit(ON_TOPIC + OFF_TOPIC, [0] * len(ON_TOPIC) + [1] * len(OFF_TOPIC))
+        self._lock = threading.Lock()
+        self.decisions = collections.deque(maxlen=log_size)
+
+    def classify(self, text):
+        stripped = text.strip()
+        if not stripped:
+            return GateDecision(True, 1.0, "empty")
+        if CELL_ID_RE.search(stripped):
+            return GateDecision(False, 1.0, "cell id")
+        if self._parameter_re is not None and self._parameter_re.search(stripped):
+            return GateDecision(False, 1.0, "parameter id")
+        if KEYWORD_RE.search(stripped):
+            return GateDecision(False, 0.95, "keyword")
+        if not any(ch.isalpha() for ch in stripped):
+            # "???", "...", "!!!": nothing to read
+            return GateDecision(True, 1.0, "junk")
+        p_off = float(self._model.predict_proba([stripped])[0][1])
+        if p_off >= self.threshold:
+            return GateDecision(True, p_off, "classifier")
+        # Not sure either way: let the LLM apply rule 2 itself
+        return GateDecision(False, 1.0 - p_off, "uncertain")
+
+    def check(self, text):
+        start = time.perf_counter()
+        decision = self.classify(text)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        with self._lock:
+            self.decisions.append((time.time(), text[:80], decision, elapsed_us))
+        logger.info("off-topic gate: %s (%s, %.2f) in %.0f µs", decision.off_topic, decision.reason, decision.confidence, elapsed_us)
+        return decision
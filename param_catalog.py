@@ -0,0 +1,211 @@
+import re
+
+PARAMETER_SECTION = "## 6."
+SECTION_RE = re.compile(r"^## \d+\.", re.MULTILINE)
+BLOCK_RE = re.compile(r"^(\d+)\. ([A-Z0-9]+) - ", re.MULTILINE)
+FIELD_RE = re.compile(r"^([A-Za-z ]+): (.*)$", re.MULTILINE)
+FEATURE_RE = re.compile(r"\(([A-Z]+-\d+)\)")
+OFFSET_RE = re.compile(r"Actual value = GUI value ([+-]) (\d+)")
+NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+# The token after a parameter ID in free text: "PBGTMARGIN = 72", "NCELLPUNEN est YES", "PBGTMARGIN 68"
+VALUE_RE = re.compile(r"\s*(?:(?:[:=]|(?:EST|IS|À|A)\b)\s*)?(-?\d+(?:\.\d+)?\b|\w+)")
+
+# Section 6 only spells out the MML commands once; every parameter listed
+# there is an attribute of the G2GNCELL managed object
+DEFAULT_MML_COMMANDS = ("ADD G2GNCELL", "MOD G2GNCELL")
+
+def split_section(prompt, heading):
+    """Return (head, title, body, tail) around the "## N." section of the prompt."""
+    start = prompt.index(heading)
+    end = SECTION_RE.search(prompt, start + len(heading)).start()
+    section = prompt[start:end]
+    title, _, body = section.partition("\n")
+    return prompt[:start], title.strip(), body, prompt[end:]
+
+def split_parameter_section(prompt):
+    return split_section(prompt, PARAMETER_SECTION)
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+def parse_range(text):
+    # "0~127" -> ((0, 127),), "1~65533, 65535" -> ((1, 65533), (65535, 65535))
+    if not text or "character" in text:
+        return ()
+    intervals = []
+    for part in text.split(","):
+        bounds = NUMBER_RE.findall(part)
+        if len(bounds) == 2 and "~" in part:
+            intervals.append((_number(bounds[0]), _number(bounds[1])))
+        elif len(bounds) == 1:
+            intervals.append((_number(bounds[0]),) * 2)
+    return tuple(intervals)
+
+def parse_enumeration(text):
+    # "BYNAME~0, BYID~1" -> {"BYNAME": 0, "BYID": 1}
+    if not text:
+        return {}
+    return {name.strip(): int(code) for name, code in (item.split("~") for item in text.split(","))}
+
+def parse_value(text, enumeration):
+    if text is None or text == "None":
+        return None
+    if text in enumeration:
+        return text
+    numbers = NUMBER_RE.findall(text)
+    return _number(numbers[0]) if numbers else text
+
+# --- Records ---
+class Parameter:
+    __slots__ = (
+        "number", "id", "name", "mml_commands", "meaning", "value_type",
+        "gui_range", "actual_range", "enumeration", "offset", "step", "unit",
+        "default", "recommended", "recommended_values", "mandatory", "features", "block",
+    )
+
+    def __init__(self, number, block):
+        fields = dict(FIELD_RE.findall(block))
+        self.number = number
+        self.block = block
+        self.id = fields["Parameter ID"]
+        self.name = fields["Parameter Name"]
+        commands = fields.get("MML Commands")
+        self.mml_commands = tuple(c.strip() for c in commands.split(",")) if commands else DEFAULT_MML_COMMANDS
+        self.meaning = fields.get("Meaning", "")
+        self.value_type = fields.get("Value Type", "")
+        self.enumeration = parse_enumeration(fields.get("Enumeration"))
+        self.gui_range = parse_range(fields.get("GUI Value Range")) if not self.enumeration else ()
+        self.actual_range = parse_range(fields.get("Actual Value Range"))
+        # Timers are entered in 0.5 s steps ("Unit: 0.5s")
+        unit = fields.get("Unit", "")
+        step = re.match(r"(\d+(?:\.\d+)?)\s*(\S+)", unit)
+        self.step = _number(step.group(1)) if step else 1
+        self.unit = step.group(2) if step else unit
+        # "Actual value = GUI value - 64", stated in the meaning or implied by the ranges
+        offset = OFFSET_RE.search(self.meaning)
+        if offset:
+            self.offset = int(offset.group(2)) * (1 if offset.group(1) == "+" else -1)
+        elif len(self.gui_range) == 1 and len(self.actual_range) == 1:
+            self.offset = _number(self.actual_range[0][0] - self.gui_range[0][0] * self.step)
+        else:
+            self.offset = 0
+        self.default = parse_value(fields.get("Default Value"), self.enumeration)
+        self.recommended = fields.get("Recommended Value")
+        self.recommended_values = tuple(
+            parse_value(v, self.enumeration)
+            for v in re.findall(r"[A-Z_0-9]+(?:\.\d+)?", self.recommended or "")
+            if v != "None" and (v in self.enumeration or NUMBER_RE.fullmatch(v))
+        )
+        self.mandatory = fields.get("Mandatory") == "YES"
+        self.features = tuple(FEATURE_RE.findall(fields.get("Features") or fields.get("Feature", "")))
+
+    def __repr__(self):
+        return f"Parameter({self.id!r})"
+
+    @property
+    def is_numeric(self):
+        return bool(self.gui_range)
+
+    def in_range(self, gui_value):
+        if self.enumeration:
+            return gui_value in self.enumeration
+        return any(low <= gui_value <= high for low, high in self.gui_range)
+
+    def to_actual(self, gui_value):
+        return gui_value * self.step + self.offset
+
+    def compact(self):
+        """One-line rendering for prompts: about a third of the original block."""
+        meaning = re.sub(r"\.?\s*Actual value = GUI value [+-] \d+", "", self.meaning)
+        parts = [f"{self.id} ({self.name}) : {meaning}"]
+        if self.enumeration:
+            parts.append("valeurs " + "/".join(self.enumeration))
+        elif self.gui_range:
+            limits = ", ".join(f"{lo}~{hi}" if lo != hi else f"{lo}" for lo, hi in self.gui_range)
+            unit = f" {self.unit}" if self.unit else ""
+            rule = f", réel = GUI {self.offset:+d}" if self.offset else ""
+            rule += f", réel = GUI × {self.step}" if self.step != 1 else ""
+            parts.append(f"GUI {limits}{rule}{unit}")
+        parts.append(f"défaut {self.default}")
+        if self.recommended and self.recommended != "None":
+            parts.append(f"recommandé {self.recommended}")
+        return " | ".join(parts)
+
+# --- Catalog ---
+class ParameterCatalog:
+    """Section 6 parameters indexed by ID, feature code and MML command."""
+
+    def __init__(self, parameters):
+        self.parameters = tuple(parameters)
+        self.by_id = {p.id: p for p in self.parameters}
+        self.by_feature = {}
+        self.by_mml = {}
+        for p in self.parameters:
+            for feature in p.features:
+                self.by_feature.setdefault(feature, []).append(p)
+            for command in p.mml_commands:
+                self.by_mml.setdefault(command, []).append(p)
+        self.ids = tuple(self.by_id)
+        names = "|".join(sorted(self.ids, key=len, reverse=True))
+        self._id_re = re.compile(rf"\b({names})\b")
+
+    @classmethod
+    def from_prompt(cls, prompt):
+        _, _, body, _ = split_parameter_section(prompt)
+        matches = list(BLOCK_RE.finditer(body))
+        ends = [m.start() for m in matches[1:]] + [len(body)]
+        return cls(
+            Parameter(int(m.group(1)), body[m.start():end].strip())
+            for m, end in zip(matches, ends)
+        )
+
+    def __len__(self):
+        return len(self.parameters)
+
+    def __iter__(self):
+        return iter(self.parameters)
+
+    def __contains__(self, parameter_id):
+        return parameter_id in self.by_id
+
+    def __getitem__(self, parameter_id):
+        return self.by_id[parameter_id]
+
+    def get(self, parameter_id, default=None):
+        return self.by_id.get(parameter_id, default)
+
+    def mentioned(self, text):
+        # Parameter IDs named in free text, in order of first appearance
+        return list(dict.fromkeys(self._id_re.findall(text.upper())))
+
+    def extract_values(self, text, cells=()):
+        """(parameter ID, GUI value) pairs stated in free text, e.g. "PBGTMARGIN 68", "NCELLPUNEN = YES".
+
+        Only a number or a name of the parameter's enumeration counts as its
+        value. A Cell ID ("PBGTMARGIN 205 vers 206") or a plain word
+        ("NCELLPUNEN est activé") after the ID is skipped.
+        """
+        text = text.upper()
+        pairs = []
+        for match in self._id_re.finditer(text):
+            parameter = self.by_id[match.group(1)]
+            token = VALUE_RE.match(text, match.end())
+            if token is None:
+                continue
+            raw = token.group(1)
+            if parameter.enumeration:
+                if raw in parameter.enumeration:
+                    pairs.append((parameter.id, raw))
+            elif NUMBER_RE.fullmatch(raw) and _number(raw) not in cells:
+                pairs.append((parameter.id, _number(raw)))
+        return pairs
+
+    def validate(self, parameter_id, gui_value):
+        """Return an error message for an unknown ID or out-of-range value, else None."""
+        parameter = self.by_id.get(parameter_id)
+        if parameter is None:
+            return f"Paramètre inconnu : {parameter_id}"
+        if (parameter.enumeration or parameter.gui_range) and not parameter.in_range(gui_value):
+            return f"{parameter_id} = {gui_value} hors plage"
+        return None
@@ -0,0 +1,103 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from param_catalog import split_parameter_section
+
+# Operator vocabulary -> parameters it usually concerns
+KEYWORDS = {
+    "ping": ("INTERCELLHYST", "NCELLPUNEN", "NCELLPUNTM", "NCELLPUNLEV", "INTELEVHOHYST"),
+    "pong": ("INTERCELLHYST", "NCELLPUNEN", "NCELLPUNTM", "NCELLPUNLEV", "INTELEVHOHYST"),
+    "hystér": ("INTERCELLHYST", "INTELEVHOHYST"),
+    "hyster": ("INTERCELLHYST", "INTELEVHOHYST"),
+    "pénalit": ("NCELLPUNEN", "NCELLPUNSTPTH", "NCELLPUNTM", "NCELLPUNLEV"),
+    "penalt": ("NCELLPUNEN", "NCELLPUNSTPTH", "NCELLPUNTM", "NCELLPUNLEV"),
+    "pbgt": ("PBGTMARGIN", "PBGTSTAT", "PBGTLAST", "LOADHOPBGTMARGIN"),
+    "couche": ("INTELEVHOHYST", "LEVSTAT", "LEVLAST"),
+    "layer": ("INTELEVHOHYST", "LEVSTAT", "LEVLAST"),
+    "qualit": ("BQMARGIN", "BQSTATTIME", "BQLASTTIME", "ULBQSTATTIME", "ULBQLASTTIME"),
+    "quality": ("BQMARGIN", "BQSTATTIME", "BQLASTTIME", "ULBQSTATTIME", "ULBQLASTTIME"),
+    "edge": ("EDGEADJSTATTIME", "EDGEADJLASTTIME", "EDOUTHOOFFSET"),
+    "bord": ("EDGEADJSTATTIME", "EDGEADJLASTTIME", "EDOUTHOOFFSET"),
+    "vitesse": ("HOSTATICTIME", "HOLASTTIME", "HCSSTATTIME", "HCSLASTTIME", "ISCHAINNCELL"),
+    "speed": ("HOSTATICTIME", "HOLASTTIME", "HCSSTATTIME", "HCSLASTTIME", "ISCHAINNCELL"),
+    "chain": ("ISCHAINNCELL", "CHAINNCELLTYPE"),
+    "timing advance": ("TASTATTIME", "TALASTTIME"),
+    "priorit": ("NCELLPRI",),
+    "ibca": ("IBCADYNCMEASURENCELLALLOWED", "IBCARXLEVOFFSET", "NCELLTYPE"),
+    "charge": ("LOADHOPBGTMARGIN",),
+    "load": ("LOADHOPBGTMARGIN",),
+    "directed retry": ("DRHOLEVRANGE",),
+}
+
+def estimate_tokens(text):
+    # Close enough to Gemini's tokenizer for French/English technical text
+    return max(1, len(text) // 4)
+
+@dataclass
+class PrunedPrompt:
+    prompt: str
+    parameter_ids: list
+    full_tokens: int
+    pruned_tokens: int
+    sites: tuple = ()
+
+    @property
+    def tokens_saved(self):
+        return self.full_tokens - self.pruned_tokens
+
+class ParameterIndex:
+    """Keyword, parameter-ID and TF-IDF retrieval over the parameter catalog.
+
+    The prompt is pruned only when retrieval is sure: a keyword or an explicit
+    parameter ID matched, or the best TF-IDF score reaches confident_score.
+    A few weak TF-IDF hits keep the full prompt.
+    """
+
+    def __init__(self, prompt, catalog, top_k=5, min_score=0.12, confident_score=0.4):
+        self.catalog = catalog
+        self.top_k = top_k
+        self.min_score = min_score
+        self.confident_score = confident_score
+        self._head, self._title, _, self._tail = split_parameter_section(prompt)
+        self.ids = list(catalog.ids)
+        self._position = {pid: i for i, pid in enumerate(self.ids)}
+        self._id_re = re.compile(r"\b(" + "|".join(sorted(self.ids, key=len, reverse=True)) + r")\b")
+        self._vectorizer = TfidfVectorizer(sublinear_tf=True, strip_accents="unicode", lowercase=True)
+        self._matrix = self._vectorizer.fit_transform([p.block for p in catalog])
+        self.full_tokens = estimate_tokens(prompt)
+
+    def _scores(self, query):
+        # (scores, whether a keyword or parameter ID matched)
+        scores = (self._matrix @ self._vectorizer.transform([query]).T).toarray().ravel()
+        lowered = query.lower()
+        hinted = False
+        for keyword, pids in KEYWORDS.items():
+            if keyword in lowered:
+                hinted = True
+                for pid in pids:
+                    scores[self._position[pid]] += 0.5
+        for pid in self._id_re.findall(query.upper()):
+            hinted = True
+            scores[self._position[pid]] += 10.0
+        return scores, hinted
+
+    def _top(self, scores):
+        order = np.argsort(-scores, kind="stable")[: self.top_k]
+        return [(self.ids[i], float(scores[i])) for i in order if scores[i] >= self.min_score]
+
+    def rank(self, query):
+        return self._top(self._scores(query)[0])
+
+    def prune(self, query):
+        """Prompt restricted to the top-k parameter blocks, or None to use the full prompt."""
+        scores, hinted = self._scores(query)
+        if not hinted and scores.max() < self.confident_score:
+            return None
+        ranked = self._top(scores)
+        keep = sorted(self._position[pid] for pid, _ in ranked)
+        section = "\n".join([self._title] + [self.catalog[self.ids[i]].compact() for i in keep])
+        prompt = f"{self._head}{section}\n\n{self._tail}"
+        return PrunedPrompt(prompt, [self.ids[i] for i in keep], self.full_tokens, estimate_tokens(prompt))
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+
+# Lower value is admitted first
+INCIDENT = 0
+ROUTINE = 1
+BATCH = 2
+
+class QueueTimeout(RuntimeError):
+    pass
+
+class TokenBucket:
+    """Continuously refilled budget of `per_minute` units, bursting up to `capacity`."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        # May go negative when a call used more than estimated
+        self.level -= amount
+
+@dataclass(order=True)
+class Ticket:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    enqueued: float = field(compare=False, default_factory=time.monotonic)
+    admitted: float = field(compare=False, default=None)
+
+    @property
+    def waited(self):
+        return (self.admitted or time.monotonic()) - self.enqueued
+
+class AdmissionQueue:
+    """Process-wide requests-per-minute and tokens-per-minute limiter.
+
+    Callers wait in a single priority queue (FIFO within a priority), and only
+    the head of the queue may draw from the buckets, so a routine request can
+    never overtake an incident one and nobody starves behind later arrivals.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_wait=120.0, poll_interval=0.25):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self.stats = {"admitted": 0, "timeouts": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _enqueue(self, tokens, priority):
+        ticket = Ticket(priority, next(self._seq), tokens)
+        with self._lock:
+            heapq.heappush(self._heap, ticket)
+        return ticket
+
+    def _poll(self, ticket):
+        # (admitted, seconds to wait, 1-based queue position)
+        with self._lock:
+            if self._heap[0] is not ticket:
+                return False, self.poll_interval, sorted(self._heap).index(ticket) + 1
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.tokens, now))
+            if wait > 0:
+                return False, min(wait, self.poll_interval), 1
+            self.requests.take(1)
+            self.tokens.take(ticket.tokens)
+            heapq.heappop(self._heap)
+            ticket.admitted = now
+            self.stats["admitted"] += 1
+            self.stats["wait_seconds"] += ticket.waited
+            return True, 0.0, 0
+
+    def _leave(self, ticket):
+        with self._lock:
+            if ticket in self._heap:
+                self._heap.remove(ticket)
+                heapq.heapify(self._heap)
+
+    def _check_timeout(self, ticket, max_wait):
+        if ticket.waited > max_wait:
+            self.stats["timeouts"] += 1
+            raise QueueTimeout(f"Quota Gemini saturé : requête non admise après {max_wait:.0f}s d'attente")
+
+    def acquire(self, tokens, priority=ROUTINE, on_position=None, timeout=None):
+        """Block until admitted; on_position(position) is called while queued.
+
+        timeout shortens max_wait for callers with their own deadline.
+        """
+        max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        ticket = self._enqueue(tokens, priority)
+        try:
+            while True:
+                admitted, wait, position = self._poll(ticket)
+                if admitted:
+                    return ticket
+                self._check_timeout(ticket, max_wait)
+                if on_position is not None:
+                    on_position(position)
+                time.sleep(wait)
+        finally:
+            # Also covers callers interrupted while waiting (e.g. a Streamlit rerun)
+            if ticket.admitted is None:
+                self._leave(ticket)
+
+    async def acquire_async(self, tokens, priority=ROUTINE, on_position=None, timeout=None):
+        max_wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+        ticket = self._enqueue(tokens, priority)
+        try:
+            while True:
+                admitted, wait, position = self._poll(ticket)
+                if admitted:
+                    return ticket
+                self._check_timeout(ticket, max_wait)
+                if on_position is not None:
+                    on_position(position)
+                await asyncio.sleep(wait)
+        finally:
+            if ticket.admitted is None:
+                self._leave(ticket)
+
+    def settle(self, ticket, used_tokens):
+        # Correct the token bucket once the real usage is known
+        with self._lock:
+            self.tokens.take(used_tokens - ticket.tokens)
+
+    def throttled(self):
+        # Upstream answered 429: empty the request bucket so the queue backs off
+        with self._lock:
+            self.requests.level = min(self.requests.level, 0)
+            self.stats["throttled"] += 1
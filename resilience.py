@@ -0,0 +1,234 @@
+import asyncio
+import contextvars
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from google.api_core import exceptions as api_exceptions
+from google.generativeai.types import BlockedPromptException, StopCandidateException
+
+from rate_limit import QueueTimeout
+
+# --- Errors ---
+class AnalysisError(Exception):
+    """An upstream failure as the caller should see it: a stable code, a message, whether to retry."""
+
+    def __init__(self, code, message, retryable=False, attempts=1):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.retryable = retryable
+        self.attempts = attempts
+
+    def to_dict(self):
+        return {"code": self.code, "message": self.message, "retryable": self.retryable, "attempts": self.attempts}
+
+# Checked in order: ResourceExhausted is a TooManyRequests, DeadlineExceeded a ServerError
+ERROR_CLASSES = (
+    (QueueTimeout, "queue_timeout", False),
+    (api_exceptions.TooManyRequests, "rate_limited", True),
+    ((api_exceptions.GatewayTimeout, TimeoutError), "timeout", True),
+    ((api_exceptions.ServerError, ConnectionError), "unavailable", True),
+    ((BlockedPromptException, StopCandidateException), "blocked", False),
+    (api_exceptions.ClientError, "invalid_request", False),
+)
+
+def classify(exc):
+    if isinstance(exc, AnalysisError):
+        return exc
+    for types, code, retryable in ERROR_CLASSES:
+        if isinstance(exc, types):
+            return AnalysisError(code, str(exc) or type(exc).__name__, retryable)
+    return AnalysisError("upstream", str(exc) or type(exc).__name__)
+
+# --- Latency ---
+class LatencyTracker:
+    def __init__(self, size=500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+# --- Calls ---
+class ResilientCaller:
+    """Deadline, retries and optional hedging around a single upstream attempt.
+
+    An attempt is a function of the seconds it may take. Retryable errors are
+    retried with full-jitter exponential backoff as long as the deadline
+    allows. With hedging on, an attempt still running after the observed p95
+    latency gets a duplicate, and the first answer wins.
+    """
+
+    def __init__(self, deadline=90.0, retries=2, backoff=0.5, max_backoff=8.0,
+                 hedge=False, hedge_delay=10.0, min_samples=20, max_workers=64):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge") if hedge else None
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+
+    def hedge_after(self):
+        if not self.hedge:
+            return None
+        if len(self.latency) < self.min_samples:
+            return self.hedge_delay
+        return self.latency.percentile(95)
+
+    def _pause(self, attempt_number):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt_number - 1)))
+
+    def _next_pause(self, error, number, retries, end):
+        # Seconds to sleep before the next attempt, or None to give up
+        if not error.retryable or number > retries:
+            return None
+        pause = self._pause(number)
+        if time.monotonic() + pause >= end:
+            return None
+        self.stats["retries"] += 1
+        return pause
+
+    def _raise(self, exc, number):
+        error = classify(exc)
+        error.attempts = number
+        self.stats["failures"] += 1
+        raise error from (None if error is exc else exc)
+
+    def _timeout(self, deadline, number):
+        self.stats["failures"] += 1
+        return AnalysisError("timeout", f"Pas de réponse dans le délai de {deadline:.0f}s", True, number)
+
+    def call(self, attempt, deadline=None, retries=None, hedge=True):
+        """Run attempt(timeout) until it succeeds; failures are raised as AnalysisError."""
+        deadline = self.deadline if deadline is None else deadline
+        retries = self.retries if retries is None else retries
+        end = time.monotonic() + deadline
+        self.stats["calls"] += 1
+        for number in itertools.count(1):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise self._timeout(deadline, number - 1)
+            try:
+                return self._once(attempt, remaining, hedge)
+            except Exception as e:
+                pause = self._next_pause(classify(e), number, retries, end)
+                if pause is None:
+                    self._raise(e, number)
+            time.sleep(pause)
+
+    def _timed(self, attempt, timeout):
+        start = time.monotonic()
+        result = attempt(timeout)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def _once(self, attempt, timeout, hedge):
+        if not hedge:
+            return attempt(timeout)
+        delay = self.hedge_after()
+        if delay is None or delay >= timeout:
+            return self._timed(attempt, timeout)
+        # Worker threads carry the caller's trace along
+        primary = self._pool.submit(contextvars.copy_context().run, self._timed, attempt, timeout)
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+        self.stats["hedges"] += 1
+        pending = {primary, self._pool.submit(contextvars.copy_context().run, self._timed, attempt, timeout - delay)}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"Pas de réponse en {timeout:.0f}s")
+            for future in done:
+                if future.exception() is None:
+                    self.stats["hedge_wins"] += future is not primary
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stream(self, attempt, deadline=None, retries=None):
+        """Retry a streaming attempt until its first chunk; later errors end the stream.
+
+        Streams are never hedged: their time to first chunk is not comparable
+        with the latency of complete answers.
+        """
+        def start(timeout):
+            chunks = iter(attempt(timeout))
+            first = next(chunks, None)
+            return itertools.chain([] if first is None else [first], chunks)
+
+        chunks = self.call(start, deadline, retries, hedge=False)
+        try:
+            yield from chunks
+        except Exception as e:
+            self._raise(e, 1)
+
+    async def call_async(self, attempt, deadline=None, retries=None):
+        """call() for a coroutine function attempt(timeout)."""
+        deadline = self.deadline if deadline is None else deadline
+        retries = self.retries if retries is None else retries
+        end = time.monotonic() + deadline
+        self.stats["calls"] += 1
+        for number in itertools.count(1):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise self._timeout(deadline, number - 1)
+            try:
+                return await self._once_async(attempt, remaining)
+            except Exception as e:
+                pause = self._next_pause(classify(e), number, retries, end)
+                if pause is None:
+                    self._raise(e, number)
+            await asyncio.sleep(pause)
+
+    async def _timed_async(self, attempt, timeout):
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(attempt(timeout), timeout)
+        except TimeoutError:
+            raise TimeoutError(f"Pas de réponse en {timeout:.0f}s") from None
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def _once_async(self, attempt, timeout):
+        delay = self.hedge_after()
+        primary = asyncio.ensure_future(self._timed_async(attempt, timeout))
+        pending = {primary}
+        try:
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    self.stats["hedges"] += 1
+                    pending.add(asyncio.ensure_future(self._timed_async(attempt, timeout - delay)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.stats["hedge_wins"] += task is not primary
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing duplicate is cancelled, not left running
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,112 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+from cachetools import TTLCache
+
+# --- Query normalization ---
+_ARROWS = re.compile(r"\s*(?:->|=>|→|⇒)\s*")
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s.;:!?]+$")
+
+def normalize_query(text):
+    # "HO failure 205 -> 206,  PBGTMARGIN 68." and "ho failure 205→206, pbgtmargin 68"
+    # map to the same key
+    text = _ARROWS.sub("→", text.strip().lower())
+    text = _SPACES.sub(" ", text)
+    text = re.sub(r"\s*,\s*", ", ", text)
+    return _TRAILING.sub("", text)
+
+def make_cache_key(query, prompt_hash, model_name):
+    raw = "\x1f".join((normalize_query(query), prompt_hash, model_name))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# --- Two-tier cache ---
+class ResponseCache:
+    """In-memory LRU/TTL tier backed by a size-bounded SQLite tier."""
+
+    def __init__(self, path, memory_size=256, memory_ttl=3600, max_rows=5000):
+        self.max_rows = max_rows
+        self._memory = TTLCache(maxsize=memory_size, ttl=memory_ttl)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, query TEXT, response TEXT,"
+            " created_at REAL, last_access REAL, hits INTEGER DEFAULT 0, prompt_hash TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(responses)")}
+        if "prompt_hash" not in columns:
+            self._db.execute("ALTER TABLE responses ADD COLUMN prompt_hash TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self.stats["memory_hits"] += 1
+                return value
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self._memory[key] = row[0]
+            self.stats["disk_hits"] += 1
+            return row[0]
+
+    def put(self, key, response, query="", model_name="", prompt_hash=""):
+        now = time.time()
+        with self._lock:
+            self._memory[key] = response
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, model, query, response, created_at, last_access, prompt_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, query, response, now, now, prompt_hash),
+            )
+            self._evict()
+
+    def _evict(self):
+        # Drop least recently used rows once the table outgrows max_rows
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_rows
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN"
+                " (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            self.stats["evictions"] += excess
+
+    def history(self, model_name, prompt_hash):
+        # (query, response) pairs still valid for this model and prompt
+        with self._lock:
+            return self._db.execute(
+                "SELECT query, response FROM responses WHERE model = ? AND prompt_hash = ?",
+                (model_name, prompt_hash),
+            ).fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+
+    def summary(self):
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return dict(
+                self.stats,
+                memory_entries=len(self._memory),
+                disk_entries=rows,
+                hit_rate=hits / lookups if lookups else 0.0,
+            )
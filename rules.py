@@ -0,0 +1,208 @@
+import argparse
+import json
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+
+# "N in P/N ..." watch times and the "P in P/N ..." valid time of the same criterion
+PN_RE = re.compile(r"\b([PN]) in P/N\b")
+PN_SUFFIXES = (("STATICTIME", "LASTTIME"), ("STATTIME", "LASTTIME"), ("STAT", "LAST"))
+SEVERITY = {"range": 2, "pn": 1, "recommended": 0}
+
+@dataclass
+class Finding:
+    rule: str
+    parameter: str
+    current: object
+    recommended: object
+    justification: str
+    impact: str
+    source: int = None
+    neighbour: int = None
+
+    @property
+    def severity(self):
+        return SEVERITY[self.rule]
+
+    def bullet(self):
+        # Section 7 "valeur connue" format
+        where = f" (Cell ID {self.source} → Neighbor Cell ID {self.neighbour})" if self.source is not None else ""
+        return (
+            f"• {self.parameter}{where} : {self.current} → {self.recommended}\n\n"
+            f"Justification : {self.justification}\n\n"
+            f"Impact attendu : {self.impact}"
+        )
+
+class RuleEngine:
+    """Mechanical checks of G2GNCELL values against the section 6 limits.
+
+    range: a value outside the GUI range; recommended: a numeric value
+    further from every recommended value than `tolerance` (share of the GUI
+    range); pn: a P valid time longer than the N watch time of the same
+    P/N criterion, which can never be met. Values are GUI values, as in
+    MML dumps and section 6.
+    """
+
+    def __init__(self, catalog, tolerance=0.05):
+        self.catalog = catalog
+        self.tolerance = tolerance
+        self.pairs = []
+        for parameter in catalog:
+            match = PN_RE.search(parameter.meaning)
+            if not match or match.group(1) != "N":
+                continue
+            for stat, last in PN_SUFFIXES:
+                candidate = parameter.id.replace(stat, last)
+                if candidate != parameter.id and candidate in catalog:
+                    self.pairs.append((parameter.id, candidate))
+                    break
+        self._partner = {p: n for n, p in self.pairs} | {n: p for n, p in self.pairs}
+
+    def _slack(self, parameter):
+        low = min(lo for lo, _ in parameter.gui_range)
+        high = max(hi for _, hi in parameter.gui_range)
+        return max(1, round((high - low) * self.tolerance))
+
+    def _unit(self, parameter, gui_value):
+        actual = parameter.to_actual(gui_value)
+        return f"{actual:g} {parameter.unit}".strip() if parameter.unit else f"{actual:g}"
+
+    def _check_value(self, parameter, value, rules):
+        if not parameter.is_numeric or not isinstance(value, (int, float)):
+            return None
+        numeric = [v for v in parameter.recommended_values if isinstance(v, (int, float))]
+        if not parameter.in_range(value):
+            if "range" not in rules:
+                return None
+            target = min(numeric, key=lambda v: abs(v - value)) if numeric else parameter.default
+            limits = ", ".join(f"{lo}~{hi}" if lo != hi else f"{lo}" for lo, hi in parameter.gui_range)
+            return Finding(
+                "range", parameter.id, value, target,
+                f"{value} est hors de la plage GUI {limits} de {parameter.name} ; le BSC rejette ou "
+                f"tronque cette valeur, le comportement réel du handover n'est donc pas celui attendu.",
+                "Configuration conforme aux limites du paramètre et handover de nouveau prévisible.",
+            )
+        if "recommended" not in rules or not numeric or value in numeric:
+            return None
+        target = min(numeric, key=lambda v: abs(v - value))
+        if abs(value - target) <= self._slack(parameter):
+            return None
+        recommended = " / ".join(str(v) for v in numeric)
+        return Finding(
+            "recommended", parameter.id, value, target,
+            f"{parameter.name} à {value} ({self._unit(parameter, value)}) s'écarte nettement de la valeur "
+            f"recommandée {recommended} ; {target} ({self._unit(parameter, target)}) est la plus proche.",
+            "Retour au réglage validé pour ce paramètre, avec moins de handovers tardifs ou prématurés.",
+        )
+
+    def _check_pn(self, watch, valid, values):
+        # Missing from the dump means the BSC default applies
+        n = values.get(watch, self.catalog[watch].default)
+        p = values.get(valid, self.catalog[valid].default)
+        if not isinstance(n, (int, float)) or not isinstance(p, (int, float)) or p <= n:
+            return None
+        target = min(n, self.catalog[valid].default) if isinstance(self.catalog[valid].default, int) else n
+        return Finding(
+            "pn", valid, p, target,
+            f"Critère P/N incohérent : {valid} (P = {p}) dépasse {watch} (N = {n}), la condition "
+            f"« P mesures sur N » ne peut jamais être remplie et ce handover ne se déclenche pas.",
+            "Le handover se déclenche de nouveau dans la fenêtre prévue, sans coupure en bord de cellule.",
+        )
+
+    def check(self, values, source=None, neighbour=None, parameter_ids=None, rules=tuple(SEVERITY)):
+        """Findings for one relation's {parameter ID: GUI value}, most severe first.
+
+        parameter_ids restricts the checks to these parameters and the P/N
+        criteria they belong to; rules to some of "range", "recommended", "pn".
+        """
+        wanted = set(values if parameter_ids is None else parameter_ids)
+        findings = []
+        for parameter_id in wanted:
+            parameter = self.catalog.get(parameter_id)
+            if parameter is not None and parameter_id in values:
+                finding = self._check_value(parameter, values[parameter_id], rules)
+                if finding is not None:
+                    findings.append(finding)
+        for watch, valid in self.pairs if "pn" in rules else ():
+            if (watch in wanted or valid in wanted) and (watch in values or valid in values):
+                finding = self._check_pn(watch, valid, values)
+                if finding is not None:
+                    findings.append(finding)
+        for finding in findings:
+            finding.source, finding.neighbour = source, neighbour
+        # A value out of range already gets its own bullet; its P/N consequence is implied
+        flagged = {f.parameter for f in findings if f.rule == "range"}
+        findings = [f for f in findings if f.rule != "pn" or f.parameter not in flagged]
+        return sorted(findings, key=lambda f: (-f.severity, f.parameter))
+
+    def sweep(self, frame):
+        """{(source, neighbour): findings} over a NeighbourConfig frame, for relations with findings.
+
+        Cells at their default or recommended value cannot fail a check, so a
+        vectorized pass first keeps only the rows holding other values or an
+        inverted P/N pair; only those rows are checked one by one.
+        """
+        numeric = [p.id for p in self.catalog if p.is_numeric and p.id in frame.columns]
+        values = frame[numeric].apply(pd.to_numeric, errors="coerce")
+        expected = {
+            p: [v for v in (self.catalog[p].default, *self.catalog[p].recommended_values) if isinstance(v, (int, float))]
+            for p in numeric
+        }
+        unusual = pd.concat([values[p].notna() & ~values[p].isin(expected[p]) for p in numeric], axis=1).any(axis=1)
+        for watch, valid in self.pairs:
+            if watch in values or valid in values:
+                n = values[watch].fillna(self.catalog[watch].default) if watch in values else self.catalog[watch].default
+                p = values[valid].fillna(self.catalog[valid].default) if valid in values else self.catalog[valid].default
+                unusual |= p > n
+        results = {}
+        for (source, neighbour), row in frame[unusual.to_numpy()].iterrows():
+            findings = self.check(row.dropna().to_dict(), source, neighbour)
+            if findings:
+                results[(source, neighbour)] = findings
+        return results
+
+    @staticmethod
+    def answer(findings, limit=2):
+        # Section 7 asks for 1 to 2 parameters at a time
+        return "\n\n".join(f.bullet() for f in findings[:limit])
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Check every G2GNCELL relation of an MML dump against the section 6 rules")
+    parser.add_argument("mml", nargs="?", help="MML dump or directory (default: MML_DUMP_PATH)")
+    parser.add_argument("--docx", help="also write the findings as a Word report")
+    parser.add_argument("--jsonl", help="also write one JSON record per relation with findings")
+    args = parser.parse_args()
+
+    # The analyzer reads its settings at import time
+    import analyzer
+    from mml_config import NeighbourConfig
+    from word_export import write_bulk_report
+
+    catalog = analyzer.get_parameter_catalog()
+    config = NeighbourConfig.from_path(args.mml, catalog) if args.mml else analyzer.get_neighbour_config()
+    if config is None:
+        parser.error("no MML dump: pass a path or set MML_DUMP_PATH")
+    topology = analyzer.get_topology()
+    results = analyzer.get_rule_engine().sweep(config.frame)
+    records = []
+    for (source, neighbour), findings in results.items():
+        where = f"site {topology[source].site}" if source in topology else "hors ligne"
+        records.append({
+            "id": f"{source} -> {neighbour}",
+            "query": f"Relation {source} -> {neighbour} ({where}) : {len(findings)} constat(s)",
+            "status": "ok",
+            "result": RuleEngine.answer(findings, limit=None),
+            "rules": [f.rule for f in findings],
+        })
+        print(f"{source} -> {neighbour}: " + ", ".join(f"{f.parameter} {f.current} → {f.recommended} ({f.rule})" for f in findings))
+    print(f"{len(config)} relations checked, {len(records)} with findings")
+    if args.jsonl:
+        with open(args.jsonl, "w", encoding="utf-8") as out:
+            out.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    if args.docx:
+        write_bulk_report(records, args.docx, title="GSM-R - Contrôle des paramètres G2GNCELL")
+
+if __name__ == "__main__":
+    main()
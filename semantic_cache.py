@@ -0,0 +1,113 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from response_cache import normalize_query
+
+# --- Fingerprint ---
+CELL_ID_RE = re.compile(r"\b([23](?:0[1-9]|[12]\d|3[0-3]))\b")
+NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+NEGATION_RE = re.compile(r"\b(?:pas|aucune?|sans|jamais|plus d(?:e\b|')|no|not|without|never)\b", re.IGNORECASE)
+
+def query_fingerprint(text, topology=None, catalog=None):
+    # Paraphrases may only share an answer when they name the same cells,
+    # handover direction ("205 vers 206" is not "206 vers 205"), parameter
+    # values, numbers (sites, thresholds, timers) and polarity ("pas de
+    # coupure" is not "coupure")
+    cells = tuple(sorted(set(CELL_ID_RE.findall(text))))
+    relation = topology.relation(text) if topology is not None else None
+    known = topology.cells if topology is not None else ()
+    params = tuple(sorted(set(catalog.extract_values(text, known)), key=repr)) if catalog is not None else ()
+    numbers = tuple(sorted(n.replace(",", ".") for n in NUMBER_RE.findall(text)))
+    negated = bool(NEGATION_RE.search(text))
+    return cells, relation, params, numbers, negated
+
+# --- Index ---
+class SemanticCache:
+    """Nearest-neighbour lookup of past answers for paraphrased queries.
+
+    Queries are embedded with a stateless hashing vectorizer, so entries can be
+    added one at a time without refitting. Candidates are restricted to the
+    bucket sharing the query's exact fingerprint before cosine scoring, so a
+    lookup only touches a handful of rows however large the history grows.
+    The oldest entries are dropped past max_size, like the SQLite cache rows.
+
+    The default threshold comes from labelled pairs sharing a fingerprint:
+    rewordings score 0.64-0.92 on char 3-5-grams, near-misses ("valeur" vs
+    "plage" of the same parameter, "tardif" vs "prématuré") up to 0.81.
+    0.82 keeps every near-miss out and still serves the closer rewordings.
+    """
+
+    def __init__(self, threshold=0.82, topology=None, catalog=None, max_size=5000):
+        self.threshold = threshold
+        self.topology = topology
+        self.catalog = catalog
+        self.max_size = max_size
+        self._vectorizer = HashingVectorizer(
+            analyzer="char_wb", ngram_range=(3, 5), n_features=2 ** 18,
+            alternate_sign=False, norm="l2",
+        )
+        self._lock = threading.Lock()
+        # entry id -> (fingerprint, indices, data, response), oldest first
+        self._entries = OrderedDict()
+        self._next_id = 0
+        self._buckets = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _embed(self, texts):
+        return self._vectorizer.transform([normalize_query(t) for t in texts])
+
+    def add(self, query, response):
+        self.add_many([(query, response)])
+
+    def add_many(self, pairs):
+        pairs = list(pairs)
+        if not pairs:
+            return
+        vectors = self._embed([q for q, _ in pairs]).tocsr()
+        with self._lock:
+            for row, (query, response) in enumerate(pairs):
+                start, end = vectors.indptr[row], vectors.indptr[row + 1]
+                fingerprint = query_fingerprint(query, self.topology, self.catalog)
+                self._entries[self._next_id] = (fingerprint, vectors.indices[start:end], vectors.data[start:end], response)
+                self._buckets.setdefault(fingerprint, []).append(self._next_id)
+                self._next_id += 1
+            while len(self._entries) > self.max_size:
+                entry_id, (fingerprint, *_) = self._entries.popitem(last=False)
+                bucket = self._buckets[fingerprint]
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[fingerprint]
+
+    @staticmethod
+    def _dot(columns, weights, indices, data):
+        # Sparse dot product on the shared n-grams, without a dense 2**18 vector
+        if not len(columns):
+            return 0.0
+        positions = np.minimum(np.searchsorted(columns, indices), len(columns) - 1)
+        shared = columns[positions] == indices
+        return float(weights[positions[shared]] @ data[shared])
+
+    def lookup(self, query):
+        """Return (response, score) for the best match above the threshold, else None."""
+        vector = self._embed([query]).tocsr()
+        vector.sort_indices()
+        columns, weights = vector.indices, vector.data
+        with self._lock:
+            candidates = self._buckets.get(query_fingerprint(query, self.topology, self.catalog))
+            if not candidates:
+                self.stats["misses"] += 1
+                return None
+            scores = np.array([self._dot(columns, weights, *self._entries[c][1:3]) for c in candidates])
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return self._entries[candidates[best]][3], float(scores[best])
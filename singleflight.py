@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+class _Call:
+    __slots__ = ("done", "result", "error", "abandoned", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+        self.followers = 0
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller (leader) runs the function; callers arriving while it
+    runs wait and receive the same result or exception. If the leader is
+    interrupted rather than failing (a Streamlit rerun, a cancelled stream),
+    waiting callers retry and one of them takes over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"executed": 0, "shared": 0}
+
+    def _join(self, key):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.stats["executed"] += 1
+                return call, True
+            call.followers += 1
+            self.stats["shared"] += 1
+            return call, False
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+        call.done.set()
+
+    def in_flight(self, key):
+        return key in self._calls
+
+    def do(self, key, fn):
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                try:
+                    call.result = fn()
+                    return call.result
+                except Exception as e:
+                    call.error = e
+                    raise
+                except BaseException:
+                    call.abandoned = True
+                    raise
+                finally:
+                    self._finish(key, call)
+            call.done.wait()
+            if call.abandoned:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def do_stream(self, key, chunks_fn):
+        """Like do() for a generator: the leader streams, followers get the joined text at once."""
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            call.done.wait()
+            if call.abandoned:
+                continue
+            if call.error is not None:
+                raise call.error
+            yield call.result
+            return
+        parts = []
+        try:
+            for chunk in chunks_fn():
+                parts.append(chunk)
+                yield chunk
+            call.result = "".join(parts)
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            # Includes GeneratorExit when the consumer stops reading
+            call.abandoned = True
+            raise
+        finally:
+            self._finish(key, call)
+
+class AsyncSingleFlight:
+    """asyncio variant: one shared task per key, cancelled only when every caller gave up."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.stats = {"executed": 0, "shared": 0}
+
+    def _forget(self, key, task):
+        if self._tasks.get(key, (None,))[0] is task:
+            del self._tasks[key]
+
+    async def do(self, key, coro_fn):
+        entry = self._tasks.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(coro_fn())
+            entry = self._tasks[key] = [task, 0]
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.stats["executed"] += 1
+        else:
+            self.stats["shared"] += 1
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # shield: one caller being cancelled must not cancel the others' call
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from aiohttp import web
+from google.api_core import exceptions as api_exceptions
+
+from llm_backends import Completion, LLMBackend
+from prompt_retrieval import estimate_tokens
+
+INJECTED_ERRORS = {
+    "rate_limited": api_exceptions.ResourceExhausted,
+    "unavailable": api_exceptions.ServiceUnavailable,
+    "internal": api_exceptions.InternalServerError,
+    "timeout": api_exceptions.DeadlineExceeded,
+    "invalid": api_exceptions.InvalidArgument,
+}
+CELL_PAIR_RE = re.compile(r"\b([23]\d\d)\b(?:\s*(?:→|->|vers|et|and)\s*([23]\d\d)\b)?")
+PARAMETER_RE = re.compile(r"\b([A-Z][A-Z0-9]{5,})\b(?:\s*(?:[:=]|est|is|à)?\s*(-?\d+)\b)?")
+
+# --- Answers ---
+def parse_latency(spec):
+    """Sampler for "fixed:S", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA" or "exponential:MEAN" (seconds)."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind in ("exponential", "exp"):
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+def canned_answer(prompt):
+    """A section 7 style answer about the cells and parameters named in the query.
+
+    Parameters come from the query itself; a value the query leaves out is
+    taken from the context appended after it (e.g. current MML values).
+    """
+    query = prompt.split("\n\n", 1)[0]
+    match = CELL_PAIR_RE.search(query)
+    source = int(match.group(1)) if match else 201
+    target = int(match.group(2)) if match and match.group(2) else source + 1
+    relation = f"(Cell ID {source} → Neighbor Cell ID {target})"
+    parameters = PARAMETER_RE.findall(query)[:2] or [("PBGTMARGIN", "")]
+    bullets = []
+    for parameter_id, value in parameters:
+        if not value:
+            known = re.search(rf"\b{parameter_id} (-?\d+)\b", prompt)
+            value = known.group(1) if known else ""
+        if value:
+            bullets.append(
+                f"• {parameter_id} {relation} : {value} → {int(value) + 2}\n\n"
+                "Justification : Ajustement progressif pour déclencher le handover plus tôt "
+                "sur ce segment à grande vitesse.\n\n"
+                "Impact attendu : Moins de coupures lors du passage entre ces deux cellules."
+            )
+        else:
+            bullets.append(
+                f"• {parameter_id} {relation}\n\n"
+                "Justification : Paramètre déterminant pour le déclenchement du handover sur ce segment.\n\n"
+                "Action requise : Veuillez fournir la valeur actuelle pour recommander un ajustement."
+            )
+    return "\n\n".join(bullets)
+
+# --- Backend ---
+class StubBackend(LLMBackend):
+    """Offline stand-in for Gemini: canned GSM-R answers after a sampled latency.
+
+    Each call draws its latency and injected error from a generator seeded by
+    (seed, n-th call of that prompt, prompt), so a run replays identically
+    whatever the thread scheduling. answers maps query substrings to fixed
+    answers; other queries get canned_answer().
+    """
+
+    name = "stub"
+
+    def __init__(self, latency="lognormal:0.8,0.35", error_rate=0.0, errors=("unavailable",),
+                 chunk_chars=40, chunk_delay=0.02, seed=0, answers=None):
+        self.latency_spec = latency
+        self._latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.errors = tuple(INJECTED_ERRORS[name] for name in errors)
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.seed = seed
+        self.answers = {key.lower(): value for key, value in (answers or {}).items()}
+        self._calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _draw(self, prompt):
+        with self._lock:
+            number = self._calls[prompt]
+            self._calls[prompt] += 1
+        rng = random.Random(f"{self.seed}:{number}:{prompt}")
+        latency = self._latency(rng)
+        error = rng.choice(self.errors) if self.errors and rng.random() < self.error_rate else None
+        return latency, error
+
+    def answer(self, prompt):
+        lowered = prompt.lower()
+        for key, value in self.answers.items():
+            if key in lowered:
+                return value
+        return canned_answer(prompt)
+
+    def _check(self, latency, error, timeout):
+        if latency > timeout:
+            raise api_exceptions.DeadlineExceeded(f"stub: no answer within {timeout:.1f}s")
+        if error is not None:
+            raise error("stub: injected error")
+
+    def _completion(self, system_prompt, prompt, text):
+        return Completion(text, estimate_tokens(system_prompt) + estimate_tokens(prompt), estimate_tokens(text))
+
+    def _chunks(self, system_prompt, prompt):
+        text = self.answer(prompt)
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        usage = self._completion(system_prompt, prompt, text)
+        return [Completion(piece) for piece in pieces[:-1]] + [Completion(pieces[-1], usage.input_tokens, usage.output_tokens)]
+
+    def generate(self, model_name, system_prompt, prompt, timeout):
+        latency, error = self._draw(prompt)
+        time.sleep(min(latency, timeout))
+        self._check(latency, error, timeout)
+        return self._completion(system_prompt, prompt, self.answer(prompt))
+
+    async def generate_async(self, model_name, system_prompt, prompt, timeout):
+        latency, error = self._draw(prompt)
+        await asyncio.sleep(min(latency, timeout))
+        self._check(latency, error, timeout)
+        return self._completion(system_prompt, prompt, self.answer(prompt))
+
+    def stream(self, model_name, system_prompt, prompt, timeout):
+        # The sampled latency is the time to first chunk
+        latency, error = self._draw(prompt)
+        time.sleep(min(latency, timeout))
+        self._check(latency, error, timeout)
+        for number, chunk in enumerate(self._chunks(system_prompt, prompt)):
+            if number:
+                time.sleep(self.chunk_delay)
+            yield chunk
+
+    async def stream_async(self, model_name, system_prompt, prompt, timeout):
+        latency, error = self._draw(prompt)
+        await asyncio.sleep(min(latency, timeout))
+        self._check(latency, error, timeout)
+        for number, chunk in enumerate(self._chunks(system_prompt, prompt)):
+            if number:
+                await asyncio.sleep(self.chunk_delay)
+            yield chunk
+
+# --- Server ---
+def create_stub_app(backend):
+    """aiohttp app serving a StubBackend over the protocol HTTPBackend speaks."""
+
+    async def generate(request):
+        payload = await request.json()
+        args = (payload.get("model", ""), payload.get("system", ""), str(payload.get("prompt", "")),
+                float(payload.get("timeout", 60)))
+        if not payload.get("stream"):
+            try:
+                completion = await backend.generate_async(*args)
+            except api_exceptions.GoogleAPICallError as e:
+                return web.json_response({"error": e.message}, status=e.code)
+            return web.json_response(completion.to_dict())
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        try:
+            async for chunk in backend.stream_async(*args):
+                if not response.prepared:
+                    await response.prepare(request)
+                await response.write((json.dumps(chunk.to_dict(), ensure_ascii=False) + "\n").encode("utf-8"))
+        except api_exceptions.GoogleAPICallError as e:
+            if not response.prepared:
+                return web.json_response({"error": e.message}, status=e.code)
+            await response.write((json.dumps({"error": e.message, "status": e.code}) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def health(request):
+        return web.json_response({"status": "ok", "latency": backend.latency_spec, "error_rate": backend.error_rate})
+
+    app = web.Application()
+    app.router.add_post("/v1/generate", generate)
+    app.router.add_get("/health", health)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic offline LLM stub for load tests and CI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.35", help="fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA, exponential:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--errors", default="unavailable", help=f"comma-separated, among {', '.join(INJECTED_ERRORS)}")
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--chunk-delay", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--answers", help="JSON file mapping query substrings to fixed answers")
+    args = parser.parse_args()
+    answers = None
+    if args.answers:
+        with open(args.answers, encoding="utf-8") as f:
+            answers = json.load(f)
+    backend = StubBackend(
+        latency=args.latency, error_rate=args.error_rate, errors=args.errors.split(","),
+        chunk_chars=args.chunk_chars, chunk_delay=args.chunk_delay, seed=args.seed, answers=answers,
+    )
+    web.run_app(create_stub_app(backend), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
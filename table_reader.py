@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+def resolve_columns(names, aliases, required):
+    """Actual header name for each canonical column of `aliases` found in names (case-insensitive)."""
+    lowered = {str(name).strip().lower(): name for name in names}
+    found = {}
+    for column, accepted in aliases.items():
+        name = next((lowered[a] for a in accepted if a in lowered), None)
+        if name is not None:
+            found[column] = name
+    missing = [column for column in required if column not in found]
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(missing)}; got: {', '.join(map(str, names))}")
+    return found
+
+def read_chunks(source, aliases, required=(), name=None, chunk_rows=500_000):
+    """Yield DataFrames of at most chunk_rows rows with canonical column names.
+
+    Parquet is memory-mapped and read one record batch at a time, CSV in
+    chunks of rows; only the columns of `aliases` are loaded, so memory
+    depends on chunk_rows, not on the size of the file. source is a path or
+    a binary file object, whose format is then given by name.
+    """
+    name = str(name or source)
+    if name.endswith(".parquet"):
+        parquet = pq.ParquetFile(source, memory_map=isinstance(source, (str, Path)))
+        renames = {actual: column for column, actual in resolve_columns(parquet.schema_arrow.names, aliases, required).items()}
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(renames)):
+            yield batch.to_pandas().rename(columns=renames)
+        return
+    header = pd.read_csv(source, nrows=0)
+    if not isinstance(source, (str, Path)):
+        source.seek(0)
+    renames = {actual: column for column, actual in resolve_columns(header.columns, aliases, required).items()}
+    for chunk in pd.read_csv(source, usecols=list(renames), chunksize=chunk_rows, dtype=str):
+        yield chunk.rename(columns=renames)
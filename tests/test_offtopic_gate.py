@@ -0,0 +1,22 @@
+import pytest
+
+from offtopic_gate import OffTopicGate
+
+@pytest.fixture(scope="module")
+def gate():
+    return OffTopicGate()
+
+@pytest.mark.parametrize("text", [
+    "Liaison perdue",
+    "Pas de réseau",
+    "Communication interrompue",
+    "Mauvaise couverture tunnel",
+    "Brouillage important",
+    "Interruption récurrente",
+])
+def test_short_fault_reports_pass(gate, text):
+    assert gate.classify(text).off_topic is False
+
+@pytest.mark.parametrize("text", ["", "???", "bonjour", "asdf qwerty"])
+def test_junk_is_rejected(gate, text):
+    assert gate.classify(text).off_topic is True
@@ -0,0 +1,45 @@
+import pytest
+
+from semantic_cache import SemanticCache, query_fingerprint
+
+ANSWER = "Coupure d'appel cellule 205 vers 206"
+
+# Labelled pairs behind the default threshold: (stored query, new query)
+PARAPHRASES = [
+    (ANSWER, "Coupure d'appel de la cellule 205 vers la 206"),
+    ("Quelle valeur pour HOSTATICTIME ?", "Quelle valeur recommandée pour HOSTATICTIME ?"),
+    ("Handover tardif 301 vers 302", "Le handover est tardif de 301 vers 302"),
+    ("Qualité RXQUAL dégradée cellule 215", "RXQUAL dégradée sur la cellule 215"),
+]
+NEAR_MISSES = [
+    (ANSWER, "Handover réussi cellule 205 vers 206"),
+    ("Quelle valeur pour HOSTATICTIME ?", "Quelle plage pour HOSTATICTIME ?"),
+    ("Handover tardif 301 vers 302", "Handover prématuré 301 vers 302"),
+    ("Qualité RXQUAL dégradée cellule 215", "Niveau RXLEV dégradé cellule 215"),
+]
+
+@pytest.mark.parametrize("stored, query", PARAPHRASES)
+def test_paraphrase_hits(stored, query):
+    cache = SemanticCache()
+    cache.add(stored, "answer")
+    assert cache.lookup(query) is not None
+
+@pytest.mark.parametrize("stored, query", NEAR_MISSES)
+def test_near_miss_misses(stored, query):
+    cache = SemanticCache()
+    cache.add(stored, "answer")
+    assert cache.lookup(query) is None
+
+def test_negation_changes_fingerprint():
+    assert query_fingerprint(ANSWER) != query_fingerprint("Pas de coupure d'appel cellule 205 vers 206")
+    cache = SemanticCache()
+    cache.add(ANSWER, "answer")
+    assert cache.lookup("Pas de coupure d'appel cellule 205 vers 206") is None
+
+def test_oldest_entries_are_evicted():
+    cache = SemanticCache(max_size=2)
+    for cell in (205, 206, 207):
+        cache.add(f"Coupure cellule {cell}", cell)
+    assert len(cache) == 2
+    assert cache.lookup("Coupure cellule 205") is None
+    assert cache.lookup("Coupure cellule 207") == (207, pytest.approx(1.0))
@@ -0,0 +1,127 @@
+import re
+from dataclasses import dataclass
+
+from param_catalog import split_section
+
+SITE_TABLE_SECTION = "## 4."
+HEADER_RE = re.compile(r"Couche (\d) \(BSC ([^)]+)\)")
+ROW_RE = re.compile(r"^\|\s*(\d+)\s*\|\s*(\d+)\s*\|\s*(\d+)\s*\|\s*$", re.MULTILINE)
+SITE_RE = re.compile(r"\bsites?\s*(?:n[°o]\s*)?(\d{1,2}(?:\s*(?:,|et|and|à|-|–)\s*\d{1,2})*)", re.IGNORECASE)
+# Only numbers written as cells count as unknown Cell IDs, not "NCELLPUNTM 255"
+CELL_LIKE_RE = re.compile(
+    r"(?:\bcell(?:ule)?s?(?:\s*id)?|neighbou?r|voisine?|→|->|vers)\s*(?:id\s*)?([23]\d\d)\b"
+    r"|\b([23]\d\d)(?=\s*(?:→|->))",
+    re.IGNORECASE,
+)
+
+# Section 3: layer 2 carries M1 (Tanger -> Kénitra), layer 3 carries M2 and backs up M1
+DEFAULT_DIRECTION = {2: "M1", 3: "M2"}
+
+# --- Records ---
+class Cell:
+    __slots__ = ("cell_id", "site", "layer", "bsc", "direction", "neighbours", "peer")
+
+    def __init__(self, cell_id, site, layer, bsc):
+        self.cell_id = cell_id
+        self.site = site
+        self.layer = layer
+        self.bsc = bsc
+        self.direction = DEFAULT_DIRECTION.get(layer)
+        self.neighbours = ()
+        self.peer = None
+
+    def __repr__(self):
+        return f"Cell({self.cell_id}, site={self.site}, couche={self.layer})"
+
+@dataclass
+class QueryEntities:
+    cells: tuple
+    sites: tuple
+    parameters: tuple
+    unknown_cells: tuple
+
+# --- Topology ---
+class LineTopology:
+    """The 33 sites of the line, two layers each, as linked Cell records.
+
+    Sites are numbered from Tanger (1) to Kénitra (33): a train in direction
+    M1 moves from site n to n + 1, in M2 from n to n - 1.
+    """
+
+    def __init__(self, rows, bsc_by_layer):
+        self.bsc_by_layer = bsc_by_layer
+        self.layers = tuple(sorted(bsc_by_layer))
+        self.cells = {}
+        self.sites = {}
+        for site, *cell_ids in rows:
+            self.sites[site] = tuple(cell_ids)
+            for layer, cell_id in zip(self.layers, cell_ids):
+                self.cells[cell_id] = Cell(cell_id, site, layer, bsc_by_layer[layer])
+        for cell in self.cells.values():
+            same_layer = self.layers.index(cell.layer)
+            cell.neighbours = tuple(
+                self.sites[s][same_layer] for s in (cell.site - 1, cell.site + 1) if s in self.sites
+            )
+            cell.peer = next(c for c in self.sites[cell.site] if c != cell.cell_id)
+        self._cell_re = re.compile(r"\b(" + "|".join(str(c) for c in sorted(self.cells)) + r")\b")
+        # "205 -> 206", "205 vers la cellule 206", "Cell ID 205 → Neighbor Cell ID 206"
+        self._relation_re = re.compile(
+            self._cell_re.pattern + r"\)?\s*(?:→|->|vers|to)\s*(?:la\s+)?(?:(?:neighbou?r\s+)?cell(?:ule)?\s*(?:id\s*)?)?"
+            + self._cell_re.pattern,
+            re.IGNORECASE,
+        )
+
+    @classmethod
+    def from_prompt(cls, prompt):
+        _, _, body, _ = split_section(prompt, SITE_TABLE_SECTION)
+        bsc_by_layer = {int(layer): bsc.strip() for layer, bsc in HEADER_RE.findall(body)}
+        rows = [tuple(map(int, row)) for row in ROW_RE.findall(body)]
+        return cls(rows, bsc_by_layer)
+
+    def __getitem__(self, cell_id):
+        return self.cells[cell_id]
+
+    def __contains__(self, cell_id):
+        return cell_id in self.cells
+
+    def next_cell(self, cell_id, direction):
+        cell = self.cells[cell_id]
+        site = cell.site + (1 if direction == "M1" else -1)
+        if site not in self.sites:
+            return None
+        return self.sites[site][self.layers.index(cell.layer)]
+
+    def extract(self, text, catalog=None):
+        cells = tuple(sorted({int(c) for c in self._cell_re.findall(text)}))
+        written = {int(a or b) for a, b in CELL_LIKE_RE.findall(text)}
+        unknown = tuple(sorted(written - set(self.cells)))
+        sites = {self.cells[c].site for c in cells}
+        for group in SITE_RE.findall(text):
+            bounds = [int(n) for n in re.findall(r"\d+", group)]
+            if re.search(r"à|-|–", group) and len(bounds) == 2:
+                bounds = range(bounds[0], bounds[1] + 1)
+            sites.update(s for s in bounds if s in self.sites)
+        parameters = tuple(catalog.extract_values(text, self.cells)) if catalog is not None else ()
+        return QueryEntities(cells, tuple(sorted(sites)), parameters, unknown)
+
+    def relation(self, text):
+        # First (source, neighbour) pair written as a handover between two known cells, else None
+        match = self._relation_re.search(text)
+        return (int(match.group(1)), int(match.group(2))) if match else None
+
+    def site_window(self, sites, radius=1):
+        # Affected sites plus their linear neighbours on the line
+        return sorted({s + d for s in sites for d in range(-radius, radius + 1)} & set(self.sites))
+
+    def site_table(self, sites):
+        header = " | ".join(f"**Couche {layer} (BSC {self.bsc_by_layer[layer]})**" for layer in self.layers)
+        lines = [f"| **Site** | {header} |", "|" + "---|" * (len(self.layers) + 1)]
+        lines += [f"| {s} | " + " | ".join(str(c) for c in self.sites[s]) + " |" for s in sites]
+        return "\n".join(lines)
+
+    def inject(self, prompt, sites, radius=1):
+        """Replace the full site table of the prompt by the rows around the given sites."""
+        window = self.site_window(sites, radius)
+        head, title, _, tail = split_section(prompt, SITE_TABLE_SECTION)
+        note = f"Extrait de la ligne ({len(self.sites)} sites, numérotés de Tanger vers Kénitra) :"
+        return f"{head}{title}\n{note}\n{self.site_table(window)}\n\n{tail}"
@@ -0,0 +1,186 @@
+import contextvars
+import datetime
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_trace = contextvars.ContextVar("gsmr_trace", default=None)
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+def _quantile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+class Trace:
+    __slots__ = ("trace_id", "name", "started", "wall", "attrs", "spans")
+
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall = datetime.datetime.now(datetime.timezone.utc)
+        self.attrs = attrs
+        self.spans = []
+
+    def to_dict(self, total):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start": self.wall.isoformat(),
+            "total_ms": round(total * 1000, 1),
+            **self.attrs,
+            "spans": self.spans,
+        }
+
+class Tracer:
+    """Spans, counters and gauges for one process, exported as Prometheus text.
+
+    A trace groups the spans of one request and is written as a JSON line to
+    a rotating log when it ends. Spans outside any trace still feed the
+    metrics. Latency quantiles are computed over the last `window` samples.
+    """
+
+    def __init__(self, log_path=None, max_bytes=10_000_000, backups=5, window=1000, prefix="gsmr"):
+        self.prefix = prefix
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._totals = defaultdict(lambda: [0, 0.0])
+        self._counters = defaultdict(lambda: defaultdict(float))
+        self._gauges = {}
+        self._log = None
+        if log_path:
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log = logging.getLogger(f"{__name__}.{uuid.uuid4().hex[:8]}")
+            self._log.addHandler(handler)
+            self._log.setLevel(logging.INFO)
+            self._log.propagate = False
+
+    # --- Recording ---
+    @contextmanager
+    def trace(self, name, **attrs):
+        trace = Trace(name, attrs)
+        token = _current_trace.set(trace)
+        try:
+            with self.span("total"):
+                yield trace
+        except Exception as e:
+            trace.attrs.setdefault("error", getattr(e, "code", type(e).__name__))
+            raise
+        finally:
+            _current_trace.reset(token)
+            if self._log is not None:
+                self._log.info(json.dumps(trace.to_dict(time.perf_counter() - trace.started), ensure_ascii=False, default=str))
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a block; the yielded dict takes attributes such as token counts."""
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs["error"] = getattr(e, "code", type(e).__name__)
+            self.count("errors_total", span=name, error=attrs["error"])
+            raise
+        finally:
+            self.record(name, time.perf_counter() - started, **attrs)
+
+    def record(self, name, seconds, **attrs):
+        # For durations measured elsewhere, e.g. the queue wait of a ticket
+        with self._lock:
+            self._samples[name].append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append({"span": name, "ms": round(seconds * 1000, 1), **attrs})
+
+    def annotate(self, **attrs):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.attrs.update(attrs)
+
+    def count(self, metric, value=1, **labels):
+        with self._lock:
+            self._counters[metric][tuple(sorted(labels.items()))] += value
+
+    def gauge(self, metric, fn):
+        self._gauges[metric] = fn
+
+    # --- Reading ---
+    def percentiles(self):
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items() if values}
+            totals = {name: tuple(values) for name, values in self._totals.items()}
+        return {
+            name: {"count": totals[name][0], **{f"p{round(q * 100)}": _quantile(values, q) for q in QUANTILES}}
+            for name, values in samples.items()
+        }
+
+    def counters(self):
+        with self._lock:
+            return {metric: dict(values) for metric, values in self._counters.items()}
+
+    def prometheus(self):
+        lines = []
+        metric = f"{self.prefix}_span_seconds"
+        lines += [f"# HELP {metric} Duration of pipeline spans", f"# TYPE {metric} summary"]
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items() if values}
+            totals = {name: tuple(values) for name, values in self._totals.items()}
+        for name, values in sorted(samples.items()):
+            for q in QUANTILES:
+                lines.append(f'{metric}{{span="{name}",quantile="{q}"}} {_quantile(values, q):.6f}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {totals[name][1]:.6f}')
+            lines.append(f'{metric}_count{{span="{name}"}} {totals[name][0]}')
+        for name, values in sorted(self.counters().items()):
+            lines.append(f"# TYPE {self.prefix}_{name} counter")
+            lines += [f"{self.prefix}_{name}{_labels(labels)} {value:g}" for labels, value in sorted(values.items())]
+        for name, fn in sorted(self._gauges.items()):
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines += [f"# TYPE {self.prefix}_{name} gauge", f"{self.prefix}_{name} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+# --- Endpoint ---
+def start_metrics_server(tracer, host="127.0.0.1", port=9464):
+    """Serve tracer.prometheus() on /metrics from a daemon thread; None if the port is taken."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        logger.warning("metrics endpoint not started on %s:%s: %s", host, port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,221 @@
+import hashlib
+import io
+import re
+import threading
+from dataclasses import dataclass
+
+from cachetools import LRUCache
+from docx import Document
+
+REPORT_TITLE = "GSM-R Network Analysis & Recommendations"
+BULK_TITLE = "GSM-R - Rapport d'analyse des coupures"
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+BOLD_LINE_RE = re.compile(r"^\*\*([^*]+)\*\*\s*$")
+BULLET_RE = re.compile(r"^(\s*)([•\-*–·]|\d+[.)])\s+(.+)$")
+# The labelled lines of section 7, as bullets or paragraphs of their own
+FIELD_RE = re.compile(
+    r"^(?:\*\*)?(Justification(?: technique)?|Impact attendu|Action requise)(?:\*\*)?\s*:\s*(?:\*\*)?\s*(.*)$",
+    re.IGNORECASE,
+)
+# <Nom paramètre> (Cell ID X → Neighbor Cell ID Y) : <actuelle> → <recommandée>
+CHANGE_RE = re.compile(
+    r"^(?P<parameter>[^(:]+?)\s*\((?P<relation>[^)]*)\)\s*:\s*(?P<current>.+?)\s*(?:→|->)\s*(?P<recommended>.+?)\s*$"
+)
+INLINE_RE = re.compile(r"(\*\*[^*]+\*\*|\*[^*\s][^*]*\*|`[^`]+`)")
+CHANGE_HEADERS = ("Paramètre", "Relation", "Valeur actuelle", "Valeur recommandée")
+
+def content_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+@dataclass
+class ParameterChange:
+    parameter: str
+    relation: str
+    current: str
+    recommended: str
+
+# --- Rendering ---
+class ReportRenderer:
+    """Writes answers in the section 7 bullet format into a python-docx Document.
+
+    One pass over the lines: Markdown headings and lines in bold become
+    headings, bullets become list paragraphs, "Justification / Impact
+    attendu / Action requise" lines nested bullets with a bold label, and
+    every "parameter (relation) : current → recommended" bullet is collected
+    as a ParameterChange for the change table.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        # Style ids resolved once and set on the XML: python-docx scans the
+        # whole style sheet for every paragraph given a style
+        names = ["Title", "List Bullet", "List Bullet 2", "List Number", "Table Grid"]
+        names += [f"Heading {level}" for level in range(1, 10)]
+        self.style_ids = {name: document.styles[name].style_id for name in names}
+
+    def _runs(self, paragraph, text):
+        if "*" not in text and "`" not in text:
+            paragraph.add_run(text)
+            return
+        for part in INLINE_RE.split(text):
+            if part.startswith("**") and part.endswith("**") and len(part) > 4:
+                paragraph.add_run(part[2:-2]).bold = True
+            elif part.startswith("`") and part.endswith("`") and len(part) > 2:
+                paragraph.add_run(part[1:-1]).font.name = "Consolas"
+            elif part.startswith("*") and part.endswith("*") and len(part) > 2:
+                paragraph.add_run(part[1:-1]).italic = True
+            elif part:
+                paragraph.add_run(part)
+
+    def paragraph(self, text="", style=None):
+        paragraph = self.document.add_paragraph()
+        if style is not None:
+            paragraph._p.style = self.style_ids[style]
+        if text:
+            self._runs(paragraph, text)
+        return paragraph
+
+    def heading(self, text, level=1):
+        return self.paragraph(text, "Title" if level == 0 else f"Heading {min(level, 9)}")
+
+    def render(self, text, level=1):
+        """Add an answer under headings starting at `level`; returns its ParameterChanges."""
+        changes = []
+        for line in text.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+            match = HEADING_RE.match(stripped)
+            if match:
+                self.heading(match.group(2), level + len(match.group(1)) - 1)
+                continue
+            match = BOLD_LINE_RE.match(stripped)
+            if match:
+                self.heading(match.group(1).strip().rstrip(":").strip(), level + 1)
+                continue
+            match = BULLET_RE.match(line)
+            indent, marker, content = match.groups() if match else ("", "", stripped)
+            field = FIELD_RE.match(content)
+            if field:
+                paragraph = self.paragraph(style="List Bullet 2")
+                paragraph.add_run(f"{field.group(1)} : ").bold = True
+                self._runs(paragraph, field.group(2))
+                continue
+            if not match:
+                self.paragraph(stripped)
+                continue
+            if marker[0].isdigit():
+                self.paragraph(content, "List Number")
+                continue
+            self.paragraph(content, "List Bullet 2" if len(indent.expandtabs(4)) >= 2 else "List Bullet")
+            change = CHANGE_RE.match(content.replace("**", ""))
+            if change:
+                changes.append(ParameterChange(**{k: v.strip() for k, v in change.groupdict().items()}))
+        return changes
+
+    def change_table(self, changes, events=None):
+        """Table of parameter changes; `events` adds a first column with the event id of each row."""
+        headers = (("Événement",) if events is not None else ()) + CHANGE_HEADERS
+        table = self.document.add_table(rows=1, cols=len(headers))
+        table._tbl.tblStyle_val = self.style_ids["Table Grid"]
+        for cell, header in zip(table.rows[0].cells, headers):
+            cell.paragraphs[0].add_run(header).bold = True
+        for number, change in enumerate(changes):
+            values = (change.parameter, change.relation, change.current, change.recommended)
+            if events is not None:
+                values = (events[number],) + values
+            for cell, value in zip(table.add_row().cells, values):
+                cell.text = value
+        return table
+
+# --- Single report ---
+class WordExporter:
+    """.docx bytes of a report, memoized by content hash.
+
+    The template (title and styles) is parsed once and kept in memory. An
+    export renders the report into it, serializes, then strips the body
+    again, under a lock, so no call pays for parsing a fresh Document.
+    """
+
+    def __init__(self, title=REPORT_TITLE, cache_size=32):
+        self._template = Document()
+        self._template.add_heading(title, 0)
+        self._body = self._template.element.body
+        self._renderer = ReportRenderer(self._template)
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0}
+
+    def __contains__(self, text):
+        return content_key(text) in self._cache
+
+    def render(self, text):
+        changes = self._renderer.render(text)
+        if changes:
+            self._renderer.heading("Changements de paramètres recommandés", 1)
+            self._renderer.change_table(changes)
+
+    def export(self, text):
+        key = content_key(text)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self.stats["hits"] += 1
+                return data
+            # Holding the elements keeps their lxml proxies, hence their identity
+            before = set(self._body)
+            try:
+                self.render(text)
+                buffer = io.BytesIO()
+                self._template.save(buffer)
+            finally:
+                for element in [e for e in self._body if e not in before]:
+                    self._body.remove(element)
+            data = self._cache[key] = buffer.getvalue()
+            self.stats["builds"] += 1
+            return data
+
+# --- Bulk report ---
+def write_bulk_report(records, output, title=BULK_TITLE):
+    """Render analysis records ({id, query, status, result, error}) into one .docx.
+
+    records may be any iterable, read lazily: each answer is rendered straight
+    into the single consolidated Document, and only its ParameterChanges are
+    kept for the summary table placed after the title. output is a path or a
+    binary file. Returns the number of events written.
+    """
+    document = Document()
+    renderer = ReportRenderer(document)
+    anchor = renderer.heading(title, 0)._p
+    changes, events = [], []
+    counts = {"ok": 0, "other": 0}
+    for record in records:
+        renderer.heading(f"Événement {record['id']}", 1)
+        if record.get("query"):
+            renderer.paragraph().add_run(record["query"]).italic = True
+        if record.get("status") == "ok":
+            counts["ok"] += 1
+            found = renderer.render(record.get("result") or "", level=2)
+            changes += found
+            events += [str(record["id"])] * len(found)
+        else:
+            counts["other"] += 1
+            paragraph = renderer.paragraph()
+            paragraph.add_run(f"{record.get('status', 'error').capitalize()} : ").bold = True
+            paragraph.add_run(record.get("error") or "")
+
+    # The summary is built last, once every change is known, then moved up
+    summary = [
+        renderer.heading("Synthèse", 1)._p,
+        renderer.paragraph(
+            f"{counts['ok'] + counts['other']} événements : {counts['ok']} analysés, "
+            f"{counts['other']} en échec ou invalides, {len(changes)} changements de paramètres recommandés."
+        )._p,
+    ]
+    if changes:
+        summary.append(renderer.change_table(changes, events)._tbl)
+    for element in reversed(summary):
+        anchor.addnext(element)
+    document.save(output)
+    return counts["ok"] + counts["other"]